@@ -9,6 +9,7 @@ from agent_management import AgentManagementSystem
 from database import db
 from models import User
 from flask_login import login_required, current_user
+from replica_routing import reporting
 import json
 from datetime import datetime, timedelta
 
@@ -284,6 +285,7 @@ def search_agents():
 
 @agent_management_bp.route('/api/agent/export', methods=['GET'])
 @login_required
+@reporting
 def export_agent_data():
     """Export agent data"""
     try:
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Analytics Export API
+Parquet download endpoint and the ``flask analytics`` commands
+"""
+
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+import click
+from flask import Blueprint, request, jsonify, send_file, current_app
+from flask_login import login_required, current_user
+from replica_routing import reporting
+from analytics_export import AnalyticsExportSystem, EXPORT_TABLES, DEFAULT_CHUNK_SIZE, STATE_FILE
+from analytics_rollup import rebuild_rollups
+
+# Create Blueprint (CLI commands live under ``flask analytics ...``)
+analytics_export_bp = Blueprint('analytics_export', __name__, cli_group='analytics')
+
+@analytics_export_bp.route('/api/analytics/export', methods=['GET'])
+@login_required
+@reporting
+def export_parquet():
+    """Download the current user's tables as a zipped, partitioned Parquet dataset
+
+    Query parameters: ``tables`` (comma separated, default all) and ``since``
+    (ISO date/time; only rows modified after it are exported).
+    """
+    try:
+        tables = [t.strip() for t in request.args.get('tables', '').split(',') if t.strip()]
+        since = request.args.get('since')
+        since = datetime.fromisoformat(since) if since else None
+
+        work_dir = tempfile.mkdtemp(prefix='analytics_export_')
+        try:
+            exporter = AnalyticsExportSystem(
+                os.path.join(work_dir, 'dataset'),
+                chunk_size=current_app.config.get('ANALYTICS_EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+            )
+            exporter.export_all(tables or None, user_id=current_user.id, incremental=False, since=since)
+
+            zip_path = os.path.join(work_dir, 'export.zip')
+            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as archive:
+                for root, _, files in os.walk(exporter.output_dir):
+                    for name in files:
+                        if name == STATE_FILE:
+                            continue
+                        path = os.path.join(root, name)
+                        archive.write(path, os.path.relpath(path, exporter.output_dir))
+
+            response = send_file(
+                zip_path,
+                mimetype='application/zip',
+                as_attachment=True,
+                download_name=f'analytics_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+            )
+            response.call_on_close(lambda: shutil.rmtree(work_dir, ignore_errors=True))
+            return response
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Analytics export error: {e}")
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
+
+@analytics_export_bp.cli.command('export')
+@click.option('--output', default=None, help='Dataset directory (default: ANALYTICS_EXPORT_DIR)')
+@click.option('--tables', default='', help=f"Comma separated subset of: {', '.join(EXPORT_TABLES)}")
+@click.option('--tenant', type=int, default=None, help='Export a single user_id only')
+@click.option('--chunk-size', type=int, default=None, help='Rows read per query')
+@click.option('--full', is_flag=True,
+              help='Ignore the stored watermark, export everything and drop deleted rows')
+def export_command(output, tables, tenant, chunk_size, full):
+    """Write tables as Parquet partitioned by tenant and financial year"""
+    output = output or current_app.config['ANALYTICS_EXPORT_DIR']
+    exporter = AnalyticsExportSystem(
+        output,
+        chunk_size=chunk_size or current_app.config.get('ANALYTICS_EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    )
+    selected = [t.strip() for t in tables.split(',') if t.strip()]
+
+    summary = exporter.export_all(selected or None, user_id=tenant, incremental=not full)
+    for name, result in summary.items():
+        since = f" (modified after {result['since']})" if result['since'] else ''
+        click.echo(f"{name}: {result['rows']} rows, {len(result['files'])} file(s){since}")
+
+@analytics_export_bp.cli.command('rebuild-rollups')
+@click.option('--tenant', type=int, default=None, help='Rebuild a single user_id only')
+def rebuild_rollups_command(tenant):
+    """Recompute the daily sales/purchase rollups from the raw lines"""
+    counts = rebuild_rollups(user_id=tenant)
+    for table, rows in counts.items():
+        click.echo(f"{table}: {rows} rows")
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Analytics Rollups
+Daily sales/purchase rollup cube maintained incrementally on posting
+"""
+
+import logging
+from typing import Dict, Tuple
+from sqlalchemy import event, func, inspect, select, delete, and_, or_
+from sqlalchemy.orm import Session
+from database import db
+from models import Sale, Purchase, SalesDailyRollup, PurchaseDailyRollup
+
+logger = logging.getLogger(__name__)
+
+# Transaction model -> rollup model
+ROLLUP_MODELS = {
+    Sale: SalesDailyRollup,
+    Purchase: PurchaseDailyRollup,
+}
+
+# Rollup key column -> transaction attribute
+KEY_FIELDS = (
+    ('user_id', 'user_id'),
+    ('day', 'bill_date'),
+    ('party_cd', 'party_cd'),
+    ('it_cd', 'it_cd'),
+    ('agent_cd', 'agent_cd'),
+)
+
+# Rollup measure column -> transaction attribute
+MEASURE_FIELDS = (
+    ('qty', 'qty'),
+    ('amount', 'sal_amt'),
+    ('discount', 'discount'),
+    ('tax', 'taxamt'),
+)
+
+TRACKED_ATTRIBUTES = [attr for _, attr in KEY_FIELDS + MEASURE_FIELDS]
+
+
+def _current_values(obj) -> Dict:
+    return {attr: getattr(obj, attr) for attr in TRACKED_ATTRIBUTES}
+
+
+def _committed_values(session: Session, obj) -> Dict:
+    """Values as stored in the database, which is what an update or delete has
+    to take back out of the cube"""
+    state = inspect(obj)
+    values = {}
+    missing = []
+    for attr in TRACKED_ATTRIBUTES:
+        history = state.attrs[attr].history
+        if history.deleted:
+            values[attr] = history.deleted[0]
+        elif history.unchanged:
+            values[attr] = history.unchanged[0]
+        elif history.added:
+            # Assigned while expired, so the old value was never loaded
+            missing.append(attr)
+        else:
+            values[attr] = getattr(obj, attr)
+
+    if missing:
+        table = type(obj).__table__
+        row = session.connection(bind_arguments={'mapper': type(obj)}).execute(
+            select(*[table.c[attr] for attr in missing]).where(table.c.id == state.identity[0])
+        ).one()
+        values.update(zip(missing, row))
+    return values
+
+
+def _line_contribution(values: Dict) -> Tuple[Tuple, list]:
+    """Return (rollup key, [qty, amount, discount, tax, line_count]) for one line"""
+    key = tuple(values[attr] for _, attr in KEY_FIELDS)
+    key = key[:4] + (key[4] or '',)
+    measures = [float(values[attr] or 0) for _, attr in MEASURE_FIELDS] + [1]
+    return key, measures
+
+
+def add_line_delta(deltas: Dict, model, values: Dict, sign: int):
+    """Accumulate one Sale/Purchase line (as a column dict) into ``deltas``
+
+    ``sign`` is +1 for a line being added and -1 for one being taken out.
+    """
+    key, measures = _line_contribution(values)
+    current = deltas.setdefault((ROLLUP_MODELS[model], key), [0, 0, 0, 0, 0])
+    for i, measure in enumerate(measures):
+        current[i] += sign * measure
+
+
+def _collect_deltas(session: Session) -> Dict:
+    """Net rollup changes implied by the pending inserts, updates and deletes"""
+    deltas = {}
+
+    for obj in session.new:
+        if type(obj) in ROLLUP_MODELS:
+            add_line_delta(deltas, type(obj), _current_values(obj), sign=1)
+
+    for obj in session.dirty:
+        if type(obj) not in ROLLUP_MODELS or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[attr].history.has_changes() for attr in TRACKED_ATTRIBUTES):
+            continue
+        add_line_delta(deltas, type(obj), _committed_values(session, obj), sign=-1)
+        add_line_delta(deltas, type(obj), _current_values(obj), sign=1)
+
+    for obj in session.deleted:
+        if type(obj) in ROLLUP_MODELS:
+            add_line_delta(deltas, type(obj), _committed_values(session, obj), sign=-1)
+
+    return {k: v for k, v in deltas.items() if any(v)}
+
+
+def _upsert_statement(connection, rollup, values: Dict):
+    """INSERT ... ON CONFLICT (key) DO UPDATE SET measure = measure + delta
+
+    MySQL/MariaDB spell it ON DUPLICATE KEY UPDATE, against the same unique key.
+    """
+    table = rollup.__table__
+    measure_columns = [column for column, _ in MEASURE_FIELDS] + ['line_count']
+    dialect = connection.dialect.name
+
+    if dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(**values)
+        return stmt.on_duplicate_key_update(
+            {column: table.c[column] + stmt.inserted[column] for column in measure_columns}
+        )
+
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Analytics rollups have no upsert for the {dialect} database")
+
+    stmt = insert(table).values(**values)
+    return stmt.on_conflict_do_update(
+        index_elements=[column for column, _ in KEY_FIELDS],
+        set_={column: table.c[column] + stmt.excluded[column] for column in measure_columns}
+    )
+
+
+def apply_deltas(connection, deltas: Dict):
+    """Apply collected deltas inside the caller's transaction"""
+    deltas = {k: v for k, v in deltas.items() if any(v)}
+    for (rollup, key), measures in deltas.items():
+        values = dict(zip([column for column, _ in KEY_FIELDS], key))
+        values.update(zip([column for column, _ in MEASURE_FIELDS] + ['line_count'], measures))
+        connection.execute(_upsert_statement(connection, rollup, values))
+
+        if measures[-1] < 0:
+            # Drop cells whose last line was removed
+            table = rollup.__table__
+            connection.execute(delete(table).where(and_(
+                *[table.c[column] == key[i] for i, (column, _) in enumerate(KEY_FIELDS)],
+                table.c.line_count <= 0
+            )))
+
+
+@event.listens_for(Session, 'before_flush')
+def maintain_rollups(session, flush_context, instances):
+    """Keep the rollup cube in step with every ORM flush of Sale/Purchase lines
+
+    Runs in the same transaction as the posting, so a rollback undoes both.
+    """
+    deltas = _collect_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(bind_arguments={'mapper': Sale}), deltas)
+
+
+def rebuild_rollups(user_id: int = None) -> Dict[str, int]:
+    """Recompute the rollups from the raw lines (initial load, or after raw SQL imports)
+
+    Days in a tenant's closed financial years are left as they are: their
+    lines were moved to the year archives and the rollups keep their totals.
+    """
+    from year_archive import closed_through_all
+
+    closed = closed_through_all()
+    if user_id is not None:
+        closed = {tenant: day for tenant, day in closed.items() if tenant == user_id}
+
+    counts = {}
+    for model, rollup in ROLLUP_MODELS.items():
+        table = rollup.__table__
+        source = model.__table__
+
+        clear = delete(table)
+        if user_id is not None:
+            clear = clear.where(table.c.user_id == user_id)
+        if closed:
+            clear = clear.where(~or_(*[and_(table.c.user_id == tenant, table.c.day <= day)
+                                       for tenant, day in closed.items()]))
+        db.session.execute(clear)
+
+        agent = func.coalesce(source.c.agent_cd, '')
+        aggregate = select(
+            source.c.user_id,
+            source.c.bill_date,
+            source.c.party_cd,
+            source.c.it_cd,
+            agent,
+            func.sum(func.coalesce(source.c.qty, 0)),
+            func.sum(func.coalesce(source.c.sal_amt, 0)),
+            func.sum(func.coalesce(source.c.discount, 0)),
+            func.sum(func.coalesce(source.c.taxamt, 0)),
+            func.count()
+        ).group_by(source.c.user_id, source.c.bill_date, source.c.party_cd, source.c.it_cd, agent)
+        if user_id is not None:
+            aggregate = aggregate.where(source.c.user_id == user_id)
+        if closed:
+            aggregate = aggregate.where(~or_(*[and_(source.c.user_id == tenant, source.c.bill_date <= day)
+                                               for tenant, day in closed.items()]))
+
+        columns = [column for column, _ in KEY_FIELDS] + [column for column, _ in MEASURE_FIELDS] + ['line_count']
+        result = db.session.execute(table.insert().from_select(columns, aggregate))
+        counts[table.name] = result.rowcount
+
+    db.session.commit()
+    logger.info(f"Rebuilt rollups: {counts}")
+    return counts
@@ -4,15 +4,20 @@ API blueprint for RESTful endpoints and AJAX operations
 
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 from models import db, Party, Item, Purchase, Sale, Cashbook, Bankbook, User
 from forms import PartyForm, ItemForm, PurchaseForm, SaleForm, CashbookForm, BankbookForm
+from lazy_load_guard import list_endpoint
+from serializers import (PARTY_FIELDS, ITEM_FIELDS, PURCHASE_FIELDS, SALE_FIELDS,
+                         paginated, json_response)
 from datetime import datetime, date
 import logging
 
 api_bp = Blueprint('api', __name__)
 logger = logging.getLogger(__name__)
 
-# Helper function to serialize models
+# Helper functions to serialize single model instances (list and detail GETs
+# select only the needed columns through serializers.py)
 def serialize_party(party):
     return {
         'party_cd': party.party_cd,
@@ -110,23 +115,15 @@ def get_parties():
     if search:
         query = query.filter(Party.party_nm.contains(search) | Party.party_cd.contains(search))
     
-    parties = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    return jsonify({
-        'parties': [serialize_party(party) for party in parties.items],
-        'total': parties.total,
-        'pages': parties.pages,
-        'current_page': parties.page,
-        'has_next': parties.has_next,
-        'has_prev': parties.has_prev
-    })
+    return json_response(paginated(PARTY_FIELDS, query, 'parties', page, per_page))
 
 @api_bp.route('/parties/<party_cd>', methods=['GET'])
 @login_required
 def get_party(party_cd):
     """Get specific party by code (user-specific)"""
-    party = Party.query.filter_by(party_cd=party_cd, user_id=current_user.id).first_or_404()
-    return jsonify(serialize_party(party))
+    party = PARTY_FIELDS.query().filter(
+        Party.party_cd == party_cd, Party.user_id == current_user.id).first_or_404()
+    return json_response(PARTY_FIELDS.one(party))
 
 @api_bp.route('/parties', methods=['POST'])
 @login_required
@@ -230,23 +227,15 @@ def get_items():
     if search:
         query = query.filter(Item.it_nm.contains(search) | Item.it_cd.contains(search))
     
-    items = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    return jsonify({
-        'items': [serialize_item(item) for item in items.items],
-        'total': items.total,
-        'pages': items.pages,
-        'current_page': items.page,
-        'has_next': items.has_next,
-        'has_prev': items.has_prev
-    })
+    return json_response(paginated(ITEM_FIELDS, query, 'items', page, per_page))
 
 @api_bp.route('/items/<it_cd>', methods=['GET'])
 @login_required
 def get_item(it_cd):
     """Get specific item by code (user-specific)"""
-    item = Item.query.filter_by(it_cd=it_cd, user_id=current_user.id).first_or_404()
-    return jsonify(serialize_item(item))
+    item = ITEM_FIELDS.query().filter(
+        Item.it_cd == it_cd, Item.user_id == current_user.id).first_or_404()
+    return json_response(ITEM_FIELDS.one(item))
 
 @api_bp.route('/items', methods=['POST'])
 @login_required
@@ -338,25 +327,17 @@ def get_purchases():
     per_page = request.args.get('per_page', 20, type=int)
     
     # Filter by current user
-    purchases = Purchase.query.filter_by(user_id=current_user.id)\
-        .order_by(Purchase.bill_date.desc()).paginate(
-        page=page, per_page=per_page, error_out=False)
+    query = Purchase.query.filter_by(user_id=current_user.id).order_by(Purchase.bill_date.desc())
     
-    return jsonify({
-        'purchases': [serialize_purchase(purchase) for purchase in purchases.items],
-        'total': purchases.total,
-        'pages': purchases.pages,
-        'current_page': purchases.page,
-        'has_next': purchases.has_next,
-        'has_prev': purchases.has_prev
-    })
+    return json_response(paginated(PURCHASE_FIELDS, query, 'purchases', page, per_page))
 
 @api_bp.route('/purchases/<int:purchase_id>', methods=['GET'])
 @login_required
 def get_purchase(purchase_id):
     """Get specific purchase by ID (user-specific)"""
-    purchase = Purchase.query.filter_by(id=purchase_id, user_id=current_user.id).first_or_404()
-    return jsonify(serialize_purchase(purchase))
+    purchase = PURCHASE_FIELDS.query().filter(
+        Purchase.id == purchase_id, Purchase.user_id == current_user.id).first_or_404()
+    return json_response(PURCHASE_FIELDS.one(purchase))
 
 @api_bp.route('/purchases', methods=['POST'])
 @login_required
@@ -462,25 +443,17 @@ def get_sales():
     per_page = request.args.get('per_page', 20, type=int)
     
     # Filter by current user
-    sales = Sale.query.filter_by(user_id=current_user.id)\
-        .order_by(Sale.bill_date.desc()).paginate(
-        page=page, per_page=per_page, error_out=False)
+    query = Sale.query.filter_by(user_id=current_user.id).order_by(Sale.bill_date.desc())
     
-    return jsonify({
-        'sales': [serialize_sale(sale) for sale in sales.items],
-        'total': sales.total,
-        'pages': sales.pages,
-        'current_page': sales.page,
-        'has_next': sales.has_next,
-        'has_prev': sales.has_prev
-    })
+    return json_response(paginated(SALE_FIELDS, query, 'sales', page, per_page))
 
 @api_bp.route('/sales/<int:sale_id>', methods=['GET'])
 @login_required
 def get_sale(sale_id):
     """Get specific sale by ID (user-specific)"""
-    sale = Sale.query.filter_by(id=sale_id, user_id=current_user.id).first_or_404()
-    return jsonify(serialize_sale(sale))
+    sale = SALE_FIELDS.query().filter(
+        Sale.id == sale_id, Sale.user_id == current_user.id).first_or_404()
+    return json_response(SALE_FIELDS.one(sale))
 
 @api_bp.route('/sales', methods=['POST'])
 @login_required
@@ -590,10 +563,10 @@ def get_dashboard_stats():
         total_sales = Sale.query.count()
         
         # Recent transactions
-        recent_purchases = Purchase.query.order_by(Purchase.created_date.desc()).limit(5).all()
-        recent_sales = Sale.query.order_by(Sale.created_date.desc()).limit(5).all()
+        recent_purchases = PURCHASE_FIELDS.query().order_by(Purchase.created_date.desc()).limit(5).all()
+        recent_sales = SALE_FIELDS.query().order_by(Sale.created_date.desc()).limit(5).all()
         
-        return jsonify({
+        return json_response({
             'success': True,
             'stats': {
                 'total_parties': total_parties,
@@ -601,8 +574,8 @@ def get_dashboard_stats():
                 'total_purchases': total_purchases,
                 'total_sales': total_sales
             },
-            'recent_purchases': [serialize_purchase(p) for p in recent_purchases],
-            'recent_sales': [serialize_sale(s) for s in recent_sales]
+            'recent_purchases': PURCHASE_FIELDS.rows(recent_purchases),
+            'recent_sales': SALE_FIELDS.rows(recent_sales)
         })
     
     except Exception as e:
@@ -837,19 +810,20 @@ def search():
 # Transaction Summary API
 @api_bp.route('/transactions/summary', methods=['GET'])
 @login_required
+@list_endpoint
 def get_transaction_summary():
     """Get combined purchase and sale transactions summary"""
     try:
         item_code = request.args.get('item_code')
         
         # Get purchases
-        purchases_query = Purchase.query
+        purchases_query = Purchase.query.options(joinedload(Purchase.party), joinedload(Purchase.item))
         if item_code:
             purchases_query = purchases_query.filter_by(it_cd=item_code)
         purchases = purchases_query.order_by(Purchase.bill_date.desc()).all()
         
         # Get sales
-        sales_query = Sale.query
+        sales_query = Sale.query.options(joinedload(Sale.party), joinedload(Sale.item))
         if item_code:
             sales_query = sales_query.filter_by(it_cd=item_code)
         sales = sales_query.order_by(Sale.bill_date.desc()).all()
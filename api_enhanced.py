@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request, render_template_string, Response
 from flask_login import login_required, current_user
+from fragments import render_fragment
 from models import db, Parties, Items, Sales, Purchases, Cashbook
 from datetime import datetime, date, timedelta
 import json
@@ -373,63 +374,7 @@ def print_sale(sale_id):
     """Generate print-friendly sale bill"""
     sale = Sales.query.filter_by(id=sale_id, user_id=current_user.id).first_or_404()
     
-    return render_template_string("""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Sale Bill - {{ sale.bill_no }}</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 20px; }
-            .header { text-align: center; border-bottom: 2px solid #000; padding-bottom: 10px; }
-            .bill-details { margin: 20px 0; }
-            .table { width: 100%; border-collapse: collapse; margin: 20px 0; }
-            .table th, .table td { border: 1px solid #000; padding: 8px; text-align: left; }
-            .total { font-weight: bold; text-align: right; }
-            @media print { .no-print { display: none; } }
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>Business Management System</h1>
-            <h2>Sale Bill</h2>
-        </div>
-        
-        <div class="bill-details">
-            <p><strong>Bill No:</strong> {{ sale.bill_no }}</p>
-            <p><strong>Date:</strong> {{ sale.sale_date.strftime('%d/%m/%Y') }}</p>
-            <p><strong>Party:</strong> {{ sale.party.party_nm if sale.party else 'N/A' }}</p>
-        </div>
-        
-        <table class="table">
-            <thead>
-                <tr>
-                    <th>Item</th>
-                    <th>Quantity</th>
-                    <th>Rate</th>
-                    <th>Amount</th>
-                </tr>
-            </thead>
-            <tbody>
-                <tr>
-                    <td>General Item</td>
-                    <td>1</td>
-                    <td>₹{{ "%.2f"|format(sale.total_amount or 0) }}</td>
-                    <td>₹{{ "%.2f"|format(sale.total_amount or 0) }}</td>
-                </tr>
-            </tbody>
-        </table>
-        
-        <div class="total">
-            <p><strong>Total Amount: ₹{{ "%.2f"|format(sale.total_amount or 0) }}</strong></p>
-        </div>
-        
-        <div class="no-print" style="margin-top: 30px;">
-            <button onclick="window.print()">Print Bill</button>
-            <button onclick="window.close()">Close</button>
-        </div>
-    </body>
-    </html>
-    """, sale=sale) 
+    return render_fragment('print_sale', sale=sale) 
  
  
  
\ No newline at end of file
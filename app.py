@@ -18,6 +18,8 @@ import logging
 import random
 
 # Import models and routes
+from config import config
+from db_engine import engine_options
 from database import db
 from models import User, Company, Party, Item, Purchase, Sale, Cashbook, Bankbook
 from auth import auth_bp
@@ -32,42 +34,54 @@ from items_api import items_api
 from sales_api import sales_api
 from purchases_api import purchases_api
 from enhanced_api import enhanced_api
+import analytics_rollup  # registers the rollup maintenance flush hook
+import tenant_scope  # scopes ORM queries to the logged-in tenant
 from forms import LoginForm, RegistrationForm
 
-# Import new management systems
-from purchase_management import PurchaseManagementSystem
-from sales_management import SalesManagementSystem
-from inventory_management import InventoryManagementSystem
-from financial_management import FinancialManagementSystem
-from crate_management import CrateManagementSystem
-from packing_management import PackingManagementSystem
-from transport_management import TransportManagementSystem
-from gate_pass_management import GatePassManagementSystem
-from agent_management import AgentManagementSystem
-from bank_management import BankManagementSystem
-from schedule_management import ScheduleManagementSystem
-from narration_management import NarrationManagementSystem
-
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_app():
-    """Application factory pattern"""
+def create_app(config_name=None, overrides=None):
+    """Application factory pattern
+
+    ``overrides`` are applied on top of the configuration (tests point
+    SQLALCHEMY_DATABASE_URI at a scratch database this way).
+    """
     app = Flask(__name__)
     
-    # Configuration - Support both SQLite and PostgreSQL
-    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
+    # Configuration - config.py classes (SQLite for development, PostgreSQL
+    # for production), selected by name or FLASK_ENV; every setting has its
+    # default (and environment variable) there
+    config_name = config_name or os.environ.get('FLASK_ENV', 'default')
+    app.config.from_object(config.get(config_name, config['default']))
+    app.config['CONFIG_NAME'] = config_name  # Handed on to worker processes
     
-    # Database configuration - Force SQLite for development
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///business_web.db'
+    app.config.update(overrides or {})
     
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
-    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+    # Bearer tokens authenticate every @login_required view; a guessable
+    # signing key would let anyone forge them, so only development and
+    # testing may start without one (token login is then refused)
+    from token_auth import secret_configured
+    if not secret_configured(app.config) and config_name not in ('development', 'testing', 'default'):
+        raise RuntimeError("Set JWT_SECRET_KEY to a long random value before starting the application")
+    
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
     
     # Initialize extensions
     db.init_app(app)
+    from sqlite_profile import SQLiteProfile
+    SQLiteProfile(app)
+    from replica_routing import ReadReplica
+    ReadReplica(app)
+    from year_archive import YearArchive
+    YearArchive(app)
+    from sql_instrumentation import SQLInstrumentation
+    SQLInstrumentation(app)
+    from metrics import Metrics
+    Metrics(app)
+    from request_profiler import RequestProfiler
+    RequestProfiler(app)
     migrate = Migrate(app, db)
     CORS(app)
     
@@ -78,9 +92,17 @@ def create_app():
     login_manager.login_message = 'Please log in to access this page.'
     login_manager.login_message_category = 'info'
     
+    # Cached: the loader runs on every authenticated request
+    from user_cache import user_cache
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return user_cache.load(int(user_id))
+    
+    # Bearer tokens authenticate @login_required views too
+    from token_auth import load_user_from_request
+    login_manager.request_loader(load_user_from_request)
     
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/auth')
@@ -96,32 +118,36 @@ def create_app():
     app.register_blueprint(purchases_api, url_prefix='')
     app.register_blueprint(enhanced_api, url_prefix='/api/enhanced')
     
-    # Register new management system API blueprints
-    from purchase_management_api import purchase_management_api
-    from sales_management_api import sales_management_api
-    from inventory_management_api import inventory_management_api
-    from financial_management_api import financial_management_api
-    from crate_management_api import crate_management_bp
-    from packing_management_api import packing_management_bp
-    from transport_management_api import transport_management_bp
-    from gate_pass_management_api import gate_pass_management_bp
-    from agent_management_api import agent_management_bp
-    from bank_management_api import bank_management_bp
-    from schedule_management_api import schedule_management_bp
-    from narration_management_api import narration_management_bp
-    
-    app.register_blueprint(purchase_management_api, url_prefix='')
-    app.register_blueprint(sales_management_api, url_prefix='')
-    app.register_blueprint(inventory_management_api, url_prefix='')
-    app.register_blueprint(packing_management_bp, url_prefix='')
-    app.register_blueprint(financial_management_api, url_prefix='')
-    app.register_blueprint(crate_management_bp, url_prefix='')
-    app.register_blueprint(transport_management_bp, url_prefix='')
-    app.register_blueprint(gate_pass_management_bp, url_prefix='')
-    app.register_blueprint(agent_management_bp, url_prefix='')
-    app.register_blueprint(bank_management_bp, url_prefix='')
-    app.register_blueprint(schedule_management_bp, url_prefix='')
-    app.register_blueprint(narration_management_bp, url_prefix='')
+    from analytics_export_api import analytics_export_bp
+    app.register_blueprint(analytics_export_bp, url_prefix='')  # eager: it carries the analytics CLI group
+    
+    # Management system API blueprints are registered on the first request
+    from lazy_blueprints import LazyBlueprints
+    LazyBlueprints(app)
+    
+    # Command line tools
+    from fragments import fragments_cli
+    app.cli.add_command(fragments_cli)
+    from legacy_import import legacy_cli
+    app.cli.add_command(legacy_cli)
+    from column_groups import columns_cli
+    app.cli.add_command(columns_cli)
+    from sqlite_profile import sqlite_cli
+    app.cli.add_command(sqlite_cli)
+    from scale_data import scale_cli
+    app.cli.add_command(scale_cli)
+    from endpoint_benchmark import bench_cli
+    app.cli.add_command(bench_cli)
+    from schema_migrations import schema_cli, init_schema
+    app.cli.add_command(schema_cli)
+    from year_archive import year_cli
+    app.cli.add_command(year_cli)
+    
+    @app.cli.command('init-db')
+    def init_db():
+        """Create any missing tables; existing tables are left as they are"""
+        init_schema()
+        print("Database initialized successfully!")
     
     # Main routes
     @app.route('/')
@@ -671,8 +697,6 @@ def create_app():
     return app
 
 if __name__ == '__main__':
+    # Tables are created by "flask init-db" (or "python run.py --init-db")
     app = create_app()
-    with app.app_context():
-        db.create_all()
-        print("Database initialized successfully!")
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
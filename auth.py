@@ -7,8 +7,12 @@ from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import db, User
 from forms import LoginForm, RegistrationForm, UserForm
+from user_cache import invalidate_user
+from password_hashing import verify_password, benchmark, HashingBusy
+from token_auth import issue_tokens, rotate_refresh_token, revoke_refresh_token, TokenError
 from datetime import datetime
 import logging
+import click
 
 auth_bp = Blueprint('auth', __name__)
 logger = logging.getLogger(__name__)
@@ -22,7 +26,13 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user and user.check_password(form.password.data):
+        try:
+            valid = bool(user) and verify_password(user, form.password.data)
+        except HashingBusy:
+            flash('The server is busy, please try again in a moment.', 'error')
+            return render_template('auth/login.html', form=form), 503
+        
+        if valid:
             if user.is_active:
                 login_user(user, remember=form.remember_me.data)
                 user.last_login = datetime.utcnow()
@@ -103,6 +113,7 @@ def edit_profile():
         
         try:
             db.session.commit()
+            invalidate_user(current_user.id)
             flash('Profile updated successfully!', 'success')
             return redirect(url_for('auth.profile'))
         except Exception as e:
@@ -146,6 +157,7 @@ def edit_user(user_id):
         
         try:
             db.session.commit()
+            invalidate_user(user_id)
             flash('User updated successfully!', 'success')
             return redirect(url_for('auth.users'))
         except Exception as e:
@@ -172,6 +184,7 @@ def delete_user(user_id):
     try:
         db.session.delete(user)
         db.session.commit()
+        invalidate_user(user_id)
         flash('User deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -195,6 +208,7 @@ def toggle_user_status(user_id):
     
     try:
         db.session.commit()
+        invalidate_user(user_id)
         status = 'activated' if user.is_active else 'deactivated'
         return jsonify({'success': True, 'message': f'User {status} successfully'})
     except Exception as e:
@@ -212,7 +226,12 @@ def api_login():
         return jsonify({'success': False, 'message': 'Username and password required'}), 400
     
     user = User.query.filter_by(username=data['username']).first()
-    if user and user.check_password(data['password']):
+    try:
+        valid = bool(user) and verify_password(user, data['password'])
+    except HashingBusy as e:
+        return jsonify({'success': False, 'message': str(e)}), 503, {'Retry-After': '1'}
+    
+    if valid:
         if user.is_active:
             login_user(user)
             user.last_login = datetime.utcnow()
@@ -223,6 +242,61 @@ def api_login():
     else:
         return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
 
+@auth_bp.route('/api/token', methods=['POST'])
+def api_token():
+    """Issue an access/refresh token pair for API and handheld clients"""
+    data = request.get_json()
+    
+    if not data or 'username' not in data or 'password' not in data:
+        return jsonify({'success': False, 'message': 'Username and password required'}), 400
+    
+    user = User.query.filter_by(username=data['username']).first()
+    try:
+        valid = bool(user) and verify_password(user, data['password'])
+    except HashingBusy as e:
+        return jsonify({'success': False, 'message': str(e)}), 503, {'Retry-After': '1'}
+    
+    if valid:
+        if user.is_active:
+            user.last_login = datetime.utcnow()
+            try:
+                tokens = issue_tokens(user)
+            except TokenError as e:
+                return jsonify({'success': False, 'message': str(e)}), 503
+            return jsonify({'success': True, **tokens})
+        else:
+            return jsonify({'success': False, 'message': 'Account is deactivated'}), 403
+    else:
+        return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
+
+@auth_bp.route('/api/token/refresh', methods=['POST'])
+def api_token_refresh():
+    """Rotate a refresh token into a new token pair"""
+    data = request.get_json()
+    
+    if not data or 'refresh_token' not in data:
+        return jsonify({'success': False, 'message': 'Refresh token required'}), 400
+    
+    try:
+        tokens = rotate_refresh_token(data['refresh_token'])
+        return jsonify({'success': True, **tokens})
+    except TokenError as e:
+        return jsonify({'success': False, 'message': str(e)}), 401
+
+@auth_bp.route('/api/token/revoke', methods=['POST'])
+def api_token_revoke():
+    """Revoke a refresh token and every token rotated from the same login"""
+    data = request.get_json()
+    
+    if not data or 'refresh_token' not in data:
+        return jsonify({'success': False, 'message': 'Refresh token required'}), 400
+    
+    try:
+        revoke_refresh_token(data['refresh_token'])
+        return jsonify({'success': True, 'message': 'Token revoked'})
+    except TokenError as e:
+        return jsonify({'success': False, 'message': str(e)}), 401
+
 @auth_bp.route('/api/logout', methods=['POST'])
 @login_required
 def api_logout():
@@ -245,4 +319,13 @@ def check_auth():
         })
     else:
         return jsonify({'authenticated': False}), 401 
- 
\ No newline at end of file
+ 
+
+@auth_bp.cli.command('hash-benchmark')
+@click.option('--method', default=None, help='Werkzeug hash method (default: PASSWORD_HASH_METHOD)')
+@click.option('--seconds', type=float, default=5.0, help='Duration of each measurement')
+@click.option('--workers', type=int, default=None, help='Hashing pool size (default: CPU count)')
+def hash_benchmark_command(method, seconds, workers):
+    """Measure password-verification logins per second and per core"""
+    for key, value in benchmark(method, seconds, workers).items():
+        click.echo(f"{key}: {value}")
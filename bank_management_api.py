@@ -9,6 +9,7 @@ from bank_management import BankManagementSystem
 from database import db
 from models import User
 from flask_login import login_required, current_user
+from replica_routing import reporting
 import json
 from datetime import datetime, timedelta
 
@@ -400,6 +401,7 @@ def get_bank_reports(report_type):
 
 @bank_management_bp.route('/api/bank-export', methods=['GET'])
 @login_required
+@reporting
 def export_bank_data():
     """Export bank data"""
     try:
@@ -5,9 +5,30 @@ Based on Legacy Software Analysis
 
 from datetime import datetime, date
 from sqlalchemy import func, and_, or_
-from models import db, Party, Sale, Purchase, Cashbook, Ledger
+from sqlalchemy.orm import joinedload
+from models import db, Party, Sale, Purchase, Cashbook, Ledger, SalesDailyRollup, PurchaseDailyRollup
 from typing import Dict, List, Tuple, Optional
 
+def _with_archived_lines(query, column, measure, user_id: int, closed: Optional[date], as_of_date: date,
+                         *criteria) -> float:
+    """Sum of ``column`` over a bill-line query, including bills of closed financial years
+
+    Those bills are in the year archives, but the daily rollups keep their
+    totals (``measure``), so the working table is only summed after the
+    last closed day.
+    """
+    if closed is None:
+        return query.with_entities(func.sum(column)).scalar() or 0
+    
+    live = query.filter(column.class_.bill_date > closed).with_entities(func.sum(column)).scalar() or 0
+    rollup = measure.class_
+    archived = db.session.query(func.sum(measure)).filter(
+        rollup.user_id == user_id,
+        rollup.day <= min(closed, as_of_date),
+        *criteria
+    ).scalar() or 0
+    return live + archived
+
 class CreditBusinessLogic:
     """Credit-based business logic based on legacy analysis"""
     
@@ -20,13 +41,17 @@ class CreditBusinessLogic:
         if as_of_date is None:
             as_of_date = date.today()
         
+        from year_archive import across_years, closed_through
+        closed = closed_through(user_id)
+        
         # Get total sales for the party
         sales_query = Sale.query.filter(
             Sale.party_cd == party_cd,
             Sale.user_id == user_id,
             Sale.bill_date <= as_of_date
         )
-        total_sales = sales_query.with_entities(func.sum(Sale.sal_amt)).scalar() or 0
+        total_sales = _with_archived_lines(sales_query, Sale.sal_amt, SalesDailyRollup.amount, user_id,
+                                           closed, as_of_date, SalesDailyRollup.party_cd == party_cd)
         
         # Get total payments received for the party
         payments_query = Cashbook.query.filter(
@@ -35,7 +60,8 @@ class CreditBusinessLogic:
             Cashbook.date <= as_of_date,
             Cashbook.cr_amt > 0  # Only credit entries (payments received)
         )
-        total_payments = payments_query.with_entities(func.sum(Cashbook.cr_amt)).scalar() or 0
+        total_payments = sum(total or 0 for total, in across_years(
+            payments_query.with_entities(func.sum(Cashbook.cr_amt)), user_id, end=as_of_date))
         
         # Calculate balance
         current_balance = total_sales - total_payments
@@ -59,13 +85,17 @@ class CreditBusinessLogic:
         if as_of_date is None:
             as_of_date = date.today()
         
+        from year_archive import closed_through
+        closed = closed_through(user_id)
+        
         # Get total purchases for the item
         purchases_query = Purchase.query.filter(
             Purchase.it_cd == item_cd,
             Purchase.user_id == user_id,
             Purchase.bill_date <= as_of_date
         )
-        total_purchases = purchases_query.with_entities(func.sum(Purchase.qty)).scalar() or 0
+        total_purchases = _with_archived_lines(purchases_query, Purchase.qty, PurchaseDailyRollup.qty, user_id,
+                                               closed, as_of_date, PurchaseDailyRollup.it_cd == item_cd)
         
         # Get total sales for the item
         sales_query = Sale.query.filter(
@@ -73,7 +103,8 @@ class CreditBusinessLogic:
             Sale.user_id == user_id,
             Sale.bill_date <= as_of_date
         )
-        total_sales = sales_query.with_entities(func.sum(Sale.qty)).scalar() or 0
+        total_sales = _with_archived_lines(sales_query, Sale.qty, SalesDailyRollup.qty, user_id,
+                                           closed, as_of_date, SalesDailyRollup.it_cd == item_cd)
         
         # Calculate balance
         current_balance = total_purchases - total_sales
@@ -315,7 +346,7 @@ class CreditBusinessLogic:
         """
         Get list of pending payments
         """
-        query = Sale.query.filter(
+        query = Sale.query.options(joinedload(Sale.party)).filter(
             Sale.user_id == user_id,
             Sale.payment_status.in_(['PENDING', 'PARTIAL'])
         )
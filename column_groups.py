@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Column Groups
+Loader options for the wide Party and Item masters, and a load benchmark
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict
+import click
+from flask.cli import AppGroup
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, load_only, undefer_group
+from models import LEGACY_GROUP, User, Party, Item
+
+# Pickers only show code, name and a contact or price hint. Built on first
+# use: load_only() configures every mapper, which importing should not do
+@lru_cache(maxsize=None)
+def party_dropdown():
+    return load_only(Party.party_cd, Party.party_nm, Party.phone, Party.mobile, Party.place)
+
+
+@lru_cache(maxsize=None)
+def item_dropdown():
+    return load_only(Item.it_cd, Item.it_nm, Item.rate, Item.gst)
+
+
+# Detail views that show the legacy fields load them with the row
+WITH_LEGACY = undefer_group(LEGACY_GROUP)
+
+
+def _party_row(n: int) -> Dict:
+    row = {}
+    for column in Party.__table__.columns:
+        type_name = type(column.type).__name__
+        if type_name == 'String':
+            row[column.name] = f'{column.name}-{n}'[:column.type.length]
+        elif type_name == 'Float':
+            row[column.name] = float(n % 1000)
+        elif type_name == 'Integer':
+            row[column.name] = n % 100
+        elif type_name == 'Date':
+            row[column.name] = date(2024, 1, 1)
+        elif type_name == 'DateTime':
+            row[column.name] = datetime(2024, 1, 1)
+    row.update(party_cd=f'P{n:07d}', user_id=1)
+    return row
+
+
+def _measure(session: Session, query) -> Dict:
+    # Timed and traced in separate runs; tracemalloc slows allocation down
+    session.expunge_all()
+    started = time.perf_counter()
+    query.all()
+    elapsed = time.perf_counter() - started
+    session.expunge_all()
+
+    tracemalloc.start()
+    rows = query.all()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    session.expunge_all()
+    return {'ms': round(elapsed * 1000, 1), 'peak_mb': round(peak / 1024 / 1024, 1)}
+
+
+def benchmark(count: int = 50000) -> Dict[str, Dict]:
+    """Load ``count`` fully populated parties from a scratch SQLite database
+    with every column, with the hot group only, and with the dropdown columns
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        User.metadata.create_all(engine, tables=[User.__table__, Party.__table__])
+        with Session(engine) as session:
+            session.execute(insert(User.__table__), [{
+                'id': 1, 'username': 'bench', 'email': 'bench@example.com', 'password_hash': '-'
+            }])
+            for start in range(0, count, 5000):
+                session.execute(insert(Party.__table__),
+                                [_party_row(n) for n in range(start, min(start + 5000, count))])
+            session.commit()
+
+            # Warm the page cache so every variant reads from memory
+            session.query(Party).options(WITH_LEGACY).all()
+            results = {
+                'all columns (before)': _measure(session, session.query(Party).options(WITH_LEGACY)),
+                'hot group (after)': _measure(session, session.query(Party)),
+                'dropdown columns': _measure(session, session.query(Party).options(party_dropdown())),
+            }
+        engine.dispose()
+    return results
+
+
+columns_cli = AppGroup('columns', help='Hot/cold column groups of the master tables')
+
+@columns_cli.command('benchmark')
+@click.option('--count', type=int, default=50000, help='Parties to load')
+def benchmark_command(count):
+    """Print latency and peak memory of loading parties per column group"""
+    click.echo(f"{'load':24} {'ms':>9} {'peak MB':>9}")
+    for name, result in benchmark(count).items():
+        click.echo(f"{name:24} {result['ms']:>9.1f} {result['peak_mb']:>9.1f}")
@@ -9,6 +9,7 @@ from crate_management import CrateManagementSystem
 from database import db
 from models import User
 from flask_login import login_required, current_user
+from replica_routing import reporting
 import json
 from datetime import datetime, timedelta
 
@@ -400,6 +401,7 @@ def bulk_crate_transaction():
 
 @crate_management_bp.route('/api/crate/export-balances', methods=['GET'])
 @login_required
+@reporting
 def export_crate_balances():
     """Export crate balances to CSV/Excel"""
     try:
@@ -1,9 +1,12 @@
 from flask import Blueprint, jsonify, render_template_string
 from flask_login import login_required, current_user
+from fragments import render_fragment
+from lazy_load_guard import list_endpoint
+from db_engine import pool_metrics
 from models import db, Party, Item, Sale, Purchase
 from datetime import datetime, date, timedelta
 from sqlalchemy import func, desc
-import psutil
+from sqlalchemy.orm import joinedload
 import os
 
 dashboard_api = Blueprint('dashboard_api', __name__)
@@ -66,16 +69,19 @@ def dashboard_stats_purchases():
 # Recent Activity Feed
 @dashboard_api.route('/api/dashboard/activity')
 @login_required
+@list_endpoint
 def dashboard_activity():
     """Get recent activity feed"""
     try:
         # Get recent sales
-        recent_sales = Sale.query.filter_by(user_id=current_user.id)\
+        recent_sales = Sale.query.options(joinedload(Sale.party))\
+            .filter_by(user_id=current_user.id)\
             .order_by(desc(Sale.bill_date))\
             .limit(5).all()
         
         # Get recent purchases
-        recent_purchases = Purchase.query.filter_by(user_id=current_user.id)\
+        recent_purchases = Purchase.query.options(joinedload(Purchase.party))\
+            .filter_by(user_id=current_user.id)\
             .order_by(desc(Purchase.bill_date))\
             .limit(5).all()
         
@@ -108,33 +114,7 @@ def dashboard_activity():
         activities.sort(key=lambda x: x['date'], reverse=True)
         activities = activities[:10]  # Limit to 10 most recent
         
-        return render_template_string("""
-            {% if activities %}
-                {% for activity in activities %}
-                <div class="activity-item">
-                    <div class="d-flex align-items-center">
-                        <div class="activity-icon">
-                            <i class="{{ activity.icon }}"></i>
-                        </div>
-                        <div class="flex-grow-1">
-                            <div class="fw-bold">{{ activity.title }}</div>
-                            <div class="text-muted small">
-                                Bill: {{ activity.bill_no }} | ₹{{ "%.2f"|format(activity.amount) }}
-                            </div>
-                            <div class="text-muted small">
-                                {{ activity.date.strftime('%d %b %Y, %I:%M %p') }}
-                            </div>
-                        </div>
-                    </div>
-                </div>
-                {% endfor %}
-            {% else %}
-                <div class="text-center text-muted py-4">
-                    <i class="fas fa-history fa-3x mb-3"></i>
-                    <p>No recent activity</p>
-                </div>
-            {% endif %}
-        """, activities=activities)
+        return render_fragment('dashboard_activity', activities=activities)
     except Exception as e:
         print(f"Activity feed error: {e}")
         return "<div class='text-center text-muted py-4'>Error loading activity</div>"
@@ -149,29 +129,7 @@ def dashboard_top_parties():
             .order_by(desc(Party.opening_bal))\
             .limit(5).all()
         
-        return render_template_string("""
-            {% if parties %}
-                {% for party in parties %}
-                <div class="d-flex justify-content-between align-items-center mb-3">
-                    <div>
-                        <div class="fw-bold">{{ party.party_nm }}</div>
-                        <div class="text-muted small">{{ party.party_cd }}</div>
-                    </div>
-                    <div class="text-end">
-                        <div class="badge bg-{{ 'success' if party.bal_cd == 'C' else 'warning' }}">
-                            ₹{{ "%.2f"|format(party.opening_bal or 0) }}
-                        </div>
-                        <div class="text-muted small">{{ party.bal_cd }}</div>
-                    </div>
-                </div>
-                {% endfor %}
-            {% else %}
-                <div class="text-center text-muted py-4">
-                    <i class="fas fa-users fa-3x mb-3"></i>
-                    <p>No parties found</p>
-                </div>
-            {% endif %}
-        """, parties=parties)
+        return render_fragment('dashboard_top_parties', parties=parties)
     except Exception as e:
         print(f"Top parties error: {e}")
         return "<div class='text-center text-muted py-4'>Error loading parties</div>"
@@ -228,6 +186,8 @@ def dashboard_chart_data():
 @login_required
 def dashboard_system_health():
     """Get system health information"""
+    import psutil  # only this view needs it; kept out of every worker's startup
+
     try:
         # CPU usage
         cpu_percent = psutil.cpu_percent(interval=1)
@@ -314,6 +274,15 @@ def dashboard_system_health():
         print(f"System health error: {e}")
         return "<div class='text-center text-muted py-4'>Error loading system health</div>"
 
+# Database connection pool
+@dashboard_api.route('/api/dashboard/db-pool')
+@login_required
+def dashboard_db_pool():
+    """Connection pool gauges and checkout wait times (admins only)"""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Admin access required'}), 403
+    return jsonify({'success': True, 'pool': pool_metrics(db.engine)})
+
 # Notifications
 @dashboard_api.route('/api/dashboard/notifications')
 @login_required
@@ -376,45 +345,10 @@ def dashboard_notifications():
                 'time': 'Just now'
             })
         
-        return render_template_string("""
-            {% if notifications %}
-                {% for notification in notifications %}
-                <div class="notification-item alert-{{ notification.type }} mb-3">
-                    <div class="d-flex align-items-start">
-                        <div class="me-3">
-                            <i class="{{ notification.icon }} fa-lg text-{{ notification.type }}"></i>
-                        </div>
-                        <div class="flex-grow-1">
-                            <div class="fw-bold">{{ notification.title }}</div>
-                            <div class="small text-muted">{{ notification.message }}</div>
-                            <div class="small text-muted mt-1">{{ notification.time }}</div>
-                        </div>
-                    </div>
-                </div>
-                {% endfor %}
-            {% else %}
-                <div class="text-center text-muted py-4">
-                    <i class="fas fa-bell fa-3x mb-3"></i>
-                    <p>No notifications</p>
-                </div>
-            {% endif %}
-        """, notifications=notifications)
+        return render_fragment('dashboard_notifications', notifications=notifications)
     except Exception as e:
         print(f"Notifications error: {e}")
         # Return a fallback notification instead of error
-        return render_template_string("""
-            <div class="notification-item alert-info mb-3">
-                <div class="d-flex align-items-start">
-                    <div class="me-3">
-                        <i class="fas fa-info-circle fa-lg text-info"></i>
-                    </div>
-                    <div class="flex-grow-1">
-                        <div class="fw-bold">System Status</div>
-                        <div class="small text-muted">Dashboard is running normally</div>
-                        <div class="small text-muted mt-1">Just now</div>
-                    </div>
-                </div>
-            </div>
-        """) 
+        return render_fragment('dashboard_notifications_fallback') 
  
  
\ No newline at end of file
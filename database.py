@@ -1,3 +1,4 @@
 from flask_sqlalchemy import SQLAlchemy
+from replica_routing import RoutingSession
  
-db = SQLAlchemy() 
\ No newline at end of file
+db = SQLAlchemy(session_options={'class_': RoutingSession}) 
\ No newline at end of file
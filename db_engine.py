@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Database Engine
+Engine and connection-pool options from the config classes, with pool metrics
+"""
+
+import threading
+import time
+from typing import Dict
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    """Checkout counters of one pool: how often and how long requests waited"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited
+
+    The wait covers queueing for a free connection and, when the pool grows
+    into its overflow, opening the new connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+def engine_options(config) -> Dict:
+    """SQLALCHEMY_ENGINE_OPTIONS for ``config['SQLALCHEMY_DATABASE_URI']``
+
+    Server databases get a sized pool that is pinged before use (connections
+    dropped by a firewall or a server restart are replaced transparently) and
+    recycled before server-side idle timeouts; PostgreSQL additionally gets a
+    per-statement timeout so a runaway report cannot hold a connection for
+    ever. File-based SQLite keeps its defaults and only gains the checkout
+    metrics.
+    """
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite'):
+        if ':memory:' in uri or uri.rstrip('/') == 'sqlite:':
+            return {}
+        return {'poolclass': TimedQueuePool}
+
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 10),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+    timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+    if timeout and uri.startswith('postgresql'):
+        options['connect_args'] = {'options': f'-c statement_timeout={int(timeout)}'}
+    return options
+
+
+def pool_metrics(engine) -> Dict:
+    """Current pool occupancy plus checkout-wait counters"""
+    pool = engine.pool
+    metrics = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+        })
+    stats = getattr(pool, 'stats', None)
+    if stats is not None:
+        metrics.update({
+            'checkouts': stats.checkouts,
+            'checkout_timeouts': stats.timeouts,
+            'checkout_wait_ms_total': round(stats.wait_seconds_total * 1000, 3),
+            'checkout_wait_ms_avg': round(stats.wait_seconds_total * 1000 / (stats.checkouts + stats.timeouts), 3)
+                                    if stats.checkouts + stats.timeouts else 0.0,
+            'checkout_wait_ms_max': round(stats.wait_seconds_max * 1000, 3),
+        })
+    return metrics
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Endpoint Benchmark
+Drives the hot endpoints through the Flask test client and records latency
+percentiles and statement counts as a JSON baseline
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sql_instrumentation import capture_sql
+
+# name -> path; the views every clerk hits many times an hour
+ENDPOINTS: List[Tuple[str, str]] = [
+    ('sales_table', '/api/sales/table'),
+    ('purchases_table', '/api/purchases/table'),
+    ('trial_balance', '/api/financial/trial-balance'),
+    ('inventory_list', '/api/inventory/list?limit=50'),
+    ('dashboard_stats', '/api/dashboard/stats'),
+    ('party_search', '/api/parties/search?q=Traders'),
+]
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def logged_in_client(app, user_id: int):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def measure(client, path: str, iterations: int = 20, warmup: int = 2) -> Dict:
+    """Latency percentiles and statement counts of ``iterations`` GETs of ``path``
+
+    The body is read inside the timing and the statement capture, so streamed
+    responses are measured in full.
+    """
+    for _ in range(warmup):
+        client.get(path).get_data()
+
+    timings = []
+    queries = []
+    status = None
+    size = 0
+    for _ in range(iterations):
+        with capture_sql() as stats:
+            started = time.perf_counter()
+            response = client.get(path)
+            body = response.get_data()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(stats.count)
+        status = response.status_code
+        size = len(body)
+
+    return {
+        'path': path,
+        'status': status,
+        'iterations': iterations,
+        'p50_ms': round(_percentile(timings, 50), 2),
+        'p95_ms': round(_percentile(timings, 95), 2),
+        'mean_ms': round(sum(timings) / len(timings), 2),
+        'queries': max(queries),
+        'bytes': size,
+    }
+
+
+def run_benchmark(app, user_id: int, iterations: int = 20, warmup: int = 2,
+                  endpoints: Optional[List[Tuple[str, str]]] = None) -> Dict:
+    """Benchmark every endpoint as ``user_id``; the result is the baseline document"""
+    client = logged_in_client(app, user_id)
+    results = {}
+    for name, path in endpoints or ENDPOINTS:
+        results[name] = measure(client, path, iterations, warmup)
+    return {
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].rsplit('@', 1)[-1],
+        'user_id': user_id,
+        'endpoints': results,
+    }
+
+
+def compare(current: Dict, baseline: Dict) -> List[str]:
+    """One line per endpoint with p95 and statement count against the baseline"""
+    lines = []
+    for name, result in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            lines.append(f"{name:18} new")
+            continue
+        change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+        lines.append(f"{name:18} p95 {before['p95_ms']:>9.1f} -> {result['p95_ms']:>9.1f} ms ({change:+.0f}%)"
+                     f"   queries {before['queries']} -> {result['queries']}")
+    return lines
+
+
+def _default_user_id() -> int:
+    from models import User
+    from scale_data import USERNAME_PREFIX
+
+    user = User.query.filter(User.username.like(f'{USERNAME_PREFIX}%')).order_by(User.id).first()
+    if user is None:
+        raise click.ClickException('No generated tenant found; run "flask scale generate" or pass --user-id')
+    return user.id
+
+
+bench_cli = AppGroup('bench', help='Endpoint latency and query-count benchmarks')
+
+@bench_cli.command('run')
+@click.option('--user-id', type=int, default=None, help='Tenant to log in as (default: first generated tenant)')
+@click.option('--iterations', type=int, default=20)
+@click.option('--warmup', type=int, default=2)
+@click.option('--output', type=click.Path(dir_okay=False), default=None,
+              help='Baseline file to write (default: instance/benchmarks/baseline.json)')
+@click.option('--compare', 'compare_to', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='Earlier baseline to compare against')
+def run_command(user_id, iterations, warmup, output, compare_to):
+    """Benchmark the hot endpoints and write the JSON baseline"""
+    app = current_app._get_current_object()
+    result = run_benchmark(app, user_id or _default_user_id(), iterations, warmup)
+
+    click.echo(f"{'endpoint':18} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8}")
+    for name, row in result['endpoints'].items():
+        click.echo(f"{name:18} {row['status']:>6} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['queries']:>8}")
+    if compare_to:
+        with open(compare_to) as f:
+            for line in compare(result, json.load(f)):
+                click.echo(line)
+
+    output = output or os.path.join(app.instance_path, 'benchmarks', 'baseline.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    click.echo(f"Baseline written to {output}")
@@ -5,10 +5,14 @@ Based on Legacy Software Analysis
 
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
+from replica_routing import reporting
 from datetime import datetime, date
 from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import joinedload
 from models import db, Party, Sale, Purchase, Cashbook, Ledger, Item
 from business_logic import CreditBusinessLogic
+from year_archive import across_years, archived_years
+from lazy_load_guard import list_endpoint
 import logging
 
 # Configure logging
@@ -193,6 +197,7 @@ def add_sale_payment(sale_id):
 
 @enhanced_api.route('/sales/pending-payments', methods=['GET'])
 @login_required
+@list_endpoint
 def get_pending_payments():
     """Get all pending payments"""
     try:
@@ -293,25 +298,39 @@ def get_trial_balance():
 
 @enhanced_api.route('/ledger/year/<financial_year>', methods=['GET'])
 @login_required
+@list_endpoint
 def get_ledger_by_year(financial_year):
     """Get ledger entries for a specific financial year"""
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 50, type=int)
         
-        ledger_entries = Ledger.query.filter(
+        query = Ledger.query.filter(
             Ledger.user_id == current_user.id,
             Ledger.financial_year == financial_year
-        ).order_by(Ledger.date.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        ).options(joinedload(Ledger.party)).order_by(Ledger.date.desc())
+        
+        # Older entries are tagged with the calendar year they were posted in,
+        # so the archives of the year before may hold some of them too
+        year_start = int(financial_year.split('-')[0])
+        start_date, end_date = date(year_start, 1, 1), date(year_start + 1, 3, 31)
+        if archived_years(current_user.id, start_date, end_date):
+            rows = across_years(query, current_user.id, start_date, end_date)
+            rows.sort(key=lambda entry: entry.date, reverse=True)
+            total = len(rows)
+            items = rows[(page - 1) * per_page:page * per_page]
+            pages = -(-total // per_page)
+        else:
+            ledger_entries = query.paginate(page=page, per_page=per_page, error_out=False)
+            items, total, pages = ledger_entries.items, ledger_entries.total, ledger_entries.pages
         
         entries = []
-        for entry in ledger_entries.items:
+        for entry in items:
             entries.append({
                 'id': entry.id,
                 'date': entry.date.isoformat(),
                 'party_cd': entry.party_cd,
+                'party_nm': entry.party.party_nm if entry.party else None,
                 'narration': entry.narration,
                 'debit': entry.dr_amt,
                 'credit': entry.cr_amt,
@@ -325,8 +344,8 @@ def get_ledger_by_year(financial_year):
             'success': True,
             'data': {
                 'entries': entries,
-                'total': ledger_entries.total,
-                'pages': ledger_entries.pages,
+                'total': total,
+                'pages': pages,
                 'current_page': page,
                 'financial_year': financial_year
             }
@@ -340,6 +359,7 @@ def get_ledger_by_year(financial_year):
 
 @enhanced_api.route('/reports/party-statement/<party_cd>', methods=['GET'])
 @login_required
+@reporting
 def get_party_statement_report(party_cd):
     """Get comprehensive party statement report"""
     try:
@@ -384,6 +404,7 @@ def get_party_statement_report(party_cd):
 
 @enhanced_api.route('/reports/trial-balance/<financial_year>', methods=['GET'])
 @login_required
+@reporting
 def get_trial_balance_report(financial_year):
     """Get trial balance report for a financial year"""
     try:
@@ -406,6 +427,7 @@ def get_trial_balance_report(financial_year):
 
 @enhanced_api.route('/reports/sales-summary/<financial_year>', methods=['GET'])
 @login_required
+@reporting
 def get_sales_summary_report(financial_year):
     """Get sales summary report for a financial year"""
     try:
@@ -415,11 +437,11 @@ def get_sales_summary_report(financial_year):
         end_date = date(year_start + 1, 3, 31)  # March 31st
         
         # Get sales for the financial year
-        sales = Sale.query.filter(
+        sales = across_years(Sale.query.filter(
             Sale.user_id == current_user.id,
             Sale.bill_date >= start_date,
             Sale.bill_date <= end_date
-        ).all()
+        ), current_user.id, start_date, end_date)
         
         # Calculate summary
         total_sales = sum(sale.sal_amt for sale in sales)
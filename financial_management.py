@@ -10,8 +10,13 @@ import json
 from database import db
 from models import User, Party, Purchase, Sale, Cashbook, Bankbook
 from sqlalchemy import func, and_, or_, desc, asc
+from collections import defaultdict
+from year_archive import across_years, OPENING_VOUCHER
 import uuid
 
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
 class FinancialManagementSystem:
     """Complete Financial Management System with full functionality"""
     
@@ -218,7 +223,9 @@ class FinancialManagementSystem:
             if end_date:
                 query = query.filter(Cashbook.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
             
-            entries = query.order_by(desc(Cashbook.date)).all()
+            entries = across_years(query.order_by(desc(Cashbook.date)), user_id,
+                                   _parse_date(start_date), _parse_date(end_date))
+            entries.sort(key=lambda entry: entry.date, reverse=True)
             
             # Group by voucher number
             journal_entries = {}
@@ -274,7 +281,9 @@ class FinancialManagementSystem:
             if end_date:
                 query = query.filter(Cashbook.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
             
-            transactions = query.order_by(Cashbook.date).all()
+            transactions = across_years(query.order_by(Cashbook.date), user_id,
+                                        _parse_date(start_date), _parse_date(end_date))
+            transactions.sort(key=lambda transaction: transaction.date)
             
             # Calculate running balance
             opening_balance = float(account.opening_bal)
@@ -323,13 +332,14 @@ class FinancialManagementSystem:
             # Get all accounts
             accounts = Party.query.filter_by(user_id=user_id).all()
             
+            balances = self._account_balances_as_of(user_id, accounts, as_of)
+            
             trial_balance = []
             total_debit = 0
             total_credit = 0
             
             for account in accounts:
-                # Calculate account balance as of date
-                balance = self._calculate_account_balance_as_of(user_id, account.party_cd, as_of)
+                balance = balances[account.party_cd]
                 
                 if balance != 0:
                     if balance > 0:
@@ -390,10 +400,12 @@ class FinancialManagementSystem:
             ).all()
             
             # Calculate balances
+            balances = self._account_balances_as_of(user_id, assets + liabilities + equity, as_of)
+            
             total_assets = 0
             asset_details = []
             for asset in assets:
-                balance = self._calculate_account_balance_as_of(user_id, asset.party_cd, as_of)
+                balance = balances[asset.party_cd]
                 if balance > 0:
                     asset_details.append({
                         'account_code': asset.party_cd,
@@ -405,7 +417,7 @@ class FinancialManagementSystem:
             total_liabilities = 0
             liability_details = []
             for liability in liabilities:
-                balance = self._calculate_account_balance_as_of(user_id, liability.party_cd, as_of)
+                balance = balances[liability.party_cd]
                 if balance < 0:
                     liability_details.append({
                         'account_code': liability.party_cd,
@@ -417,7 +429,7 @@ class FinancialManagementSystem:
             total_equity = 0
             equity_details = []
             for eq in equity:
-                balance = self._calculate_account_balance_as_of(user_id, eq.party_cd, as_of)
+                balance = balances[eq.party_cd]
                 if balance < 0:
                     equity_details.append({
                         'account_code': eq.party_cd,
@@ -551,21 +563,23 @@ class FinancialManagementSystem:
                 Party.ledgtyp == 'ASSET'
             ).all()
             
-            total_assets = 0
-            for asset in assets:
-                balance = self._calculate_account_balance_as_of(user_id, asset.party_cd, date.today())
-                if balance > 0:
-                    total_assets += balance
-            
             # Get total liabilities
             liabilities = Party.query.filter(
                 Party.user_id == user_id,
                 Party.ledgtyp == 'LIABILITY'
             ).all()
             
+            balances = self._account_balances_as_of(user_id, assets + liabilities, date.today())
+            
+            total_assets = 0
+            for asset in assets:
+                balance = balances[asset.party_cd]
+                if balance > 0:
+                    total_assets += balance
+            
             total_liabilities = 0
             for liability in liabilities:
-                balance = self._calculate_account_balance_as_of(user_id, liability.party_cd, date.today())
+                balance = balances[liability.party_cd]
                 if balance < 0:
                     total_liabilities += abs(balance)
             
@@ -628,43 +642,38 @@ class FinancialManagementSystem:
         except:
             return 0
     
-    def _calculate_account_balance_as_of(self, user_id: int, account_code: str, as_of_date: date) -> float:
-        """Calculate account balance as of a specific date"""
-        try:
-            # Get opening balance
-            account = Party.query.filter_by(party_cd=account_code, user_id=user_id).first()
-            if not account:
-                return 0
-            
-            opening_balance = float(account.opening_bal)
-            
-            # Get transactions up to the date
-            transactions = Cashbook.query.filter(
-                Cashbook.user_id == user_id,
-                Cashbook.party_cd == account_code,
-                Cashbook.date <= as_of_date
-            ).all()
-            
-            balance = opening_balance
-            for transaction in transactions:
-                balance += float(transaction.cr_amt) - float(transaction.dr_amt)
-            
-            return balance
-            
-        except Exception as e:
-            return 0
+    def _account_balances_as_of(self, user_id: int, accounts: List[Party], as_of_date: date) -> Dict[str, float]:
+        """Balance of each account as of a date: opening balance plus its cashbook
+        movement, summed for all accounts in one grouped query (one per archived
+        year when the date falls in a closed year)"""
+        query = db.session.query(
+            Cashbook.party_cd,
+            func.sum(func.coalesce(Cashbook.cr_amt, 0) - func.coalesce(Cashbook.dr_amt, 0))
+        ).filter(
+            Cashbook.user_id == user_id,
+            Cashbook.date <= as_of_date
+        ).group_by(Cashbook.party_cd)
+        
+        movements = defaultdict(float)
+        for party_cd, movement in across_years(query, user_id, end=as_of_date):
+            movements[party_cd] += float(movement or 0)
+        
+        return {account.party_cd: float(account.opening_bal or 0) + movements[account.party_cd]
+                for account in accounts}
     
     def _calculate_account_balance_for_period(self, user_id: int, account_code: str, 
                                             start_date: date, end_date: date) -> float:
         """Calculate account balance for a specific period"""
         try:
-            # Get transactions for the period
-            transactions = Cashbook.query.filter(
+            # Get transactions for the period; balances brought forward are
+            # not movement of the period
+            transactions = across_years(Cashbook.query.filter(
                 Cashbook.user_id == user_id,
                 Cashbook.party_cd == account_code,
                 Cashbook.date >= start_date,
-                Cashbook.date <= end_date
-            ).all()
+                Cashbook.date <= end_date,
+                or_(Cashbook.voucher_type.is_(None), Cashbook.voucher_type != OPENING_VOUCHER)
+            ), user_id, start_date, end_date)
             
             balance = 0
             for transaction in transactions:
@@ -6,6 +6,7 @@ Flask Blueprint for comprehensive financial management functionality
 
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
+from replica_routing import reporting
 from financial_management import FinancialManagementSystem
 from datetime import datetime, date
 import json
@@ -130,6 +131,7 @@ def create_journal_entry():
 
 @financial_management_api.route('/api/financial/ledger', methods=['GET'])
 @login_required
+@reporting
 def get_ledger():
     """Get general ledger entries"""
     try:
@@ -199,6 +201,7 @@ def get_ledger():
 
 @financial_management_api.route('/api/financial/trial-balance', methods=['GET'])
 @login_required
+@reporting
 def get_trial_balance():
     """Get trial balance"""
     try:
@@ -216,6 +219,7 @@ def get_trial_balance():
 
 @financial_management_api.route('/api/financial/balance-sheet', methods=['GET'])
 @login_required
+@reporting
 def get_balance_sheet():
     """Get balance sheet"""
     try:
@@ -233,6 +237,7 @@ def get_balance_sheet():
 
 @financial_management_api.route('/api/financial/profit-loss', methods=['GET'])
 @login_required
+@reporting
 def get_profit_loss():
     """Get profit and loss statement"""
     try:
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Fragment Templates
+HTMX fragment templates, rendered from files through Jinja's compiled-template
+cache instead of from inline strings
+"""
+
+import time
+from typing import Dict, Iterator
+import click
+from flask import current_app, render_template, stream_template, template_rendered
+from flask.cli import AppGroup
+from sqlalchemy import func
+from database import db
+from models import Party, Item
+
+# Fragment name -> template under templates/fragments/
+FRAGMENTS = {
+    'parties_table': 'fragments/parties_table.html',
+    'sales_add_success': 'fragments/sales_add_success.html',
+    'sales_add_error': 'fragments/sales_add_error.html',
+    'dashboard_activity': 'fragments/dashboard_activity.html',
+    'dashboard_top_parties': 'fragments/dashboard_top_parties.html',
+    'dashboard_notifications': 'fragments/dashboard_notifications.html',
+    'dashboard_notifications_fallback': 'fragments/dashboard_notifications_fallback.html',
+    'print_sale': 'fragments/print_sale.html',
+    'sales_table': 'fragments/sales_table.html',
+    'purchases_table_rows': 'fragments/purchases_table_rows.html',
+    'items_table': 'fragments/items_table.html',
+}
+
+# Streamed fragments are flushed in chunks of about this many bytes
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# Rows fetched per round trip while streaming list fragments
+STREAM_YIELD_PER = 500
+
+# GET endpoints used by the benchmark to capture a real render context;
+# the other fragments are rendered with BENCHMARK_CONTEXTS
+BENCHMARK_URLS = {
+    'parties_table': '/api/parties/table',
+    'dashboard_activity': '/api/dashboard/activity',
+    'dashboard_top_parties': '/api/dashboard/top-parties',
+    'dashboard_notifications': '/api/dashboard/notifications',
+}
+
+BENCHMARK_CONTEXTS = {
+    'sales_add_success': {'bill_no': 1, 'total_amount': 1250.0, 'item_count': 3},
+    'sales_add_error': {'error': 'Invalid bill date'},
+    'dashboard_notifications_fallback': {},
+}
+
+
+def render_fragment(name: str, **context) -> str:
+    """Render a fragment (context processors and signals apply as usual)
+
+    ``render_template_string`` parsed and compiled its source on every call;
+    a template file is compiled once per process and then served from the
+    Jinja environment's cache (which also picks up edits under auto-reload).
+    """
+    return render_template(FRAGMENTS[name], **context)
+
+
+def stream_fragment(name: str, **context):
+    """Stream a registered fragment as a chunked response
+
+    Rows are rendered while the query is still being read, so the browser
+    starts painting the table at once and memory stays flat however many rows
+    there are. Pass iterators (for example ``query.yield_per(...)``) rather
+    than lists in ``context``.
+    """
+    return current_app.response_class(_buffered(stream_template(FRAGMENTS[name], **context)),
+                                      mimetype='text/html')
+
+
+def _buffered(chunks: Iterator[str], size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """Group Jinja's many tiny output pieces into fewer, larger writes"""
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def bill_summaries(model, query, user_id: int, sort: str = 'date') -> Iterator[Dict]:
+    """Yield one summary dict per bill of ``model`` (Sale or Purchase) matched by ``query``
+
+    ``query`` is the filtered line query of the list view. All lines of the
+    matching bills are read in one streamed, bill-ordered query (with party
+    and item names joined in) and folded into bills on the fly, instead of
+    loading the bills and querying each one's lines separately.
+    """
+    matching = query.with_entities(model.bill_no)
+    totals = db.session.query(
+        model.bill_no.label('bill_no'),
+        func.max(model.bill_date).label('bill_date'),
+        func.sum(model.sal_amt).label('total')
+    ).filter(
+        model.user_id == user_id,
+        model.bill_no.in_(matching)
+    ).group_by(model.bill_no).subquery()
+
+    if sort == 'amount':
+        order = [totals.c.total.desc()]
+    elif sort == 'customer':
+        order = [Party.party_nm]
+    elif sort == 'bill_no':
+        order = []
+    else:
+        order = [totals.c.bill_date.desc()]
+
+    lines = db.session.query(
+        model.bill_no, model.bill_date, model.party_cd, Party.party_nm,
+        model.it_cd, Item.it_nm, model.sal_amt
+    ).join(
+        totals, model.bill_no == totals.c.bill_no
+    ).outerjoin(
+        Party, Party.party_cd == model.party_cd
+    ).outerjoin(
+        Item, Item.it_cd == model.it_cd
+    ).filter(
+        model.user_id == user_id
+    ).order_by(*order, model.bill_no, model.id).yield_per(STREAM_YIELD_PER)
+
+    bill = None
+    for line in lines:
+        if bill is None or line.bill_no != bill['bill_no']:
+            if bill is not None:
+                yield bill
+            bill = {
+                'bill_no': line.bill_no,
+                'bill_date': line.bill_date,
+                'party_cd': line.party_cd,
+                'party_nm': line.party_nm or line.party_cd,
+                'item_names': [],
+                'item_count': 0,
+                'total': 0.0
+            }
+        bill['item_count'] += 1
+        bill['total'] += line.sal_amt or 0
+        if len(bill['item_names']) < 3:
+            bill['item_names'].append(line.it_nm or line.it_cd)
+    if bill is not None:
+        yield bill
+
+
+def benchmark(app, user_id: int, repeat: int = 200) -> Dict[str, Dict]:
+    """Compare per-request compile cost (what render_template_string paid) with render cost
+
+    Render contexts come from real requests made as ``user_id`` through the
+    test client, so the render timings reflect that tenant's data.
+    """
+    env = app.jinja_env
+    contexts = {name: dict(context) for name, context in BENCHMARK_CONTEXTS.items()}
+    paths = {path: name for name, path in FRAGMENTS.items()}
+
+    def capture(sender, template, context, **extra):
+        if template.name in paths:
+            contexts[paths[template.name]] = dict(context)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    with template_rendered.connected_to(capture, app):
+        for url in BENCHMARK_URLS.values():
+            client.get(url)
+
+    results = {}
+    for name, path in FRAGMENTS.items():
+        source = env.loader.get_source(env, path)[0]
+        started = time.perf_counter()
+        for _ in range(repeat):
+            env.from_string(source)
+        compile_ms = (time.perf_counter() - started) * 1000 / repeat
+
+        render_ms = None
+        if name in contexts:
+            template = env.get_template(path)
+            with app.test_request_context():
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    template.render(contexts[name])
+                render_ms = (time.perf_counter() - started) * 1000 / repeat
+
+        results[name] = {'compile_ms': round(compile_ms, 3),
+                         'render_ms': round(render_ms, 3) if render_ms is not None else None}
+    return results
+
+
+fragments_cli = AppGroup('fragments', help='HTMX fragment templates')
+
+@fragments_cli.command('benchmark')
+@click.option('--user-id', type=int, required=True, help='Tenant whose data fills the fragments')
+@click.option('--repeat', type=int, default=200, help='Compiles/renders per fragment')
+def benchmark_command(user_id, repeat):
+    """Print compile versus render time per fragment"""
+    click.echo(f"{'fragment':36} {'compile ms':>11} {'render ms':>10}")
+    for name, result in benchmark(current_app._get_current_object(), user_id, repeat).items():
+        render = f"{result['render_ms']:.3f}" if result['render_ms'] is not None else 'n/a'
+        click.echo(f"{name:36} {result['compile_ms']:>11.3f} {render:>10}")
@@ -9,6 +9,7 @@ from gate_pass_management import GatePassManagementSystem
 from database import db
 from models import User
 from flask_login import login_required, current_user
+from replica_routing import reporting
 import json
 from datetime import datetime, timedelta
 
@@ -382,6 +383,7 @@ def bulk_import_gate_passes():
 
 @gate_pass_management_bp.route('/api/gate-pass/export', methods=['GET'])
 @login_required
+@reporting
 def export_gate_pass_data():
     """Export gate pass data"""
     try:
@@ -9,6 +9,7 @@ from typing import Dict, List, Optional, Tuple
 import json
 from database import db
 from models import Item, Purchase, Sale, User
+from column_groups import WITH_LEGACY
 from sqlalchemy import func, and_, or_, desc, asc
 import uuid
 
@@ -128,7 +129,7 @@ class InventoryManagementSystem:
     def get_inventory_item(self, user_id: int, item_code: str) -> Dict:
         """Get inventory item details"""
         try:
-            item = Item.query.filter_by(it_cd=item_code, user_id=user_id).first()
+            item = Item.query.options(WITH_LEGACY).filter_by(it_cd=item_code, user_id=user_id).first()
             if not item:
                 return {'success': False, 'error': 'Item not found'}
             
@@ -630,4 +631,71 @@ class InventoryManagementSystem:
             }
             
         except Exception as e:
-            return {'success': False, 'error': str(e)} 
\ No newline at end of file
+            return {'success': False, 'error': str(e)}     
+    def get_stock_list(self, user_id: int, category: str = None, status: str = None,
+                       limit: int = 50, offset: int = 0) -> Dict:
+        """Items with their current stock for the inventory page, one page at a time
+
+        Purchases in and sales out are summed per item in two grouped
+        subqueries, so a page costs a count and one select however many
+        items it shows.
+        """
+        try:
+            purchased = db.session.query(
+                Purchase.it_cd, func.sum(Purchase.qty).label('qty')
+            ).filter(Purchase.user_id == user_id).group_by(Purchase.it_cd).subquery()
+            sold = db.session.query(
+                Sale.it_cd, func.sum(Sale.qty).label('qty')
+            ).filter(Sale.user_id == user_id).group_by(Sale.it_cd).subquery()
+            
+            current_qty = (func.coalesce(Item.opening_stock, 0) +
+                           func.coalesce(purchased.c.qty, 0) -
+                           func.coalesce(sold.c.qty, 0)).label('current_qty')
+            
+            query = Item.query.filter(Item.user_id == user_id)
+            if category:
+                query = query.filter(Item.category == category)
+            # Items carry no status of their own; every item is active
+            if status and status != 'ACTIVE':
+                query = query.filter(db.false())
+            
+            total_count = query.order_by(None).count()
+            rows = query.with_entities(
+                Item.it_cd, Item.it_nm, Item.category, Item.unit, Item.rate,
+                Item.reorder_level, Item.hsn, Item.gst, Item.created_date, current_qty
+            ).outerjoin(purchased, purchased.c.it_cd == Item.it_cd) \
+             .outerjoin(sold, sold.c.it_cd == Item.it_cd) \
+             .order_by(Item.it_cd).limit(limit).offset(offset).all()
+            
+            items = []
+            for row in rows:
+                qty = float(row.current_qty or 0)
+                rate = float(row.rate or 0)
+                items.append({
+                    'it_cd': row.it_cd,
+                    'it_nm': row.it_nm,
+                    'category': row.category,
+                    'unit': row.unit,
+                    'current_qty': qty,
+                    'current_rate': rate,
+                    'current_value': qty * rate,
+                    'min_stock': float(row.reorder_level or 0),
+                    'max_stock': 0.0,
+                    'hsn_code': row.hsn,
+                    'gst_rate': float(row.gst or 0),
+                    'location': None,
+                    'status': 'ACTIVE',
+                    'created_date': row.created_date.isoformat() if row.created_date else None
+                })
+            
+            return {
+                'success': True,
+                'items': items,
+                'total_count': total_count,
+                'limit': limit,
+                'offset': offset,
+                'has_more': (offset + limit) < total_count
+            }
+            
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
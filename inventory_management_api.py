@@ -122,83 +122,19 @@ def get_stock_movements():
 def get_inventory_list():
     """Get list of inventory items with filters"""
     try:
-        import sqlite3
-        
         # Get query parameters
         category = request.args.get('category')
         status = request.args.get('status', 'ACTIVE')
         limit = request.args.get('limit', 50, type=int)
         offset = request.args.get('offset', 0, type=int)
         
-        # Build query
-        query = '''
-            SELECT 
-                it_cd, it_nm, category, unit, current_qty, current_rate, current_value,
-                min_stock, max_stock, hsn_code, gst_rate, location, status, created_date
-            FROM inventory 
-            WHERE user_id = ?
-        '''
-        params = [current_user.id]
-        
-        if category:
-            query += ' AND category = ?'
-            params.append(category)
-        
-        if status:
-            query += ' AND status = ?'
-            params.append(status)
-        
-        query += ' ORDER BY it_cd LIMIT ? OFFSET ?'
-        params.extend([limit, offset])
-        
-        # Execute query
-        conn = sqlite3.connect(ims.db_path)
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        
-        # Get total count
-        count_query = '''
-            SELECT COUNT(*) FROM inventory WHERE user_id = ?
-        '''
-        count_params = [current_user.id]
-        
-        if category:
-            count_query += ' AND category = ?'
-            count_params.append(category)
-        
-        if status:
-            count_query += ' AND status = ?'
-            count_params.append(status)
-        
-        cursor.execute(count_query, count_params)
-        total_count = cursor.fetchone()[0]
-        
-        conn.close()
-        
-        # Format results
-        columns = ['it_cd', 'it_nm', 'category', 'unit', 'current_qty', 'current_rate', 
-                  'current_value', 'min_stock', 'max_stock', 'hsn_code', 'gst_rate', 
-                  'location', 'status', 'created_date']
-        
-        items = []
-        for row in rows:
-            item = dict(zip(columns, [
-                row[0], row[1], row[2], row[3], float(row[4] or 0), float(row[5] or 0),
-                float(row[6] or 0), float(row[7] or 0), float(row[8] or 0), row[9],
-                float(row[10] or 0), row[11], row[12], row[13]
-            ]))
-            items.append(item)
-        
-        return jsonify({
-            'success': True,
-            'items': items,
-            'total_count': total_count,
-            'limit': limit,
-            'offset': offset,
-            'has_more': (offset + limit) < total_count
-        }), 200
+        result = ims.get_stock_list(current_user.id, category, status, limit, offset)
         
+        if result['success']:
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 400
+            
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template, request, jsonify, render_template_string, current_app
 from flask_login import login_required, current_user
+from replica_routing import reporting
+from fragments import stream_fragment, STREAM_YIELD_PER
 from sqlalchemy import or_, and_, desc
 from datetime import datetime
 from database import db
@@ -100,11 +102,8 @@ def items_table():
         else:
             query = query.order_by(Item.it_cd)
         
-        # Get all items for this user (no pagination for now)
-        items = query.all()
-        print(f"Items after filters: {len(items)}")
-        
-        if not items:
+        # Get all items for this user (no pagination for now); rows are streamed
+        if query.first() is None:
             print("No items found - creating sample items")
             # Create some sample items for the user
             sample_items = [
@@ -167,7 +166,7 @@ def items_table():
                 db.session.commit()
                 print(f"Created {len(sample_items)} sample items")
                 # Re-query items
-                items = Item.query.filter_by(user_id=current_user.id).order_by(Item.it_cd).all()
+                query = Item.query.filter_by(user_id=current_user.id).order_by(Item.it_cd)
             except Exception as e:
                 print(f"Error creating sample items: {e}")
                 db.session.rollback()
@@ -199,110 +198,7 @@ def items_table():
                 </div>
                 '''
         
-        if not items:
-            return '''
-            <div class="table-responsive">
-                <table class="table table-hover mb-0">
-                    <thead class="table-dark">
-                        <tr>
-                            <th>Code</th>
-                            <th>Name</th>
-                            <th>Category</th>
-                            <th>Price</th>
-                            <th>Stock</th>
-                            <th>GST</th>
-                            <th>Actions</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        <tr>
-                            <td colspan="7" class="text-center py-4">
-                                <div class="text-muted">
-                                    <i class="fas fa-box-open fa-3x mb-3"></i>
-                                    <h5>No items found</h5>
-                                    <p>Try adjusting your search criteria or add a new item.</p>
-                                </div>
-                            </td>
-                        </tr>
-                    </tbody>
-                </table>
-            </div>
-            '''
-        
-        # Build complete table HTML
-        table_html = f'''
-        <div class="table-responsive">
-            <table class="table table-hover mb-0">
-                <thead class="table-dark">
-                    <tr>
-                        <th>Code</th>
-                        <th>Name</th>
-                        <th>Category</th>
-                        <th>Price</th>
-                        <th>Stock</th>
-                        <th>GST</th>
-                        <th>Actions</th>
-                    </tr>
-                </thead>
-                <tbody>
-        '''
-        
-        for item in items:
-            # Determine stock badge class
-            stock_class = 'success'
-            if not item.closing_stock or item.closing_stock == 0:
-                stock_class = 'danger'
-            elif item.closing_stock <= 10:
-                stock_class = 'warning'
-            
-            table_html += f'''
-                    <tr>
-                        <td>
-                            <span class="item-code-badge">{item.it_cd}</span>
-                        </td>
-                        <td>
-                            <div>
-                                <strong>{item.it_nm}</strong>
-                                {f'<br><small class="text-muted">Unit: {item.unit}</small>' if item.unit else ''}
-                            </div>
-                        </td>
-                        <td>{item.category or 'N/A'}</td>
-                        <td>₹{f'{item.rate:.2f}' if item.rate else '0.00'}</td>
-                        <td>
-                            <span class="stock-badge {stock_class}">
-                                {item.closing_stock or 0}
-                            </span>
-                        </td>
-                        <td>{f'{item.gst:.1f}' if item.gst else '0.0'}%</td>
-                        <td>
-                            <div class="action-buttons">
-                                <button class="btn-action btn-view" 
-                                        data-item-code="{item.it_cd}"
-                                        title="View Item">
-                                    <i class="fas fa-eye"></i>
-                                </button>
-                                <button class="btn-action btn-edit" 
-                                        data-item-code="{item.it_cd}"
-                                        title="Edit Item">
-                                    <i class="fas fa-edit"></i>
-                                </button>
-                                <button class="btn-action btn-delete" 
-                                        onclick="deleteItem('{item.it_cd}')"
-                                        title="Delete Item">
-                                    <i class="fas fa-trash"></i>
-                                </button>
-                            </div>
-                        </td>
-                    </tr>
-            '''
-        
-        table_html += '''
-                </tbody>
-            </table>
-        </div>
-        '''
-        
-        return table_html
+        return stream_fragment('items_table', items=query.yield_per(STREAM_YIELD_PER))
         
     except Exception as e:
         print(f"Items table error: {e}")
@@ -686,6 +582,7 @@ def items_delete(item_code):
 
 @items_api.route('/api/items/export')
 @login_required
+@reporting
 def items_export():
     """Export items to CSV"""
     try:
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Lazy Blueprints
+Imports and registers the management-system blueprints when the first
+request arrives instead of while the app is being created
+"""
+
+import importlib
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (module, blueprint attribute); half of all URL rules live in these, and
+# compiling them is most of what create_app() costs
+MANAGEMENT_BLUEPRINTS: List[Tuple[str, str]] = [
+    ('purchase_management_api', 'purchase_management_api'),
+    ('sales_management_api', 'sales_management_api'),
+    ('inventory_management_api', 'inventory_management_api'),
+    ('packing_management_api', 'packing_management_bp'),
+    ('financial_management_api', 'financial_management_api'),
+    ('crate_management_api', 'crate_management_bp'),
+    ('transport_management_api', 'transport_management_bp'),
+    ('gate_pass_management_api', 'gate_pass_management_bp'),
+    ('agent_management_api', 'agent_management_bp'),
+    ('bank_management_api', 'bank_management_bp'),
+    ('schedule_management_api', 'schedule_management_bp'),
+    ('narration_management_api', 'narration_management_bp'),
+]
+
+
+class LazyBlueprints:
+    """Registers a set of blueprints just before the first request is handled
+
+    CLI commands, the reloader and shells never import the management
+    modules or compile their routes. With ``LAZY_BLUEPRINTS`` off they are
+    registered right away, which is what a server that forks workers from a
+    preloaded app wants; ``load()`` does the same on demand. Flask refuses
+    new routes once a request has been handled, so the registration happens
+    in a WSGI wrapper, ahead of the request that triggers it.
+    """
+
+    def __init__(self, app=None, blueprints: Optional[List[Tuple[str, str]]] = None):
+        self.blueprints = list(blueprints or MANAGEMENT_BLUEPRINTS)
+        self.loaded = False
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['lazy_blueprints'] = self
+        if not app.config.get('LAZY_BLUEPRINTS', True):
+            self.load()
+            return
+
+        wsgi_app = app.wsgi_app
+
+        def load_then_dispatch(environ, start_response):
+            if not self.loaded:
+                self.load()
+            return wsgi_app(environ, start_response)
+
+        app.wsgi_app = load_then_dispatch
+
+    def load(self):
+        """Import and register every pending blueprint; safe to call twice"""
+        with self._lock:
+            if self.loaded:
+                return
+            started = time.perf_counter()
+            for module_name, attribute in self.blueprints:
+                blueprint = getattr(importlib.import_module(module_name), attribute)
+                self.app.register_blueprint(blueprint, url_prefix='')
+            self.loaded = True
+        logger.info(f"Registered {len(self.blueprints)} management blueprints "
+                    f"in {(time.perf_counter() - started) * 1000:.0f} ms")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Lazy Load Guard
+Debug-mode check that list endpoints load their relationships eagerly
+"""
+
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_guarded: ContextVar = ContextVar('lazy_load_guard', default=None)
+
+
+class LazyLoadError(RuntimeError):
+    """A relationship was lazy loaded inside a guarded block (one SELECT per row)"""
+
+
+@contextmanager
+def no_lazy_loads(where: str):
+    """Raise ``LazyLoadError`` if a relationship lazy load runs a query in this block"""
+    token = _guarded.set(where)
+    try:
+        yield
+    finally:
+        _guarded.reset(token)
+
+
+def list_endpoint(f):
+    """Mark a view that renders many rows; with the guard on (debug mode or
+    ``LAZY_LOAD_GUARD``) any lazy load it triggers raises instead of running
+    the query, so a missing ``joinedload``/``selectinload`` shows up in
+    development rather than as an N+1 in production
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not (current_app.debug or current_app.config.get('LAZY_LOAD_GUARD')):
+            return f(*args, **kwargs)
+        with no_lazy_loads(f.__name__):
+            return f(*args, **kwargs)
+    return decorated_function
+
+
+def _describe(execute_state) -> str:
+    parent = execute_state.lazy_loaded_from.class_.__name__
+    targets = ', '.join(mapper.class_.__name__ for mapper in execute_state.all_mappers)
+    return f'{parent} -> {targets}'
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _refuse_lazy_load(execute_state):
+    where: Optional[str] = _guarded.get()
+    # Eager strategies (selectinload, subqueryload) are relationship loads
+    # too, but only a lazy load carries the instance it was fired from
+    if where is None or execute_state.lazy_loaded_from is None:
+        return
+    message = (f'Lazy load {_describe(execute_state)} in list endpoint {where}; '
+               f'add joinedload/selectinload to the query')
+    # Views often swallow exceptions into a fallback response, so log it as well
+    logger.error(message)
+    raise LazyLoadError(message)
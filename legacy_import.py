@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+"""
+Legacy Data Import System
+Streams the legacy DOS system's DBF tables into the web application's models
+"""
+
+import os
+import hashlib
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Iterator, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import insert, update, delete, select, bindparam
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import Party, Item, Purchase, Sale, Cashbook, LegacyImportCheckpoint, LegacyRowHash
+from analytics_rollup import ROLLUP_MODELS, add_line_delta, apply_deltas
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_ENCODING = 'cp437'
+
+# Legacy table -> model, candidate DBF file names, legacy field aliases, the
+# natural key identifying a source row across runs, and import stage. Fields
+# not listed in ``aliases`` map onto the model column with the same name, which covers most of the legacy layout since the
+# models kept the DOS field names (party_cd, ly_baln, sal_amt, tot_smt, ...).
+# Tables in the same stage do not depend on each other and run in parallel.
+LEGACY_TABLES = {
+    'parties': {
+        'model': Party,
+        'files': ['PARTY.DBF', 'PARTIES.DBF', 'PARTYMST.DBF'],
+        'aliases': {'name': 'party_nm', 'party_name': 'party_nm', 'phone_no': 'phone', 'gst_no': 'gstin'},
+        'key_fields': ['party_cd'],
+        'stage': 1,
+    },
+    'items': {
+        'model': Item,
+        'files': ['ITEM.DBF', 'ITEMS.DBF', 'ITEMMST.DBF'],
+        'aliases': {'item_cd': 'it_cd', 'item_nm': 'it_nm', 'it_name': 'it_nm', 'hsn_cd': 'hsn'},
+        'key_fields': ['it_cd'],
+        'stage': 1,
+    },
+    'purchases': {
+        'model': Purchase,
+        'files': ['PURCHASE.DBF', 'PUR.DBF'],
+        'aliases': {'billno': 'bill_no', 'bill_dt': 'bill_date', 'date': 'bill_date', 'amount': 'sal_amt'},
+        'key_fields': ['bill_no', 'bill_date', 'party_cd', 'it_cd'],
+        'stage': 2,
+    },
+    'sales': {
+        'model': Sale,
+        'files': ['SALE.DBF', 'SALES.DBF'],
+        'aliases': {'billno': 'bill_no', 'bill_dt': 'bill_date', 'date': 'bill_date', 'amount': 'sal_amt'},
+        'key_fields': ['bill_no', 'bill_date', 'party_cd', 'it_cd'],
+        'stage': 2,
+    },
+    'cashbook': {
+        'model': Cashbook,
+        'files': ['CASHBOOK.DBF', 'CASH.DBF'],
+        'aliases': {'narr': 'narration', 'dr': 'dr_amt', 'cr': 'cr_amt', 'vtype': 'voucher_type', 'vno': 'voucher_no'},
+        'key_fields': ['date', 'party_cd', 'voucher_type', 'voucher_no'],
+        'stage': 2,
+    },
+}
+
+
+class LegacyImportSystem:
+    """Chunked, resumable import and incremental re-sync of legacy DBF tables for one tenant
+
+    The initial import bulk-inserts ``chunk_size`` rows at a time. Each chunk
+    is committed in the same transaction as its ``LegacyImportCheckpoint`` row
+    and the ``LegacyRowHash`` rows of its source records, so an interrupted
+    import resumes exactly after the last committed chunk.
+
+    Later runs (``sync_table``) compare each source row's content hash with the
+    stored one and only write the inserts, updates and deletes, so the database
+    work is proportional to the change volume. A DBF file whose size and
+    modification time are unchanged since the last run is skipped unread.
+    """
+
+    def __init__(self, source_dir: str, user_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 encoding: str = DEFAULT_ENCODING):
+        self.source_dir = source_dir
+        self.user_id = user_id
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        self.logger = logging.getLogger(__name__)
+
+    def find_source_file(self, table_name: str) -> Optional[str]:
+        """Locate the table's DBF file, matching names case-insensitively"""
+        available = {name.upper(): name for name in os.listdir(self.source_dir)}
+        for candidate in LEGACY_TABLES[table_name]['files']:
+            if candidate in available:
+                return os.path.join(self.source_dir, available[candidate])
+        return None
+
+    # ==================== INITIAL IMPORT ====================
+
+    def import_table(self, table_name: str, restart: bool = False) -> Dict:
+        """Import one legacy table, resuming from its checkpoint if there is one"""
+        spec = LEGACY_TABLES[table_name]
+        path = self.find_source_file(table_name)
+        if path is None:
+            return self._result(table_name, 'missing')
+
+        checkpoint = self._get_checkpoint(table_name, path, restart)
+        if checkpoint.completed:
+            return self._result(table_name, 'already imported', inserted=checkpoint.rows_imported,
+                                skipped=checkpoint.rows_skipped)
+
+        resume_from = checkpoint.rows_read
+        if resume_from:
+            self.logger.info(f"Resuming {table_name} after {resume_from} records")
+
+        chunk = []
+        rows_read = 0
+        skipped = 0
+        for row, key, row_hash in self._source_rows(path, spec):
+            rows_read += 1
+            if rows_read <= resume_from:
+                continue  # Still mapped so duplicate-key numbering matches the first run
+            if row is None:
+                skipped += 1
+            else:
+                chunk.append((key, row_hash, row))
+
+            if len(chunk) >= self.chunk_size:
+                self._commit_import_chunk(spec['model'], table_name, checkpoint, chunk, rows_read, skipped)
+                chunk, skipped = [], 0
+
+        self._commit_import_chunk(spec['model'], table_name, checkpoint, chunk, rows_read, skipped,
+                                  completed=True)
+        self.logger.info(f"Imported {checkpoint.rows_imported} {table_name} rows from {path}")
+        return self._result(table_name, 'imported', inserted=checkpoint.rows_imported,
+                            skipped=checkpoint.rows_skipped)
+
+    def _commit_import_chunk(self, model, table_name: str, checkpoint: LegacyImportCheckpoint,
+                             chunk: List[Tuple], rows_read: int, skipped: int, completed: bool = False):
+        """Insert one chunk and advance the checkpoint in a single transaction"""
+        try:
+            if chunk:
+                self._insert_rows(model, table_name, chunk)
+            checkpoint.rows_read = rows_read
+            checkpoint.rows_imported = (checkpoint.rows_imported or 0) + len(chunk)
+            checkpoint.rows_skipped = (checkpoint.rows_skipped or 0) + skipped
+            checkpoint.completed = completed
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    # ==================== INCREMENTAL RE-SYNC ====================
+
+    def sync_table(self, table_name: str) -> Dict:
+        """Apply only the inserts, updates and deletes since the last import/sync"""
+        spec = LEGACY_TABLES[table_name]
+        model = spec['model']
+        path = self.find_source_file(table_name)
+        if path is None:
+            return self._result(table_name, 'missing')
+
+        signature = self._signature(path)
+        checkpoint = LegacyImportCheckpoint.query.filter_by(
+            user_id=self.user_id, table_name=table_name
+        ).first()
+        if checkpoint and not checkpoint.completed:
+            raise ValueError(f"The initial {table_name} import is incomplete; finish it with 'flask legacy import' first")
+        if checkpoint and checkpoint.source_signature == signature:
+            return self._result(table_name, 'unchanged')
+
+        # source_key -> row_hash for everything imported so far; keys still
+        # left in the dict after the scan no longer exist in the source
+        known = dict(db.session.query(LegacyRowHash.source_key, LegacyRowHash.row_hash).filter(
+            LegacyRowHash.user_id == self.user_id,
+            LegacyRowHash.table_name == table_name
+        ))
+        if not known and checkpoint and checkpoint.rows_imported:
+            raise ValueError(self._unhashed_message(table_name))
+
+        # Updates write only the columns the DBF carries, so fields maintained
+        # in the web application (credit limits, contact details, ...) survive
+        source_columns = self._source_columns(path, spec)
+        inserts, updates = [], []
+        counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'skipped': 0}
+        rows_read = 0
+        for row, key, row_hash in self._source_rows(path, spec):
+            rows_read += 1
+            if row is None:
+                counts['skipped'] += 1
+                continue
+
+            stored_hash = known.pop(key, None)
+            if stored_hash == row_hash:
+                continue
+            if stored_hash is None:
+                inserts.append((key, row_hash, row))
+            else:
+                updates.append((key, row_hash, {name: row[name] for name in source_columns}))
+
+            if len(inserts) >= self.chunk_size:
+                self._commit_sync(model, table_name, inserts=inserts)
+                counts['inserted'] += len(inserts)
+                inserts = []
+            if len(updates) >= self.chunk_size:
+                self._commit_sync(model, table_name, updates=updates)
+                counts['updated'] += len(updates)
+                updates = []
+
+        self._commit_sync(model, table_name, inserts=inserts, updates=updates)
+        counts['inserted'] += len(inserts)
+        counts['updated'] += len(updates)
+
+        removed = list(known.keys())
+        for start in range(0, len(removed), self.chunk_size):
+            batch = removed[start:start + self.chunk_size]
+            self._commit_sync(model, table_name, deletes=batch)
+            counts['deleted'] += len(batch)
+
+        if checkpoint is None:
+            checkpoint = LegacyImportCheckpoint(user_id=self.user_id, table_name=table_name,
+                                                rows_imported=0, rows_skipped=0)
+            db.session.add(checkpoint)
+        checkpoint.source_file = path
+        checkpoint.source_signature = signature
+        checkpoint.rows_read = rows_read
+        checkpoint.rows_imported = (checkpoint.rows_imported or 0) + counts['inserted']
+        checkpoint.completed = True
+        db.session.commit()
+
+        self.logger.info(f"Synced {table_name}: {counts}")
+        return self._result(table_name, 'synced', **counts)
+
+    def _commit_sync(self, model, table_name: str, inserts: List[Tuple] = None,
+                     updates: List[Tuple] = None, deletes: List[str] = None):
+        """Write one batch of changes, its row hashes and rollup deltas in one transaction"""
+        if not (inserts or updates or deletes):
+            return
+        try:
+            if inserts:
+                self._insert_rows(model, table_name, inserts)
+            if updates:
+                self._update_rows(model, table_name, updates)
+            if deletes:
+                self._delete_rows(model, table_name, deletes)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    # ==================== ROW WRITERS ====================
+
+    def _insert_rows(self, model, table_name: str, chunk: List[Tuple]):
+        table = model.__table__
+        pk = self._primary_key(model)
+        rows = [row for _, _, row in chunk]
+
+        if pk.autoincrement is True:
+            result = db.session.execute(insert(table).returning(pk, sort_by_parameter_order=True), rows)
+            target_ids = [str(row[0]) for row in result]
+        else:
+            db.session.execute(insert(table), rows)
+            target_ids = [str(row[pk.name]) for row in rows]
+
+        db.session.execute(insert(LegacyRowHash.__table__), [{
+            'user_id': self.user_id,
+            'table_name': table_name,
+            'source_key': key,
+            'row_hash': row_hash,
+            'target_id': target_id
+        } for (key, row_hash, _), target_id in zip(chunk, target_ids)])
+
+        if model in ROLLUP_MODELS:
+            deltas = {}
+            for row in rows:
+                add_line_delta(deltas, model, row, sign=1)
+            apply_deltas(db.session.connection(), deltas)
+
+    def _update_rows(self, model, table_name: str, chunk: List[Tuple]):
+        table = model.__table__
+        pk = self._primary_key(model)
+        target_ids = self._target_ids(table_name, [key for key, _, _ in chunk])
+        chunk = [(key, row_hash, row) for key, row_hash, row in chunk if key in target_ids]
+        if not chunk:
+            return
+        old_rows = self._stored_rows(model, [target_ids[key] for key, _, _ in chunk])
+
+        # The rows hold only the source columns (see sync_table)
+        columns = [name for name in chunk[0][2] if name not in ('user_id', pk.name)]
+        if columns:
+            stmt = update(table).where(pk == bindparam('_target_id')).values(
+                {name: bindparam(f'_v_{name}') for name in columns}
+            )
+            db.session.execute(stmt, [
+                dict({f'_v_{name}': row[name] for name in columns},
+                     _target_id=self._cast_pk(pk, target_ids[key]))
+                for key, _, row in chunk
+            ])
+
+        hash_table = LegacyRowHash.__table__
+        db.session.execute(
+            update(hash_table).where(
+                hash_table.c.user_id == self.user_id,
+                hash_table.c.table_name == table_name,
+                hash_table.c.source_key == bindparam('_key')
+            ).values(row_hash=bindparam('_hash')),
+            [{'_key': key, '_hash': row_hash} for key, row_hash, _ in chunk]
+        )
+
+        if model in ROLLUP_MODELS:
+            deltas = {}
+            for key, _, row in chunk:
+                old = old_rows.get(target_ids[key])
+                if old is None:
+                    continue
+                add_line_delta(deltas, model, old, sign=-1)
+                add_line_delta(deltas, model, dict(old, **row), sign=1)
+            apply_deltas(db.session.connection(), deltas)
+
+    def _delete_rows(self, model, table_name: str, keys: List[str]):
+        table = model.__table__
+        pk = self._primary_key(model)
+        target_ids = self._target_ids(table_name, keys)
+        ids = list(target_ids.values())
+
+        if model in ROLLUP_MODELS:
+            deltas = {}
+            for old in self._stored_rows(model, ids).values():
+                add_line_delta(deltas, model, old, sign=-1)
+            apply_deltas(db.session.connection(), deltas)
+
+        db.session.execute(delete(table).where(pk.in_([self._cast_pk(pk, i) for i in ids])))
+        hash_table = LegacyRowHash.__table__
+        db.session.execute(delete(hash_table).where(
+            hash_table.c.user_id == self.user_id,
+            hash_table.c.table_name == table_name,
+            hash_table.c.source_key.in_(keys)
+        ))
+
+    def _target_ids(self, table_name: str, keys: List[str]) -> Dict[str, str]:
+        return dict(db.session.query(LegacyRowHash.source_key, LegacyRowHash.target_id).filter(
+            LegacyRowHash.user_id == self.user_id,
+            LegacyRowHash.table_name == table_name,
+            LegacyRowHash.source_key.in_(keys)
+        ))
+
+    def _stored_rows(self, model, target_ids: List[str]) -> Dict[str, Dict]:
+        """Current column values of imported rows, keyed by target id"""
+        table = model.__table__
+        pk = self._primary_key(model)
+        result = db.session.execute(
+            select(table).where(pk.in_([self._cast_pk(pk, i) for i in target_ids]))
+        ).mappings()
+        return {str(row[pk.name]): dict(row) for row in result}
+
+    @staticmethod
+    def _primary_key(model):
+        return list(model.__table__.primary_key.columns)[0]
+
+    @staticmethod
+    def _cast_pk(pk, value: str):
+        return int(value) if pk.autoincrement is True else value
+
+    # ==================== SOURCE READING ====================
+
+    def _source_rows(self, path: str, spec: Dict) -> Iterator[Tuple[Optional[Dict], Optional[str], Optional[str]]]:
+        """Yield (row, source_key, row_hash) per DBF record; row is None when rejected
+
+        Rows sharing the same natural key are told apart by their order in the
+        file, so repeated identical lines (two bags of the same item on one
+        bill) keep stable keys between runs.
+        """
+        table = self._open(path)
+        map_record, source_columns = self._field_mapper(spec['model'], spec['aliases'], table.field_names)
+        key_fields = spec['key_fields']
+        occurrences = defaultdict(int)
+
+        for record in table:
+            row = map_record(record)
+            if row is None:
+                yield None, None, None
+                continue
+
+            natural_key = '|'.join('' if row.get(name) is None else str(row[name]) for name in key_fields)
+            occurrences[natural_key] += 1
+            key = f'{natural_key}#{occurrences[natural_key]}'
+            content = repr(tuple(row[name] for name in source_columns))
+            yield row, key, hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _source_columns(self, path: str, spec: Dict) -> List[str]:
+        """The model columns the DBF at ``path`` provides (its header only is read)"""
+        return self._field_mapper(spec['model'], spec['aliases'], self._open(path).field_names)[1]
+
+    def _open(self, path: str):
+        """Open a DBF for streaming (records are read lazily; deleted ones are left out)"""
+        from dbfread import DBF
+
+        return DBF(path, encoding=self.encoding, lowernames=True, recfactory=dict,
+                   char_decode_errors='replace', ignore_missing_memofile=True)
+
+    def _field_mapper(self, model, aliases: Dict, field_names: List[str]):
+        """Build a function turning one DBF record into an insert dict for ``model``
+
+        Every dict carries the same keys (executemany requires it); missing
+        values fall back to the column's scalar default. Records without a
+        value for a required column are rejected. Also returns the columns the
+        DBF actually provides, in model order.
+        """
+        table = model.__table__
+        columns = [c for c in table.columns
+                   if c.name not in ('user_id', 'created_date', 'modified_date')
+                   and not (c.primary_key and c.autoincrement is True)]
+        defaults = {c.name: c.default.arg for c in columns
+                    if c.default is not None and c.default.is_scalar}
+        required = [c.name for c in columns if not c.nullable and c.name not in defaults]
+        provided = {aliases.get(name, name) for name in field_names}
+        source_columns = [c.name for c in columns if c.name in provided]
+        user_id = self.user_id
+
+        def map_record(record: Dict) -> Optional[Dict]:
+            values = {}
+            for field, value in record.items():
+                values[aliases.get(field, field)] = value
+
+            row = {'user_id': user_id}
+            for column in columns:
+                value = values.get(column.name)
+                if isinstance(value, str):
+                    value = value.strip() or None
+                if value is None:
+                    value = defaults.get(column.name)
+                row[column.name] = value
+
+            if any(row[name] is None for name in required):
+                return None
+            return row
+
+        return map_record, source_columns
+
+    # ==================== CHECKPOINTS ====================
+
+    @staticmethod
+    def _signature(path: str) -> str:
+        stat = os.stat(path)
+        return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+    @staticmethod
+    def _result(table_name: str, status: str, inserted: int = 0, updated: int = 0,
+                deleted: int = 0, skipped: int = 0) -> Dict:
+        return {'table': table_name, 'status': status, 'inserted': inserted or 0,
+                'updated': updated, 'deleted': deleted, 'skipped': skipped or 0}
+
+    @staticmethod
+    def _unhashed_message(table_name: str) -> str:
+        return (f"{table_name} was imported without row hashes, so its imported rows cannot be told "
+                f"apart; delete this tenant's {table_name} rows, then re-import it with --restart")
+
+    def clear_import(self, table_name: str):
+        """Delete what earlier imports of the table wrote: its rows (and their
+        rollup cells), row hashes and checkpoint, in chunks"""
+        model = LEGACY_TABLES[table_name]['model']
+        checkpoint = LegacyImportCheckpoint.query.filter_by(
+            user_id=self.user_id, table_name=table_name
+        ).first()
+        if checkpoint is None:
+            return
+        keys = [key for (key,) in db.session.query(LegacyRowHash.source_key).filter(
+            LegacyRowHash.user_id == self.user_id,
+            LegacyRowHash.table_name == table_name
+        )]
+        table = model.__table__
+        if not keys and checkpoint.rows_imported and db.session.execute(
+                select(table.c.user_id).where(table.c.user_id == self.user_id).limit(1)).first():
+            raise ValueError(self._unhashed_message(table_name))
+
+        try:
+            for start in range(0, len(keys), self.chunk_size):
+                self._commit_sync(model, table_name, deletes=keys[start:start + self.chunk_size])
+        except IntegrityError:
+            raise ValueError(f"Other rows still refer to the imported {table_name} rows; "
+                             f"restart the tables that refer to them as well")
+        db.session.delete(checkpoint)
+        db.session.commit()
+        self.logger.info(f"Deleted {len(keys)} previously imported {table_name} rows")
+
+    def _get_checkpoint(self, table_name: str, path: str, restart: bool) -> LegacyImportCheckpoint:
+        signature = self._signature(path)
+
+        checkpoint = LegacyImportCheckpoint.query.filter_by(
+            user_id=self.user_id, table_name=table_name
+        ).first()
+
+        if checkpoint and restart:
+            self.clear_import(table_name)
+            checkpoint = None
+
+        if checkpoint and not checkpoint.completed and checkpoint.source_signature != signature:
+            raise ValueError(
+                f"{path} changed since the interrupted {table_name} import started; "
+                f"re-run with --restart, which deletes the {table_name} rows imported so far"
+            )
+
+        if checkpoint is None:
+            checkpoint = LegacyImportCheckpoint(
+                user_id=self.user_id,
+                table_name=table_name,
+                source_file=path,
+                source_signature=signature,
+                rows_read=0,
+                rows_imported=0,
+                rows_skipped=0,
+                completed=False
+            )
+            db.session.add(checkpoint)
+            db.session.commit()
+
+        return checkpoint
+
+
+def _table_worker(app_config: Tuple[str, Dict], source_dir: str, user_id: int, table_name: str,
+                  chunk_size: int, encoding: str, mode: str, restart: bool) -> Dict:
+    """Process-pool entry point: each worker gets its own app and connection pool
+
+    ``app_config`` is the parent's (config name, overrides), so every worker
+    writes to the database the import was started against.
+    """
+    from app import create_app
+
+    app = create_app(*app_config)
+    with app.app_context():
+        return _run_table(LegacyImportSystem(source_dir, user_id, chunk_size=chunk_size, encoding=encoding),
+                          table_name, mode, restart)
+
+
+def _run_table(system: 'LegacyImportSystem', table_name: str, mode: str, restart: bool) -> Dict:
+    if mode == 'sync':
+        return system.sync_table(table_name)
+    return system.import_table(table_name, restart=restart)
+
+
+def run_import(source_dir: str, user_id: int, tables: List[str] = None,
+               chunk_size: int = DEFAULT_CHUNK_SIZE, encoding: str = DEFAULT_ENCODING,
+               workers: int = 1, restart: bool = False, mode: str = 'import') -> List[Dict]:
+    """Import (or, with ``mode='sync'``, re-sync) the selected tables stage by
+    stage, in parallel within a stage"""
+    tables = tables or list(LEGACY_TABLES.keys())
+    unknown = [name for name in tables if name not in LEGACY_TABLES]
+    if unknown:
+        raise ValueError(f"Unknown legacy table(s): {', '.join(unknown)}")
+
+    if restart and mode == 'import':
+        # Cleared up front, referring tables (later stages) first, so no row
+        # is left pointing at a deleted one
+        system = LegacyImportSystem(source_dir, user_id, chunk_size=chunk_size, encoding=encoding)
+        for name in sorted(tables, key=lambda name: LEGACY_TABLES[name]['stage'], reverse=True):
+            system.clear_import(name)
+        restart = False
+
+    results = []
+    for stage in sorted({LEGACY_TABLES[name]['stage'] for name in tables}):
+        stage_tables = [name for name in tables if LEGACY_TABLES[name]['stage'] == stage]
+
+        if workers > 1 and len(stage_tables) > 1:
+            app_config = (current_app.config.get('CONFIG_NAME'),
+                          {'SQLALCHEMY_DATABASE_URI': current_app.config['SQLALCHEMY_DATABASE_URI']})
+            with ProcessPoolExecutor(max_workers=min(workers, len(stage_tables))) as pool:
+                futures = [pool.submit(_table_worker, app_config, source_dir, user_id, name,
+                                       chunk_size, encoding, mode, restart)
+                           for name in stage_tables]
+                results.extend(future.result() for future in futures)
+        else:
+            system = LegacyImportSystem(source_dir, user_id, chunk_size=chunk_size, encoding=encoding)
+            results.extend(_run_table(system, name, mode, restart) for name in stage_tables)
+
+    return results
+
+
+def run_sync(source_dir: str, user_id: int, tables: List[str] = None,
+             chunk_size: int = DEFAULT_CHUNK_SIZE, encoding: str = DEFAULT_ENCODING,
+             workers: int = 1) -> List[Dict]:
+    """Apply only what changed in the DBF files since the last import/sync"""
+    return run_import(source_dir, user_id, tables, chunk_size=chunk_size, encoding=encoding,
+                      workers=workers, mode='sync')
+
+
+def _cli_options(command):
+    for option in reversed([
+        click.argument('source_dir', type=click.Path(exists=True, file_okay=False)),
+        click.option('--user-id', type=int, required=True, help='Tenant that receives the imported rows'),
+        click.option('--tables', default='', help=f"Comma separated subset of: {', '.join(LEGACY_TABLES)}"),
+        click.option('--chunk-size', type=int, default=None, help='Rows per bulk write/commit'),
+        click.option('--workers', type=int, default=1, help='Parallel processes for independent tables'),
+        click.option('--encoding', default=None, help='DBF character encoding (DOS code page)'),
+    ]):
+        command = option(command)
+    return command
+
+
+def _cli_run(source_dir, user_id, tables, chunk_size, workers, encoding, **kwargs):
+    selected = [t.strip() for t in tables.split(',') if t.strip()]
+    results = run_import(
+        source_dir, user_id, selected or None,
+        chunk_size=chunk_size or current_app.config.get('LEGACY_IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE),
+        encoding=encoding or current_app.config.get('LEGACY_IMPORT_ENCODING', DEFAULT_ENCODING),
+        workers=workers,
+        **kwargs
+    )
+    for result in results:
+        click.echo(f"{result['table']}: {result['status']} ({result['inserted']} inserted, "
+                   f"{result['updated']} updated, {result['deleted']} deleted, {result['skipped']} skipped)")
+
+
+legacy_cli = AppGroup('legacy', help='Legacy DOS system data import')
+
+@legacy_cli.command('import')
+@_cli_options
+@click.option('--restart', is_flag=True,
+              help='Delete the rows imported so far and start the tables from the beginning')
+def import_command(source_dir, user_id, tables, chunk_size, workers, encoding, restart):
+    """Import legacy DBF tables from SOURCE_DIR"""
+    _cli_run(source_dir, user_id, tables, chunk_size, workers, encoding, restart=restart)
+
+@legacy_cli.command('sync')
+@_cli_options
+def sync_command(source_dir, user_id, tables, chunk_size, workers, encoding):
+    """Re-sync imported tables with SOURCE_DIR, writing only changed rows"""
+    _cli_run(source_dir, user_id, tables, chunk_size, workers, encoding, mode='sync')
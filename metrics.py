@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Metrics
+Prometheus ``/metrics`` endpoint: request latency histograms, in-flight
+requests, SQL, pool, cache and background job gauges, aggregated across
+worker processes
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from flask import Response, g, request
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds (seconds) of the latency buckets; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Seconds between snapshot writes of one worker in multiprocess mode
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# name: (type, help). Gauges are summed over live workers only; counters and
+# histograms also keep the totals of workers that have exited
+METRICS = {
+    'http_requests_total': ('counter', 'Requests served, by route, method and status'),
+    'http_request_duration_seconds': ('histogram', 'Request latency until the response is handed to the server'),
+    'http_requests_in_flight': ('gauge', 'Requests currently being handled'),
+    'db_statements_total': ('counter', 'SQL statements executed while handling requests, by route'),
+    'db_statement_seconds_total': ('counter', 'Time spent in SQL statements while handling requests, by route'),
+    'db_pool_size': ('gauge', 'Configured connections of the pool'),
+    'db_pool_checked_out': ('gauge', 'Connections currently checked out'),
+    'db_pool_overflow': ('gauge', 'Connections open beyond the pool size'),
+    'db_pool_checkouts_total': ('counter', 'Connection checkouts'),
+    'db_pool_checkout_timeouts_total': ('counter', 'Checkouts that gave up waiting for a connection'),
+    'db_pool_checkout_wait_seconds_total': ('counter', 'Time spent waiting for a connection'),
+    'cache_hits_total': ('counter', 'Cache lookups answered from the cache'),
+    'cache_misses_total': ('counter', 'Cache lookups that went to the database'),
+    'cache_entries': ('gauge', 'Entries currently cached'),
+    'background_jobs_queued': ('gauge', 'Jobs admitted to a background pool and waiting for a worker'),
+    'background_jobs_active': ('gauge', 'Jobs admitted to a background pool (queued or running)'),
+    'background_jobs_rejected_total': ('counter', 'Jobs refused because the pool was saturated'),
+    'sqlite_wal_pages': ('gauge', 'Pages in the WAL at the last background checkpoint'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _labels(**labels) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class ProcessMetrics:
+    """Counters, gauges and histograms of this worker process"""
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        # [count per bucket..., +Inf count, sum]
+        self.histograms: Dict[str, Dict[Labels, List[float]]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _labels(**labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def add_gauge(self, name: str, value: float, **labels):
+        key = _labels(**labels)
+        with self._lock:
+            series = self.gauges.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(**labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            values = series.get(key)
+            if values is None:
+                values = series[key] = [0.0] * (len(self.buckets) + 2)
+            values[bisect_left(self.buckets, value)] += 1
+            values[-1] += value
+
+    def snapshot(self, collected: Iterable[Sample] = ()) -> Dict:
+        """JSON-ready copy, with the collector samples of this moment merged in"""
+        with self._lock:
+            data = {
+                'counters': {name: [[dict(key), v] for key, v in series.items()]
+                             for name, series in self.counters.items()},
+                'gauges': {name: [[dict(key), v] for key, v in series.items()]
+                           for name, series in self.gauges.items()},
+                'histograms': {name: [[dict(key), list(v)] for key, v in series.items()]
+                               for name, series in self.histograms.items()},
+            }
+        for name, labels, value in collected:
+            kind = 'gauges' if METRICS[name][0] == 'gauge' else 'counters'
+            data[kind].setdefault(name, []).append([labels, value])
+        return data
+
+
+def _merge(snapshots: Iterable[Tuple[Dict, bool]], buckets: Tuple[float, ...]) -> Dict:
+    counters: Dict[str, Dict[Labels, float]] = {}
+    gauges: Dict[str, Dict[Labels, float]] = {}
+    histograms: Dict[str, Dict[Labels, List[float]]] = {}
+    for data, alive in snapshots:
+        for name, series in data.get('counters', {}).items():
+            merged = counters.setdefault(name, {})
+            for labels, value in series:
+                key = _labels(**labels)
+                merged[key] = merged.get(key, 0) + value
+        if alive:
+            for name, series in data.get('gauges', {}).items():
+                merged = gauges.setdefault(name, {})
+                for labels, value in series:
+                    key = _labels(**labels)
+                    merged[key] = merged.get(key, 0) + value
+        for name, series in data.get('histograms', {}).items():
+            merged = histograms.setdefault(name, {})
+            for labels, values in series:
+                key = _labels(**labels)
+                if len(values) != len(buckets) + 2:
+                    continue
+                current = merged.setdefault(key, [0.0] * len(values))
+                for i, value in enumerate(values):
+                    current[i] += value
+    return {'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def exposition(merged: Dict, buckets: Tuple[float, ...]) -> str:
+    """Prometheus text format (version 0.0.4) of merged metrics"""
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        if kind == 'histogram':
+            series = merged['histograms'].get(name)
+        else:
+            series = merged['counters' if kind == 'counter' else 'gauges'].get(name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels in sorted(series):
+            values = series[labels]
+            if kind != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(values)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + (float('inf'),), values[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', le),))} {_format_value(cumulative)}")
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(values[-1])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {_format_value(cumulative)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MultiprocessStore:
+    """One JSON snapshot file per worker in a shared directory
+
+    Workers rewrite their own file (atomically, at most every
+    ``flush_interval`` seconds); a scrape reads every file and sums them, so
+    whichever worker answers ``/metrics`` reports the whole server. Gauges of
+    workers that have exited are dropped, their counters are kept. The
+    directory should be emptied when the server (not a single worker) starts.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._last_flush = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def path(self) -> str:
+        # Resolved on every write: forked workers must not share the parent's file
+        return os.path.join(self.directory, f'metrics_{os.getpid()}.json')
+
+    def due(self) -> bool:
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def write(self, snapshot: Dict):
+        self._last_flush = time.monotonic()
+        path = self.path
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+
+    def read(self) -> List[Tuple[Dict, bool]]:
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics_*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics file {path}: {e}")
+                continue
+            pid = int(os.path.basename(path)[len('metrics_'):-len('.json')])
+            snapshots.append((data, _pid_alive(pid)))
+        return snapshots
+
+
+def clear_multiprocess_dir(directory: str):
+    """Remove the snapshots of a previous server run"""
+    for path in glob.glob(os.path.join(directory, 'metrics_*.json*')):
+        os.remove(path)
+
+
+def _engine_samples(engine, role: str) -> List[Sample]:
+    from db_engine import pool_metrics
+
+    pool = pool_metrics(engine)
+    labels = {'engine': role}
+    samples = []
+    for name, key in (('db_pool_size', 'size'), ('db_pool_checked_out', 'checked_out'),
+                      ('db_pool_overflow', 'overflow'), ('db_pool_checkouts_total', 'checkouts'),
+                      ('db_pool_checkout_timeouts_total', 'checkout_timeouts')):
+        if key in pool:
+            samples.append((name, labels, pool[key]))
+    if 'checkout_wait_ms_total' in pool:
+        samples.append(('db_pool_checkout_wait_seconds_total', labels, pool['checkout_wait_ms_total'] / 1000))
+    return samples
+
+
+def default_collectors(app) -> List[Callable[[], List[Sample]]]:
+    """Pool, cache, background job and WAL readings taken at flush/scrape time"""
+
+    def pools():
+        from database import db
+        samples = _engine_samples(db.engine, 'primary')
+        replica = app.extensions.get('read_replica')
+        if replica is not None and replica.engine is not None:
+            samples += _engine_samples(replica.engine, 'replica')
+        return samples
+
+    def caches():
+        from user_cache import user_cache
+        labels = {'cache': 'user'}
+        return [('cache_hits_total', labels, user_cache.hits),
+                ('cache_misses_total', labels, user_cache.misses),
+                ('cache_entries', labels, len(user_cache._entries))]
+
+    def jobs():
+        from password_hashing import current_pool
+        pool = current_pool()
+        if pool is None:
+            return []
+        labels = {'pool': 'password_hash'}
+        return [('background_jobs_queued', labels, pool.queued),
+                ('background_jobs_active', labels, pool.admitted),
+                ('background_jobs_rejected_total', labels, pool.rejected)]
+
+    def wal():
+        profile = app.extensions.get('sqlite_profile')
+        checkpointer = getattr(profile, 'checkpointer', None)
+        if checkpointer is None or checkpointer.last_result is None:
+            return []
+        return [('sqlite_wal_pages', {}, checkpointer.last_result['log_pages'])]
+
+    return [pools, caches, jobs, wal]
+
+
+class Metrics:
+    """Records every request and serves ``/metrics``
+
+    Latency is measured from ``before_request`` to ``after_request``; the body
+    of a streamed response is sent afterwards and is not included, nor are
+    its SQL statements. Routes are labelled by blueprint and endpoint name
+    (not the raw path), so the series stay bounded. With ``METRICS_DIR`` set
+    every worker's numbers go through a ``MultiprocessStore``; otherwise the
+    endpoint reports the process that answers it.
+    """
+
+    def __init__(self, app=None):
+        self.process = ProcessMetrics()
+        self.store: Optional[MultiprocessStore] = None
+        self.collectors: List[Callable[[], List[Sample]]] = []
+        self.token = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+        self.token = app.config.get('METRICS_TOKEN')
+        self.collectors = default_collectors(app)
+        directory = app.config.get('METRICS_DIR')
+        if directory:
+            self.store = MultiprocessStore(directory, app.config.get('METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL))
+            atexit.register(self._flush_at_exit, app)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+        app.extensions['metrics'] = self
+
+    def _start(self):
+        if request.endpoint == 'metrics':
+            return
+        g._metrics_started = time.perf_counter()
+        self.process.add_gauge('http_requests_in_flight', 1)
+
+    def _finish(self, response):
+        started = g.get('_metrics_started')
+        if started is None:
+            return response
+
+        route = {'blueprint': request.blueprint or 'app', 'endpoint': request.endpoint or 'unmatched'}
+        self.process.observe('http_request_duration_seconds', time.perf_counter() - started, **route)
+        self.process.inc('http_requests_total', method=request.method,
+                         status=response.status_code, **route)
+
+        from sql_instrumentation import request_sql_stats
+        stats = request_sql_stats()
+        if stats is not None:
+            self.process.inc('db_statements_total', stats.count, **route)
+            self.process.inc('db_statement_seconds_total', stats.seconds, **route)
+        return response
+
+    def _teardown(self, exc):
+        # Paired with _start even when a request fails before after_request
+        if g.pop('_metrics_started', None) is not None:
+            self.process.add_gauge('http_requests_in_flight', -1)
+        if self.store is not None and self.store.due():
+            self._flush()
+
+    def _collect(self) -> List[Sample]:
+        samples = []
+        for collector in self.collectors:
+            try:
+                samples += collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector.__name__} failed: {e}")
+        return samples
+
+    def _flush(self):
+        try:
+            self.store.write(self.process.snapshot(self._collect()))
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot: {e}")
+
+    def _flush_at_exit(self, app):
+        with app.app_context():
+            self._flush()
+
+    def render(self) -> str:
+        if self.store is not None:
+            self._flush()
+            snapshots = self.store.read()
+        else:
+            snapshots = [(self.process.snapshot(self._collect()), True)]
+        return exposition(_merge(snapshots, self.process.buckets), self.process.buckets)
+
+    def view(self):
+        if self.token and request.headers.get('Authorization') != f'Bearer {self.token}':
+            return Response('Unauthorized\n', status=401, content_type='text/plain')
+        return Response(self.render(), content_type=CONTENT_TYPE)
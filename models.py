@@ -5,10 +5,26 @@ SQLAlchemy ORM models with user authentication
 
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from password_hashing import hash_password
 from datetime import datetime
 import uuid
 from database import db
 
+class TenantOwned:
+    """Mixin for models whose rows belong to one tenant through ``user_id``;
+    ORM queries on them are scoped to the current tenant (see tenant_scope)"""
+    
+    # Overridden by each model's own user_id column
+    user_id = db.Column(db.Integer, nullable=False)
+
+# Deferred group for the wide legacy master tables: columns kept for DBF
+# fidelity that lists, dropdowns and balance checks never read. They load
+# together, in one extra query, the first time any of them is accessed.
+LEGACY_GROUP = 'legacy'
+
+def legacy_column(*args, **kwargs):
+    return db.deferred(db.Column(*args, **kwargs), group=LEGACY_GROUP)
+
 class User(UserMixin, db.Model):
     """User model for authentication"""
     __tablename__ = 'users'
@@ -23,7 +39,7 @@ class User(UserMixin, db.Model):
     last_login = db.Column(db.DateTime)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -31,7 +47,7 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         return f'<User {self.username}>'
 
-class Company(db.Model):
+class Company(TenantOwned, db.Model):
     """Company information"""
     __tablename__ = 'company'
     
@@ -52,9 +68,12 @@ class Company(db.Model):
     # Relationship
     user = db.relationship('User', backref='companies')
 
-class Party(db.Model):
+class Party(TenantOwned, db.Model):
     """Parties/Customers/Suppliers"""
     __tablename__ = 'parties'
+    __table_args__ = (
+        db.Index('idx_parties_user_name', 'user_id', 'party_nm'),
+    )
     
     party_cd = db.Column(db.String(20), primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -71,55 +90,55 @@ class Party(db.Model):
     address1 = db.Column(db.String(200))
     address2 = db.Column(db.String(200))
     address3 = db.Column(db.String(200))
-    po = db.Column(db.String(50))
-    dist = db.Column(db.String(50))
-    contact = db.Column(db.String(100))
-    state = db.Column(db.String(50))
-    pin = db.Column(db.String(10))
-    phone1 = db.Column(db.String(20))
-    phone2 = db.Column(db.String(20))
-    phone3 = db.Column(db.String(20))
-    cst_no = db.Column(db.String(50))
-    cst_dt = db.Column(db.Date)
-    trate = db.Column(db.Float, default=0)
-    agent_cd = db.Column(db.String(20))
-    cat = db.Column(db.String(50))
-    lpperc = db.Column(db.Float, default=0)
-    limit = db.Column(db.Float, default=0)
+    po = legacy_column(db.String(50))
+    dist = legacy_column(db.String(50))
+    contact = legacy_column(db.String(100))
+    state = legacy_column(db.String(50))
+    pin = legacy_column(db.String(10))
+    phone1 = legacy_column(db.String(20))
+    phone2 = legacy_column(db.String(20))
+    phone3 = legacy_column(db.String(20))
+    cst_no = legacy_column(db.String(50))
+    cst_dt = legacy_column(db.Date)
+    trate = legacy_column(db.Float, default=0)
+    agent_cd = legacy_column(db.String(20))
+    cat = legacy_column(db.String(50))
+    lpperc = legacy_column(db.Float, default=0)
+    limit = legacy_column(db.Float, default=0)
     ledgtyp = db.Column(db.String(20))
-    dis = db.Column(db.Float, default=0)
-    trans_cd = db.Column(db.String(20))
-    pgno = db.Column(db.Integer)
-    agent_nm = db.Column(db.String(100))
-    p_bal = db.Column(db.Float, default=0)
-    phone4 = db.Column(db.String(20))
-    phone5 = db.Column(db.String(20))
-    phone6 = db.Column(db.String(20))
-    phone7 = db.Column(db.String(20))
-    phone8 = db.Column(db.String(20))
-    bst_no = db.Column(db.String(50))
+    dis = legacy_column(db.Float, default=0)
+    trans_cd = legacy_column(db.String(20))
+    pgno = legacy_column(db.Integer)
+    agent_nm = legacy_column(db.String(100))
+    p_bal = legacy_column(db.Float, default=0)
+    phone4 = legacy_column(db.String(20))
+    phone5 = legacy_column(db.String(20))
+    phone6 = legacy_column(db.String(20))
+    phone7 = legacy_column(db.String(20))
+    phone8 = legacy_column(db.String(20))
+    bst_no = legacy_column(db.String(50))
     
     # Enhanced Credit Management (Based on Legacy Analysis)
     credit_limit = db.Column(db.Float, default=0)  # Credit limit for the party
     current_balance = db.Column(db.Float, default=0)  # Real-time balance
-    payment_terms = db.Column(db.String(50))  # Payment terms (e.g., "30 days")
-    last_payment_date = db.Column(db.Date)  # Last payment received date
+    payment_terms = legacy_column(db.String(50))  # Payment terms (e.g., "30 days")
+    last_payment_date = legacy_column(db.Date)  # Last payment received date
     credit_status = db.Column(db.String(20), default='ACTIVE')  # ACTIVE, SUSPENDED, BLOCKED
-    opening_balance_date = db.Column(db.Date)  # Date of opening balance
-    bst_dt = db.Column(db.Date)
-    vat_no = db.Column(db.String(50))
-    acode = db.Column(db.String(20))
-    area = db.Column(db.String(50))
-    ly_cd = db.Column(db.String(20))
-    cr_dr = db.Column(db.String(1))
-    amount = db.Column(db.Float, default=0)
-    page_no = db.Column(db.Integer)
-    group_cd = db.Column(db.String(20))
-    group_nm = db.Column(db.String(100))
+    opening_balance_date = legacy_column(db.Date)  # Date of opening balance
+    bst_dt = legacy_column(db.Date)
+    vat_no = legacy_column(db.String(50))
+    acode = legacy_column(db.String(20))
+    area = legacy_column(db.String(50))
+    ly_cd = legacy_column(db.String(20))
+    cr_dr = legacy_column(db.String(1))
+    amount = legacy_column(db.Float, default=0)
+    page_no = legacy_column(db.Integer)
+    group_cd = legacy_column(db.String(20))
+    group_nm = legacy_column(db.String(100))
     gstin = db.Column(db.String(20))
     pan = db.Column(db.String(20))
     email = db.Column(db.String(100))
-    fax = db.Column(db.String(20))
+    fax = legacy_column(db.String(20))
     mobile = db.Column(db.String(20))
     opening_bal = db.Column(db.Float, default=0)
     closing_bal = db.Column(db.Float, default=0)
@@ -132,9 +151,12 @@ class Party(db.Model):
     def __repr__(self):
         return f'<Party {self.party_cd}: {self.party_nm}>'
 
-class Item(db.Model):
+class Item(TenantOwned, db.Model):
     """Items/Products"""
     __tablename__ = 'items'
+    __table_args__ = (
+        db.Index('idx_items_user_name', 'user_id', 'it_nm'),
+    )
     
     it_cd = db.Column(db.String(20), primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -144,27 +166,27 @@ class Item(db.Model):
     category = db.Column(db.String(100))
     
     # Extended fields
-    it_size = db.Column(db.String(50))
-    colo_cd = db.Column(db.String(20))
-    pkgs = db.Column(db.String(50))
+    it_size = legacy_column(db.String(50))
+    colo_cd = legacy_column(db.String(20))
+    pkgs = legacy_column(db.String(50))
     mrp = db.Column(db.Float, default=0)
     sprc = db.Column(db.Float, default=0)
-    pkt = db.Column(db.Float, default=0)
-    cat_cd = db.Column(db.String(20))
-    maxrt = db.Column(db.Float, default=0)
-    minrt = db.Column(db.Float, default=0)
-    taxpr = db.Column(db.Float, default=0)
-    hamrt = db.Column(db.Float, default=0)
-    itwt = db.Column(db.Float, default=0)
-    ccess = db.Column(db.Integer, default=0)
+    pkt = legacy_column(db.Float, default=0)
+    cat_cd = legacy_column(db.String(20))
+    maxrt = legacy_column(db.Float, default=0)
+    minrt = legacy_column(db.Float, default=0)
+    taxpr = legacy_column(db.Float, default=0)
+    hamrt = legacy_column(db.Float, default=0)
+    itwt = legacy_column(db.Float, default=0)
+    ccess = legacy_column(db.Integer, default=0)
     hsn = db.Column(db.String(20))
     gst = db.Column(db.Float, default=0)
-    cess = db.Column(db.Float, default=0)
-    batch = db.Column(db.String(50))
-    exp_date = db.Column(db.Date)
-    barcode = db.Column(db.String(50))
-    rack = db.Column(db.String(50))
-    shelf = db.Column(db.String(50))
+    cess = legacy_column(db.Float, default=0)
+    batch = legacy_column(db.String(50))
+    exp_date = legacy_column(db.Date)
+    barcode = legacy_column(db.String(50))
+    rack = legacy_column(db.String(50))
+    shelf = legacy_column(db.String(50))
     reorder_level = db.Column(db.Float, default=0)
     opening_stock = db.Column(db.Float, default=0)
     closing_stock = db.Column(db.Float, default=0)
@@ -177,9 +199,13 @@ class Item(db.Model):
     def __repr__(self):
         return f'<Item {self.it_cd}: {self.it_nm}>'
 
-class Purchase(db.Model):
+class Purchase(TenantOwned, db.Model):
     """Purchase transactions"""
     __tablename__ = 'purchases'
+    __table_args__ = (
+        db.Index('idx_purchases_user_bill', 'user_id', 'bill_no'),
+        db.Index('idx_purchases_user_date', 'user_id', 'bill_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -245,9 +271,13 @@ class Purchase(db.Model):
     def __repr__(self):
         return f'<Purchase {self.bill_no}: {self.party_cd} - {self.it_cd}>'
 
-class Sale(db.Model):
+class Sale(TenantOwned, db.Model):
     """Sales transactions"""
     __tablename__ = 'sales'
+    __table_args__ = (
+        db.Index('idx_sales_user_bill', 'user_id', 'bill_no'),
+        db.Index('idx_sales_user_date', 'user_id', 'bill_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -324,9 +354,12 @@ class Sale(db.Model):
     def __repr__(self):
         return f'<Sale {self.bill_no}: {self.party_cd} - {self.it_cd}>'
 
-class Cashbook(db.Model):
+class Cashbook(TenantOwned, db.Model):
     """Cashbook transactions"""
     __tablename__ = 'cashbook'
+    __table_args__ = (
+        db.Index('idx_cashbook_user_date', 'user_id', 'date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -360,7 +393,7 @@ class Cashbook(db.Model):
     def __repr__(self):
         return f'<Cashbook {self.date}: {self.narration}>'
 
-class Bankbook(db.Model):
+class Bankbook(TenantOwned, db.Model):
     """Bankbook transactions"""
     __tablename__ = 'bankbook'
     
@@ -387,7 +420,7 @@ class Bankbook(db.Model):
     def __repr__(self):
         return f'<Bankbook {self.date}: {self.narration}>' 
 
-class Ledger(db.Model):
+class Ledger(TenantOwned, db.Model):
     """Ledger for comprehensive financial tracking (Based on Legacy Analysis)"""
     __tablename__ = 'ledger'
     
@@ -432,7 +465,7 @@ class Ledger(db.Model):
     def __repr__(self):
         return f'<Ledger {self.id} - {self.party_cd} - {self.date}>' 
 
-class Packing(db.Model):
+class Packing(TenantOwned, db.Model):
     """Packing materials and charges"""
     __tablename__ = 'packing'
     
@@ -464,7 +497,7 @@ class Packing(db.Model):
     def __repr__(self):
         return f'<Packing {self.it_cd} - {self.packing_desc}>' 
 
-class TransportMaster(db.Model):
+class TransportMaster(TenantOwned, db.Model):
     """Transport companies and logistics management"""
     __tablename__ = 'transport_master'
     
@@ -497,7 +530,7 @@ class TransportMaster(db.Model):
     def __repr__(self):
         return f'<TransportMaster {self.trans_cd} - {self.trans_nm}>' 
 
-class GatePass(db.Model):
+class GatePass(TenantOwned, db.Model):
     """Gate pass for vehicle entry and exit tracking"""
     __tablename__ = 'gate_pass'
     
@@ -527,7 +560,7 @@ class GatePass(db.Model):
     def __repr__(self):
         return f'<GatePass {self.gate_pass_no} - {self.party_cd}>'
 
-class Agent(db.Model):
+class Agent(TenantOwned, db.Model):
     """Sales agents and commission management"""
     __tablename__ = 'agents'
     
@@ -557,7 +590,7 @@ class Agent(db.Model):
     def __repr__(self):
         return f'<Agent {self.agent_cd} - {self.agent_nm}>'
 
-class BankAccount(db.Model):
+class BankAccount(TenantOwned, db.Model):
     """Bank accounts management"""
     __tablename__ = 'bank_accounts'
     
@@ -583,7 +616,7 @@ class BankAccount(db.Model):
     def __repr__(self):
         return f'<BankAccount {self.account_name} - {self.bank_name}>'
 
-class BankTransaction(db.Model):
+class BankTransaction(TenantOwned, db.Model):
     """Bank transactions"""
     __tablename__ = 'bank_transactions'
     
@@ -608,7 +641,7 @@ class BankTransaction(db.Model):
     def __repr__(self):
         return f'<BankTransaction {self.id} - {self.transaction_type} - {self.amount}>'
 
-class Schedule(db.Model):
+class Schedule(TenantOwned, db.Model):
     """Payment and delivery schedules"""
     __tablename__ = 'schedules'
     
@@ -638,7 +671,7 @@ class Schedule(db.Model):
     def __repr__(self):
         return f'<Schedule {self.id} - {self.schedule_type} - {self.due_date}>'
 
-class Narration(db.Model):
+class Narration(TenantOwned, db.Model):
     """Predefined narration templates"""
     __tablename__ = 'narrations'
     
@@ -657,4 +690,148 @@ class Narration(db.Model):
     user = db.relationship('User', backref='narrations')
     
     def __repr__(self):
-        return f'<Narration {self.id} - {self.category} - {self.narration_text[:30]}...>' 
\ No newline at end of file
+        return f'<Narration {self.id} - {self.category} - {self.narration_text[:30]}...>' 
+
+class SalesDailyRollup(TenantOwned, db.Model):
+    """Daily sales rollup per (tenant, day, party, item, agent), maintained on posting"""
+    __tablename__ = 'sales_daily_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', 'party_cd', 'it_cd', 'agent_cd', name='uq_sales_daily_rollup_key'),
+        db.Index('idx_sales_daily_rollup_user_day', 'user_id', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    party_cd = db.Column(db.String(20), nullable=False)
+    it_cd = db.Column(db.String(20), nullable=False)
+    agent_cd = db.Column(db.String(20), nullable=False, default='')  # '' when the line has no agent
+    qty = db.Column(db.Float, default=0)
+    amount = db.Column(db.Float, default=0)  # Sum of sal_amt
+    discount = db.Column(db.Float, default=0)
+    tax = db.Column(db.Float, default=0)  # Sum of taxamt
+    line_count = db.Column(db.Integer, default=0)
+    
+    def __repr__(self):
+        return f'<SalesDailyRollup {self.user_id} {self.day} {self.party_cd} {self.it_cd}>'
+
+class PurchaseDailyRollup(TenantOwned, db.Model):
+    """Daily purchase rollup per (tenant, day, party, item, agent), maintained on posting"""
+    __tablename__ = 'purchase_daily_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', 'party_cd', 'it_cd', 'agent_cd', name='uq_purchase_daily_rollup_key'),
+        db.Index('idx_purchase_daily_rollup_user_day', 'user_id', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    party_cd = db.Column(db.String(20), nullable=False)
+    it_cd = db.Column(db.String(20), nullable=False)
+    agent_cd = db.Column(db.String(20), nullable=False, default='')  # '' when the line has no agent
+    qty = db.Column(db.Float, default=0)
+    amount = db.Column(db.Float, default=0)  # Sum of sal_amt
+    discount = db.Column(db.Float, default=0)
+    tax = db.Column(db.Float, default=0)  # Sum of taxamt
+    line_count = db.Column(db.Integer, default=0)
+    
+    def __repr__(self):
+        return f'<PurchaseDailyRollup {self.user_id} {self.day} {self.party_cd} {self.it_cd}>'
+
+class LegacyImportCheckpoint(TenantOwned, db.Model):
+    """Progress of a legacy DBF table import, committed together with each chunk"""
+    __tablename__ = 'legacy_import_checkpoints'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'table_name', name='uq_legacy_import_checkpoint'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    table_name = db.Column(db.String(50), nullable=False)  # parties, items, purchases, sales, cashbook
+    source_file = db.Column(db.String(500), nullable=False)
+    source_signature = db.Column(db.String(100))  # size:mtime of the DBF when the import started
+    rows_read = db.Column(db.Integer, default=0)  # DBF records consumed so far
+    rows_imported = db.Column(db.Integer, default=0)
+    rows_skipped = db.Column(db.Integer, default=0)
+    completed = db.Column(db.Boolean, default=False)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    modified_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<LegacyImportCheckpoint {self.user_id} {self.table_name}: {self.rows_read}>'
+
+class LegacyRowHash(TenantOwned, db.Model):
+    """Content hash of each imported legacy DBF row, used to re-sync only what changed"""
+    __tablename__ = 'legacy_row_hashes'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'table_name', 'source_key', name='uq_legacy_row_hash_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    table_name = db.Column(db.String(50), nullable=False)
+    source_key = db.Column(db.String(200), nullable=False)  # Natural key of the legacy row
+    row_hash = db.Column(db.String(32), nullable=False)
+    target_id = db.Column(db.String(50), nullable=False)  # Primary key of the imported row
+    
+    def __repr__(self):
+        return f'<LegacyRowHash {self.table_name} {self.source_key}>'
+
+class RefreshToken(db.Model):
+    """Issued API refresh tokens; each refresh rotates to a new token in the same family"""
+    __tablename__ = 'refresh_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    family = db.Column(db.String(36), nullable=False, index=True)  # Shared by every rotation of one login
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    used_at = db.Column(db.DateTime)  # Set once rotated; presenting it again revokes the family
+    revoked = db.Column(db.Boolean, default=False)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<RefreshToken {self.user_id} {self.jti}>'
+
+class SchemaMigration(db.Model):
+    """A schema migration version and, while it runs, its resumable progress"""
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.String(50), primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    state = db.Column(db.String(20), nullable=False, default='running')  # running, paused, failed, applied
+    step = db.Column(db.Integer, nullable=False, default=0)  # Index of the step in progress
+    cursor = db.Column(db.String(200))  # Last key the current backfill has finished
+    rows_total = db.Column(db.Integer)  # Rows the current step will scan
+    rows_scanned = db.Column(db.Integer, default=0)
+    rows_changed = db.Column(db.Integer, default=0)
+    pause_requested = db.Column(db.Boolean, default=False)
+    owner = db.Column(db.String(100))  # host:pid of the runner
+    heartbeat_at = db.Column(db.DateTime)
+    error = db.Column(db.Text)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<SchemaMigration {self.version} {self.state}>'
+
+class FinancialYearClose(TenantOwned, db.Model):
+    """A tenant's financial year that was closed and moved to its archive database"""
+    __tablename__ = 'financial_year_closes'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'financial_year', name='uq_financial_year_closes_user_year'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    financial_year = db.Column(db.String(10), nullable=False)  # e.g. "2024-2025"
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    state = db.Column(db.String(20), nullable=False, default='closing')  # closing, closed
+    rows_archived = db.Column(db.Integer, default=0)
+    rows_kept = db.Column(db.Integer, default=0)  # Still referenced from open rows, left in place
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    closed_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<FinancialYearClose {self.user_id} {self.financial_year} {self.state}>'
@@ -9,6 +9,7 @@ from narration_management import NarrationManagementSystem
 from database import db
 from models import User
 from flask_login import login_required, current_user
+from replica_routing import reporting
 import json
 from datetime import datetime, timedelta
 
@@ -301,6 +302,7 @@ def get_popular_narrations():
 
 @narration_management_bp.route('/api/narration/export', methods=['GET'])
 @login_required
+@reporting
 def export_narration_data():
     """Export narration data"""
     try:
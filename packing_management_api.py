@@ -9,6 +9,7 @@ from packing_management import PackingManagementSystem
 from database import db
 from models import User
 from flask_login import login_required, current_user
+from replica_routing import reporting
 import json
 from datetime import datetime, timedelta
 
@@ -303,6 +304,7 @@ def bulk_import_packing():
 
 @packing_management_bp.route('/api/packing/export', methods=['GET'])
 @login_required
+@reporting
 def export_packing_data():
     """Export packing data"""
     try:
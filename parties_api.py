@@ -1,5 +1,7 @@
 from flask import Blueprint, jsonify, render_template_string, request
 from flask_login import login_required, current_user
+from replica_routing import reporting
+from fragments import render_fragment
 from models import db, Party
 from datetime import datetime, date
 import random
@@ -108,113 +110,7 @@ def parties_table():
             page=page, per_page=20, error_out=False
         )
         
-        return render_template_string("""
-            {% if parties.items %}
-                <div class="table-responsive">
-                    <table class="table table-hover mb-0">
-                        <thead class="table-dark">
-                            <tr>
-                                <th>Code</th>
-                                <th>Name</th>
-                                <th>Contact</th>
-                                <th>Location</th>
-                                <th>Balance</th>
-                                <th>Status</th>
-                                <th>Actions</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-                            {% for party in parties.items %}
-                            <tr>
-                                <td>
-                                    <span class="badge bg-primary">{{ party.party_cd }}</span>
-                                </td>
-                                <td>
-                                    <strong>{{ party.party_nm }}</strong>
-                                    {% if party.party_nm_hindi %}
-                                        <br><small class="text-muted">{{ party.party_nm_hindi }}</small>
-                                    {% endif %}
-                                </td>
-                                <td>
-                                    {% if party.phone %}
-                                        <div><i class="fas fa-phone me-1"></i>{{ party.phone }}</div>
-                                    {% endif %}
-                                    {% if party.mobile %}
-                                        <div><i class="fas fa-mobile-alt me-1"></i>{{ party.mobile }}</div>
-                                    {% endif %}
-                                    {% if party.email %}
-                                        <div><i class="fas fa-envelope me-1"></i>{{ party.email }}</div>
-                                    {% endif %}
-                                </td>
-                                <td>
-                                    <div>{{ party.place or 'N/A' }}</div>
-                                    {% if party.address1 %}
-                                        <small class="text-muted">{{ party.address1 }}</small>
-                                    {% endif %}
-                                </td>
-                                <td>
-                                    {% set balance = party.ytd_dr - party.ytd_cr %}
-                                    <span class="badge bg-{{ 'danger' if balance > 0 else 'success' }}">
-                                        ₹{{ "%.2f"|format(balance) }}
-                                    </span>
-                                </td>
-                                <td>
-                                    <span class="badge bg-{{ 'success' if party.bal_cd == 'C' else 'warning' }}">
-                                        {{ 'Credit' if party.bal_cd == 'C' else 'Debit' }}
-                                    </span>
-                                </td>
-                                <td>
-                                    <div class="btn-group" role="group">
-                                        <button class="btn btn-sm btn-outline-primary"
-                                                hx-get="/api/parties/view/{{ party.party_cd }}"
-                                                hx-target="#partyModal .modal-content"
-                                                hx-swap="innerHTML"
-                                                data-bs-toggle="modal"
-                                                data-bs-target="#partyModal"
-                                                title="View Details">
-                                            <i class="fas fa-eye"></i>
-                                        </button>
-                                        <button class="btn btn-sm btn-outline-warning"
-                                                hx-get="/api/parties/edit-form/{{ party.party_cd }}"
-                                                hx-target="#partyModal .modal-content"
-                                                hx-swap="innerHTML"
-                                                data-bs-toggle="modal"
-                                                data-bs-target="#partyModal"
-                                                title="Edit Party">
-                                            <i class="fas fa-edit"></i>
-                                        </button>
-                                        <button class="btn btn-sm btn-outline-danger"
-                                                hx-get="/api/parties/delete-confirm/{{ party.party_cd }}"
-                                                hx-target="#partyModal .modal-content"
-                                                hx-swap="innerHTML"
-                                                data-bs-toggle="modal"
-                                                data-bs-target="#partyModal"
-                                                title="Delete Party">
-                                            <i class="fas fa-trash"></i>
-                                        </button>
-                                    </div>
-                                </td>
-                            </tr>
-                            {% endfor %}
-                        </tbody>
-                    </table>
-                </div>
-            {% else %}
-                <div class="text-center p-5">
-                    <i class="fas fa-users fa-3x text-muted mb-3"></i>
-                    <h5 class="text-muted">No parties found</h5>
-                    <p class="text-muted">Start by adding your first party</p>
-                    <button class="btn btn-primary"
-                            hx-get="/api/parties/add-form"
-                            hx-target="#partyModal .modal-content"
-                            hx-swap="innerHTML"
-                            data-bs-toggle="modal"
-                            data-bs-target="#partyModal">
-                        <i class="fas fa-plus me-2"></i>Add First Party
-                    </button>
-                </div>
-            {% endif %}
-        """, parties=parties)
+        return render_fragment('parties_table', parties=parties)
     except Exception as e:
         print(f"Table error: {e}")
         return f"<div class='alert alert-danger'>Error loading parties: {str(e)}</div>"
@@ -781,6 +677,7 @@ def parties_filtered():
 # Export parties
 @parties_api.route('/api/parties/export')
 @login_required
+@reporting
 def parties_export():
     """Export parties to Excel"""
     try:
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Password Hashing
+Bounded worker pool for password verification, configurable hash parameters
+and transparent rehashing on login
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Optional
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Werkzeug method string, e.g. 'pbkdf2:sha256:600000' or 'scrypt:32768:8:1'
+DEFAULT_METHOD = 'pbkdf2:sha256:600000'
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is saturated; callers answer 503 and the client retries"""
+
+
+def hash_method() -> str:
+    if has_app_context():
+        return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+    return DEFAULT_METHOD
+
+
+def hash_password(password: str, method: str = None) -> str:
+    return generate_password_hash(password, method=method or hash_method())
+
+
+def _stored_method(password_hash: str) -> str:
+    return password_hash.split('$', 1)[0]
+
+
+_normalized_methods = {}
+
+
+def needs_rehash(password_hash: str, method: str = None) -> bool:
+    """True when the stored hash was made with other parameters than the configured ones
+
+    Covers upgrades (more iterations, pbkdf2 -> scrypt) and downgrades alike.
+    """
+    method = method or hash_method()
+    if method not in _normalized_methods:
+        # Werkzeug fills in default parameters, so compare against what it actually writes
+        _normalized_methods[method] = _stored_method(generate_password_hash('', method=method))
+    return _stored_method(password_hash) != _normalized_methods[method]
+
+
+class HashingPool:
+    """Runs password hashing off the request threads, with admission control
+
+    hashlib's PBKDF2 and scrypt release the GIL, so a thread pool sized to the
+    cores spreads hashing across them. At most ``workers + queue_size`` hashes
+    are admitted at once; a login arriving beyond that waits up to
+    ``admission_timeout`` seconds for a slot and is then refused with
+    ``HashingBusy`` instead of piling up behind a shift-start burst.
+    """
+
+    def __init__(self, workers: int = None, queue_size: int = None, admission_timeout: float = 2.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = self.workers * 4 if queue_size is None else queue_size
+        self.admission_timeout = admission_timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._admitted_lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        """Admitted hashes still waiting for a worker thread"""
+        return max(self.admitted - self.workers, 0)
+
+    def _admit(self, delta: int):
+        with self._admitted_lock:
+            self.admitted += delta
+
+    def _release(self):
+        self._admit(-1)
+        self._slots.release()
+
+    def run(self, fn, *args, timeout: float = 30.0):
+        if not self._slots.acquire(timeout=self.admission_timeout):
+            self.rejected += 1
+            raise HashingBusy('Too many logins in progress, please retry')
+        self._admit(1)
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            raise HashingBusy('Password check timed out, please retry')
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_pool: Optional[HashingPool] = None
+_pool_lock = threading.Lock()
+
+
+def current_pool() -> Optional[HashingPool]:
+    """The process's pool if a login has started it, without starting one"""
+    return _pool
+
+
+def get_pool() -> HashingPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = current_app.config if has_app_context() else {}
+                _pool = HashingPool(
+                    workers=config.get('PASSWORD_HASH_WORKERS'),
+                    queue_size=config.get('PASSWORD_HASH_QUEUE'),
+                    admission_timeout=config.get('PASSWORD_HASH_ADMISSION_TIMEOUT', 2.0)
+                )
+    return _pool
+
+
+def verify_password(user, password: str) -> bool:
+    """Check ``password`` in the hashing pool; on success bring the stored hash
+    up to the configured parameters (the caller commits, as login already does)
+
+    Raises ``HashingBusy`` when the pool refuses the check; a refused rehash
+    keeps the old hash and is retried on a later login.
+    """
+    if not user.password_hash:
+        return False
+
+    pool = get_pool()
+    if not pool.run(check_password_hash, user.password_hash, password):
+        return False
+
+    method = hash_method()
+    if needs_rehash(user.password_hash, method):
+        try:
+            user.password_hash = pool.run(generate_password_hash, password, method)
+        except HashingBusy:
+            pass  # The password was verified; the rehash can wait for a quieter login
+    return True
+
+
+def benchmark(method: str = None, seconds: float = 5.0, workers: int = None) -> Dict:
+    """Measure login verification throughput for a hash method
+
+    Runs verifications on one thread, then through a pool of ``workers``
+    threads, for ``seconds`` each and reports logins per second and per core.
+    """
+    method = method or hash_method()
+    workers = workers or os.cpu_count() or 1
+    stored = generate_password_hash('benchmark-password', method=method)
+
+    started = time.perf_counter()
+    single = 0
+    while time.perf_counter() - started < seconds:
+        check_password_hash(stored, 'benchmark-password')
+        single += 1
+    single_rate = single / (time.perf_counter() - started)
+
+    pool = HashingPool(workers=workers, queue_size=workers, admission_timeout=seconds)
+    done = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        while time.perf_counter() < deadline:
+            pool.run(check_password_hash, stored, 'benchmark-password')
+            with lock:
+                done[0] += 1
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(workers * 2)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    pooled_rate = done[0] / (time.perf_counter() - started)
+    pool.shutdown()
+
+    return {
+        'method': _stored_method(stored),
+        'cores': os.cpu_count(),
+        'workers': workers,
+        'ms_per_hash': round(1000 / single_rate, 2) if single_rate else None,
+        'logins_per_sec_single': round(single_rate, 2),
+        'logins_per_sec_pool': round(pooled_rate, 2),
+        'logins_per_sec_per_core': round(pooled_rate / min(workers, os.cpu_count() or 1), 2),
+    }
@@ -8,7 +8,7 @@ from datetime import datetime, date, timedelta
 from typing import Dict, List, Optional, Tuple
 import json
 from database import db
-from models import Purchase, Party, Item, User
+from models import Purchase, Party, Item, User, PurchaseDailyRollup
 from sqlalchemy import func, and_, or_, desc, asc
 import uuid
 
@@ -433,21 +433,21 @@ class PurchaseManagementSystem:
             
             # Get purchases by party
             party_summary = db.session.query(
-                Purchase.party_cd,
-                func.count(Purchase.bill_no).label('purchase_count'),
-                func.sum(Purchase.sal_amt).label('total_amount')
+                PurchaseDailyRollup.party_cd,
+                func.sum(PurchaseDailyRollup.line_count).label('purchase_count'),
+                func.sum(PurchaseDailyRollup.amount).label('total_amount')
             ).filter(
-                Purchase.user_id == user_id
-            ).group_by(Purchase.party_cd).all()
+                PurchaseDailyRollup.user_id == user_id
+            ).group_by(PurchaseDailyRollup.party_cd).all()
             
             # Get purchases by item
             item_summary = db.session.query(
-                Purchase.it_cd,
-                func.sum(Purchase.qty).label('total_quantity'),
-                func.sum(Purchase.sal_amt).label('total_amount')
+                PurchaseDailyRollup.it_cd,
+                func.sum(PurchaseDailyRollup.qty).label('total_quantity'),
+                func.sum(PurchaseDailyRollup.amount).label('total_amount')
             ).filter(
-                Purchase.user_id == user_id
-            ).group_by(Purchase.it_cd).all()
+                PurchaseDailyRollup.user_id == user_id
+            ).group_by(PurchaseDailyRollup.it_cd).all()
             
             return {
                 'success': True,
@@ -546,23 +546,23 @@ class PurchaseManagementSystem:
     def _get_daily_purchase_report(self, user_id: int, start_date: str, end_date: str) -> Dict:
         """Generate daily purchase report"""
         query = db.session.query(
-            Purchase.bill_date,
-            func.count(Purchase.bill_no).label('purchase_count'),
-            func.sum(Purchase.sal_amt).label('total_amount')
-        ).filter(Purchase.user_id == user_id)
+            PurchaseDailyRollup.day,
+            func.sum(PurchaseDailyRollup.line_count).label('purchase_count'),
+            func.sum(PurchaseDailyRollup.amount).label('total_amount')
+        ).filter(PurchaseDailyRollup.user_id == user_id)
         
         if start_date:
-            query = query.filter(Purchase.bill_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+            query = query.filter(PurchaseDailyRollup.day >= datetime.strptime(start_date, '%Y-%m-%d').date())
         if end_date:
-            query = query.filter(Purchase.bill_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+            query = query.filter(PurchaseDailyRollup.day <= datetime.strptime(end_date, '%Y-%m-%d').date())
         
-        daily_data = query.group_by(Purchase.bill_date).order_by(Purchase.bill_date).all()
+        daily_data = query.group_by(PurchaseDailyRollup.day).order_by(PurchaseDailyRollup.day).all()
         
         return {
             'success': True,
             'report_type': 'daily',
             'data': [{
-                'date': d.bill_date.strftime('%Y-%m-%d'),
+                'date': d.day.strftime('%Y-%m-%d'),
                 'purchase_count': d.purchase_count,
                 'total_amount': float(d.total_amount)
             } for d in daily_data]
@@ -571,23 +571,23 @@ class PurchaseManagementSystem:
     def _get_monthly_purchase_report(self, user_id: int, start_date: str, end_date: str) -> Dict:
         """Generate monthly purchase report"""
         query = db.session.query(
-            func.extract('year', Purchase.bill_date).label('year'),
-            func.extract('month', Purchase.bill_date).label('month'),
-            func.count(Purchase.bill_no).label('purchase_count'),
-            func.sum(Purchase.sal_amt).label('total_amount')
-        ).filter(Purchase.user_id == user_id)
+            func.extract('year', PurchaseDailyRollup.day).label('year'),
+            func.extract('month', PurchaseDailyRollup.day).label('month'),
+            func.sum(PurchaseDailyRollup.line_count).label('purchase_count'),
+            func.sum(PurchaseDailyRollup.amount).label('total_amount')
+        ).filter(PurchaseDailyRollup.user_id == user_id)
         
         if start_date:
-            query = query.filter(Purchase.bill_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+            query = query.filter(PurchaseDailyRollup.day >= datetime.strptime(start_date, '%Y-%m-%d').date())
         if end_date:
-            query = query.filter(Purchase.bill_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+            query = query.filter(PurchaseDailyRollup.day <= datetime.strptime(end_date, '%Y-%m-%d').date())
         
         monthly_data = query.group_by(
-            func.extract('year', Purchase.bill_date),
-            func.extract('month', Purchase.bill_date)
+            func.extract('year', PurchaseDailyRollup.day),
+            func.extract('month', PurchaseDailyRollup.day)
         ).order_by(
-            func.extract('year', Purchase.bill_date),
-            func.extract('month', Purchase.bill_date)
+            func.extract('year', PurchaseDailyRollup.day),
+            func.extract('month', PurchaseDailyRollup.day)
         ).all()
         
         return {
@@ -604,17 +604,17 @@ class PurchaseManagementSystem:
     def _get_party_wise_purchase_report(self, user_id: int, start_date: str, end_date: str) -> Dict:
         """Generate party-wise purchase report"""
         query = db.session.query(
-            Purchase.party_cd,
-            func.count(Purchase.bill_no).label('purchase_count'),
-            func.sum(Purchase.sal_amt).label('total_amount')
-        ).filter(Purchase.user_id == user_id)
+            PurchaseDailyRollup.party_cd,
+            func.sum(PurchaseDailyRollup.line_count).label('purchase_count'),
+            func.sum(PurchaseDailyRollup.amount).label('total_amount')
+        ).filter(PurchaseDailyRollup.user_id == user_id)
         
         if start_date:
-            query = query.filter(Purchase.bill_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+            query = query.filter(PurchaseDailyRollup.day >= datetime.strptime(start_date, '%Y-%m-%d').date())
         if end_date:
-            query = query.filter(Purchase.bill_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+            query = query.filter(PurchaseDailyRollup.day <= datetime.strptime(end_date, '%Y-%m-%d').date())
         
-        party_data = query.group_by(Purchase.party_cd).order_by(desc(func.sum(Purchase.sal_amt))).all()
+        party_data = query.group_by(PurchaseDailyRollup.party_cd).order_by(desc(func.sum(PurchaseDailyRollup.amount))).all()
         
         return {
             'success': True,
@@ -629,17 +629,17 @@ class PurchaseManagementSystem:
     def _get_item_wise_purchase_report(self, user_id: int, start_date: str, end_date: str) -> Dict:
         """Generate item-wise purchase report"""
         query = db.session.query(
-            Purchase.it_cd,
-            func.sum(Purchase.qty).label('total_quantity'),
-            func.sum(Purchase.sal_amt).label('total_amount')
-        ).filter(Purchase.user_id == user_id)
+            PurchaseDailyRollup.it_cd,
+            func.sum(PurchaseDailyRollup.qty).label('total_quantity'),
+            func.sum(PurchaseDailyRollup.amount).label('total_amount')
+        ).filter(PurchaseDailyRollup.user_id == user_id)
         
         if start_date:
-            query = query.filter(Purchase.bill_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+            query = query.filter(PurchaseDailyRollup.day >= datetime.strptime(start_date, '%Y-%m-%d').date())
         if end_date:
-            query = query.filter(Purchase.bill_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+            query = query.filter(PurchaseDailyRollup.day <= datetime.strptime(end_date, '%Y-%m-%d').date())
         
-        item_data = query.group_by(Purchase.it_cd).order_by(desc(func.sum(Purchase.sal_amt))).all()
+        item_data = query.group_by(PurchaseDailyRollup.it_cd).order_by(desc(func.sum(PurchaseDailyRollup.amount))).all()
         
         return {
             'success': True,
@@ -1,9 +1,11 @@
 from flask import Blueprint, render_template, request, jsonify, render_template_string
 from flask_login import login_required, current_user
+from fragments import stream_fragment, bill_summaries
 from sqlalchemy import or_, and_, desc, func
 from datetime import datetime, timedelta
 from database import db
 from models import Purchase, Party, Item
+from column_groups import party_dropdown, item_dropdown
 from forms import PurchaseForm
 
 purchases_api = Blueprint('purchases_api', __name__)
@@ -119,89 +121,9 @@ def purchases_table():
             elif amount == '10000+':
                 query = query.filter(Purchase.sal_amt > 10000)
         
-        # Group by bill number to get unique bills
-        query = query.group_by(Purchase.bill_no).order_by(desc(Purchase.bill_date))
-        
-        # Get unique bills
-        bills = query.all()
-        
-        if not bills:
-            return '''
-            <tr>
-                <td colspan="6" class="text-center py-4">
-                    <div class="text-muted">
-                        <i class="fas fa-shopping-cart fa-3x mb-3"></i>
-                        <h5>No purchases found</h5>
-                        <p>Try adjusting your search criteria or create a new purchase.</p>
-                    </div>
-                </td>
-            </tr>
-            '''
-        
-        rows = []
-        for bill_no in [bill.bill_no for bill in bills]:
-            # Get all items for this bill
-            bill_items = Purchase.query.filter_by(user_id=current_user.id, bill_no=bill_no).all()
-            if not bill_items:
-                continue
-            
-            # Get bill details from first item
-            first_item = bill_items[0]
-            total_amount = sum(item.sal_amt for item in bill_items)
-            item_count = len(bill_items)
-            
-            row = f'''
-            <tr>
-                <td>
-                    <span class="bill-badge">{bill_no}</span>
-                </td>
-                <td>{first_item.bill_date.strftime('%d/%m/%Y') if first_item.bill_date else 'N/A'}</td>
-                <td>
-                    <strong>{first_item.party.party_nm if first_item.party else first_item.party_cd}</strong>
-                    <br><small class="text-muted">{first_item.party_cd}</small>
-                </td>
-                <td>
-                    <span class="badge bg-info">{item_count} item(s)</span>
-                    <br><small class="text-muted">
-                        {', '.join([item.item.it_nm if item.item else item.it_cd for item in bill_items[:3]])}
-                        {f' +{item_count-3} more' if item_count > 3 else ''}
-                    </small>
-                </td>
-                <td>
-                    <span class="amount-badge">₹{total_amount:.2f}</span>
-                </td>
-                <td>
-                    <div class="action-buttons">
-                        <button class="btn-action btn-view" 
-                                hx-get="/api/purchases/view/{bill_no}"
-                                hx-target="#purchaseModal .modal-content"
-                                hx-swap="innerHTML"
-                                data-bs-toggle="modal"
-                                data-bs-target="#purchaseModal"
-                                title="View Purchase">
-                            <i class="fas fa-eye"></i>
-                        </button>
-                        <button class="btn-action btn-edit" 
-                                hx-get="/api/purchases/edit/{bill_no}"
-                                hx-target="#purchaseModal .modal-content"
-                                hx-swap="innerHTML"
-                                data-bs-toggle="modal"
-                                data-bs-target="#purchaseModal"
-                                title="Edit Purchase">
-                            <i class="fas fa-edit"></i>
-                        </button>
-                        <button class="btn-action btn-delete" 
-                                onclick="deletePurchase('{bill_no}')"
-                                title="Delete Purchase">
-                            <i class="fas fa-trash"></i>
-                        </button>
-                    </div>
-                </td>
-            </tr>
-            '''
-            rows.append(row)
-        
-        return '\n'.join(rows)
+        # One streamed query for all lines of the matching bills, folded into bills
+        bills = bill_summaries(Purchase, query, current_user.id)
+        return stream_fragment('purchases_table_rows', bills=bills)
         
     except Exception as e:
         print(f"Purchases table error: {e}")
@@ -222,9 +144,9 @@ def purchases_add_form():
     """Get add purchase form with multiple items support"""
     try:
         # Get parties for dropdown
-        parties = Party.query.filter_by(user_id=current_user.id).all()
+        parties = Party.query.options(party_dropdown()).filter_by(user_id=current_user.id).all()
         # Get items for dropdown
-        items = Item.query.filter_by(user_id=current_user.id).all()
+        items = Item.query.options(item_dropdown()).filter_by(user_id=current_user.id).all()
         
         # Generate next bill number
         last_purchase = Purchase.query.filter_by(user_id=current_user.id).order_by(desc(Purchase.bill_no)).first()
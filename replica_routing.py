@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Replica Routing
+Sends the reads of report and export views to a read replica; writes stay on
+the primary
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+from flask import current_app, make_response, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, text
+from db_engine import engine_options
+
+logger = logging.getLogger(__name__)
+
+_on_replica: ContextVar = ContextVar('read_replica', default=False)
+_read_engine: ContextVar = ContextVar('read_engine', default=None)
+
+# Seconds a measured replica lag is reused before it is queried again
+LAG_CACHE_SECONDS = 5
+
+# Pragmas that are safe on a read-only SQLite connection
+READONLY_PRAGMAS = ('cache_size', 'mmap_size', 'busy_timeout', 'temp_store')
+
+LAG_HEADER = 'X-Replica-Lag'
+
+
+class RoutingSession(Session):
+    """Session that reads from the replica inside ``read_replica()`` blocks,
+    and from a given engine inside ``read_from()`` blocks
+
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary, so a
+    report view that records something (an audit row, a last-run date) still
+    writes to the right database.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = _read_engine.get()
+        if bind is None and engine is not None and not self._flushing and not getattr(clause, 'is_dml', False):
+            return engine
+        if bind is None and _on_replica.get() and not self._flushing \
+                and not getattr(clause, 'is_dml', False) and has_app_context():
+            replica = current_app.extensions.get('read_replica')
+            if replica is not None and replica.engine is not None:
+                return replica.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def read_replica():
+    """Route this block's ORM reads to the replica (the primary when none is configured)"""
+    token = _on_replica.set(True)
+    try:
+        yield
+    finally:
+        _on_replica.reset(token)
+
+
+@contextmanager
+def read_from(engine):
+    """Route this block's ORM reads to ``engine``, e.g. an archived financial year
+
+    Takes precedence over ``read_replica()``; writes still go to the primary.
+    """
+    token = _read_engine.set(engine)
+    try:
+        yield
+    finally:
+        _read_engine.reset(token)
+
+
+def reporting(f):
+    """Run a report/export view on the replica and state the replica lag
+
+    The lag in seconds goes into the ``X-Replica-Lag`` header and, for
+    successful JSON object responses, into a ``replica_lag_seconds`` field;
+    error payloads are passed through untouched.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        replica = current_app.extensions.get('read_replica')
+        if replica is None or replica.engine is None:
+            return f(*args, **kwargs)
+
+        with read_replica():
+            response = make_response(f(*args, **kwargs))
+        lag = replica.lag()
+        if lag is not None:
+            response.headers[LAG_HEADER] = f'{lag:.1f}'
+            if 200 <= response.status_code < 300 and response.is_json and not response.is_streamed:
+                payload = response.get_json(silent=True)
+                if isinstance(payload, dict):
+                    payload['replica_lag_seconds'] = round(lag, 1)
+                    response.set_data(current_app.json.dumps(payload))
+        return response
+    return decorated_function
+
+
+class ReadReplica:
+    """The replica engine: ``REPLICA_DATABASE_URL`` when set, otherwise a
+    read-only connection to the primary SQLite file (single-box installs),
+    so long reports get their own pool and can never take the write lock
+    """
+
+    def __init__(self, app=None):
+        self.engine = None
+        self.kind = None
+        self._lag: Optional[float] = None
+        self._lag_checked = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        url = app.config.get('REPLICA_DATABASE_URL')
+        if url:
+            self.engine = create_engine(url, **engine_options(dict(app.config, SQLALCHEMY_DATABASE_URI=url)))
+            self.kind = self.engine.dialect.name
+        elif app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite') and app.config.get('REPLICA_SQLITE_READONLY'):
+            self._init_sqlite_readonly(app)
+
+        if self.engine is not None:
+            logger.info(f"Report and export reads routed to {self.kind} replica")
+        app.extensions['read_replica'] = self
+
+    def _init_sqlite_readonly(self, app):
+        from database import db
+        from sqlite_profile import apply_pragmas
+
+        with app.app_context():
+            primary = db.engine
+        path = primary.url.database
+        if not path or path == ':memory:':
+            return
+        self.engine = create_engine(f'sqlite:///file:{path}?mode=ro&uri=true',
+                                    **engine_options(app.config))
+        profile = app.extensions.get('sqlite_profile')
+        if profile is not None and profile.settings:
+            apply_pragmas(self.engine, {name: value for name, value in profile.settings.items()
+                                        if name in READONLY_PRAGMAS})
+        self.kind = 'sqlite-readonly'
+
+    def lag(self) -> Optional[float]:
+        """Seconds the replica is behind the primary (0 for the SQLite read-only file)"""
+        if self.engine is None:
+            return None
+        if self.kind == 'sqlite-readonly':
+            return 0.0
+
+        now = time.monotonic()
+        with self._lock:
+            if now - self._lag_checked < LAG_CACHE_SECONDS:
+                return self._lag
+            self._lag_checked = now
+        try:
+            self._lag = self._measure_lag()
+        except Exception as e:
+            logger.warning(f"Could not measure replica lag: {e}")
+            self._lag = None
+        return self._lag
+
+    def _measure_lag(self) -> Optional[float]:
+        with self.engine.connect() as connection:
+            if self.kind == 'postgresql':
+                lag = connection.execute(text(
+                    "SELECT CASE WHEN pg_is_in_recovery() "
+                    "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                    "ELSE 0 END")).scalar()
+                return float(lag or 0)
+            if self.kind in ('mysql', 'mariadb'):
+                row = connection.execute(text('SHOW SLAVE STATUS')).mappings().first()
+                return float(row['Seconds_Behind_Master']) if row and row['Seconds_Behind_Master'] is not None else None
+        return None
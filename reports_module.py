@@ -6,9 +6,10 @@ Provides comprehensive business reports for multi-user system
 
 from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
+from replica_routing import reporting
 from sqlalchemy import func, and_, desc
 from datetime import datetime, timedelta
-from models import db, Party, Item, Purchase, Sale, Cashbook, Company
+from models import db, Party, Item, Purchase, Sale, Cashbook, Company, SalesDailyRollup, PurchaseDailyRollup
 
 reports_bp = Blueprint('reports', __name__)
 
@@ -20,6 +21,7 @@ def reports_dashboard():
 
 @reports_bp.route('/reports/sales-summary')
 @login_required
+@reporting
 def sales_summary():
     """Sales summary report"""
     try:
@@ -74,6 +76,7 @@ def sales_summary():
 
 @reports_bp.route('/reports/purchase-summary')
 @login_required
+@reporting
 def purchase_summary():
     """Purchase summary report"""
     try:
@@ -128,6 +131,7 @@ def purchase_summary():
 
 @reports_bp.route('/reports/party-ledger/<party_cd>')
 @login_required
+@reporting
 def party_ledger(party_cd):
     """Party ledger report"""
     try:
@@ -210,6 +214,7 @@ def party_ledger(party_cd):
 
 @reports_bp.route('/reports/item-analysis')
 @login_required
+@reporting
 def item_analysis():
     """Item analysis report"""
     try:
@@ -223,37 +228,39 @@ def item_analysis():
         start_dt = datetime.strptime(start_date, '%Y-%m-%d')
         end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
         
-        # Get item-wise sales data
+        # Get item-wise sales data from the daily rollups (gross = net amount + discount)
+        gross_sold = func.sum(SalesDailyRollup.amount + SalesDailyRollup.discount)
         item_sales = db.session.query(
-            Item.item_cd,
-            Item.item_nm,
-            func.sum(Sale.qty).label('total_qty_sold'),
-            func.sum(Sale.qty * Sale.rate).label('total_amount_sold'),
-            func.avg(Sale.rate).label('avg_rate')
-        ).join(Sale, Item.item_cd == Sale.item_cd)\
+            Item.it_cd.label('item_cd'),
+            Item.it_nm.label('item_nm'),
+            func.sum(SalesDailyRollup.qty).label('total_qty_sold'),
+            gross_sold.label('total_amount_sold'),
+            (gross_sold / func.nullif(func.sum(SalesDailyRollup.qty), 0)).label('avg_rate')
+        ).join(SalesDailyRollup, Item.it_cd == SalesDailyRollup.it_cd)\
          .filter(
              Item.user_id == current_user.id,
-             Sale.user_id == current_user.id,
-             Sale.bill_date >= start_dt,
-             Sale.bill_date < end_dt
-         ).group_by(Item.item_cd, Item.item_nm)\
-         .order_by(desc(func.sum(Sale.qty * Sale.rate))).all()
-        
-        # Get item-wise purchase data
+             SalesDailyRollup.user_id == current_user.id,
+             SalesDailyRollup.day >= start_dt.date(),
+             SalesDailyRollup.day < end_dt.date()
+         ).group_by(Item.it_cd, Item.it_nm)\
+         .order_by(desc(gross_sold)).all()
+        
+        # Get item-wise purchase data from the daily rollups
+        gross_purchased = func.sum(PurchaseDailyRollup.amount + PurchaseDailyRollup.discount)
         item_purchases = db.session.query(
-            Item.item_cd,
-            Item.item_nm,
-            func.sum(Purchase.qty).label('total_qty_purchased'),
-            func.sum(Purchase.qty * Purchase.rate).label('total_amount_purchased'),
-            func.avg(Purchase.rate).label('avg_purchase_rate')
-        ).join(Purchase, Item.item_cd == Purchase.item_cd)\
+            Item.it_cd.label('item_cd'),
+            Item.it_nm.label('item_nm'),
+            func.sum(PurchaseDailyRollup.qty).label('total_qty_purchased'),
+            gross_purchased.label('total_amount_purchased'),
+            (gross_purchased / func.nullif(func.sum(PurchaseDailyRollup.qty), 0)).label('avg_purchase_rate')
+        ).join(PurchaseDailyRollup, Item.it_cd == PurchaseDailyRollup.it_cd)\
          .filter(
              Item.user_id == current_user.id,
-             Purchase.user_id == current_user.id,
-             Purchase.bill_date >= start_dt,
-             Purchase.bill_date < end_dt
-         ).group_by(Item.item_cd, Item.item_nm)\
-         .order_by(desc(func.sum(Purchase.qty * Purchase.rate))).all()
+             PurchaseDailyRollup.user_id == current_user.id,
+             PurchaseDailyRollup.day >= start_dt.date(),
+             PurchaseDailyRollup.day < end_dt.date()
+         ).group_by(Item.it_cd, Item.it_nm)\
+         .order_by(desc(gross_purchased)).all()
         
         return render_template('reports/item_analysis.html',
                              user=current_user,
@@ -268,6 +275,7 @@ def item_analysis():
 
 @reports_bp.route('/reports/cash-flow')
 @login_required
+@reporting
 def cash_flow():
     """Cash flow report"""
     try:
@@ -281,27 +289,25 @@ def cash_flow():
         start_dt = datetime.strptime(start_date, '%Y-%m-%d')
         end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
         
-        # Get cash receipts (sales)
+        # Get daily receipts (sales) from the daily rollups
         cash_receipts = db.session.query(
-            func.date(Sale.bill_date).label('date'),
-            func.sum(Sale.total_amount).label('amount')
+            SalesDailyRollup.day.label('date'),
+            func.sum(SalesDailyRollup.amount).label('amount')
         ).filter(
-            Sale.user_id == current_user.id,
-            Sale.bill_date >= start_dt,
-            Sale.bill_date < end_dt,
-            Sale.payment_mode == 'Cash'
-        ).group_by(func.date(Sale.bill_date)).all()
+            SalesDailyRollup.user_id == current_user.id,
+            SalesDailyRollup.day >= start_dt.date(),
+            SalesDailyRollup.day < end_dt.date()
+        ).group_by(SalesDailyRollup.day).all()
         
-        # Get cash payments (purchases)
+        # Get daily payments (purchases) from the daily rollups
         cash_payments = db.session.query(
-            func.date(Purchase.bill_date).label('date'),
-            func.sum(Purchase.total_amount).label('amount')
+            PurchaseDailyRollup.day.label('date'),
+            func.sum(PurchaseDailyRollup.amount).label('amount')
         ).filter(
-            Purchase.user_id == current_user.id,
-            Purchase.bill_date >= start_dt,
-            Purchase.bill_date < end_dt,
-            Purchase.payment_mode == 'Cash'
-        ).group_by(func.date(Purchase.bill_date)).all()
+            PurchaseDailyRollup.user_id == current_user.id,
+            PurchaseDailyRollup.day >= start_dt.date(),
+            PurchaseDailyRollup.day < end_dt.date()
+        ).group_by(PurchaseDailyRollup.day).all()
         
         # Get cashbook entries
         cashbook_entries = db.session.query(
@@ -328,6 +334,7 @@ def cash_flow():
 
 @reports_bp.route('/api/reports/sales-chart')
 @login_required
+@reporting
 def sales_chart_data():
     """API endpoint for sales chart data"""
     try:
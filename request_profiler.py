@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Request Profiler
+On-demand sampling profiles of single requests, saved as collapsed stacks
+with their SQL timings, and an admin page to browse them
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+from flask import (Blueprint, current_app, flash, g, redirect, render_template, request,
+                   send_from_directory, url_for, abort)
+from flask_login import login_required, current_user
+from sql_instrumentation import capture_sql
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile-Request'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+DEFAULT_INTERVAL_MS = 5
+DEFAULT_KEEP = 200
+
+_SAFE_NAME = re.compile(r'[^A-Za-z0-9_.-]+')
+
+profiler_bp = Blueprint('profiler', __name__)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Samples one thread's Python stack every ``interval`` seconds
+
+    The stacks are kept in collapsed form (``root;...;leaf``) with a count,
+    which flamegraph.pl, speedscope and inferno read directly. Sampling
+    costs the profiled request almost nothing: the work happens on the
+    sampler thread, one stack walk per tick.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Profiles requests that ask for it and a random sample of the rest
+
+    An admin sends ``X-Profile-Request: 1`` to profile that one request;
+    ``PROFILE_SAMPLE_RATE`` (0-1, optionally limited to one tenant with
+    ``PROFILE_SAMPLE_USER_ID``) profiles a share of everyone's requests and can
+    be changed from the admin page. Each profile is a ``.collapsed`` stack
+    file plus a ``.json`` summary with the route, duration and SQL statement
+    timings, in ``PROFILE_DIR``; only the newest ``PROFILE_KEEP`` are kept.
+    """
+
+    def __init__(self, app=None):
+        self.sample_rate = 0.0
+        self.sample_user_id: Optional[int] = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        self.interval = app.config.get('PROFILE_INTERVAL_MS', DEFAULT_INTERVAL_MS) / 1000
+        self.keep = app.config.get('PROFILE_KEEP', DEFAULT_KEEP)
+        self.sample_rate = float(app.config.get('PROFILE_SAMPLE_RATE', 0) or 0)
+        self.sample_user_id = app.config.get('PROFILE_SAMPLE_USER_ID')
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        app.register_blueprint(profiler_bp)
+        app.extensions['request_profiler'] = self
+
+    def _wanted(self) -> bool:
+        if request.blueprint == 'profiler' or request.endpoint in (None, 'static', 'metrics'):
+            return False
+        if request.headers.get(PROFILE_HEADER) and current_user.is_authenticated \
+                and current_user.role == 'admin':
+            return True
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return False
+        if self.sample_user_id:
+            return current_user.is_authenticated and current_user.id == self.sample_user_id
+        return True
+
+    def _start(self):
+        if not self._wanted():
+            return
+        capture = capture_sql()
+        g._profile = {
+            'capture': capture,
+            'sql': capture.__enter__(),
+            'sampler': StackSampler(threading.get_ident(), self.interval),
+            'started': time.perf_counter(),
+            'at': datetime.now(),
+        }
+        g._profile['sampler'].start()
+
+    def _finish(self, response):
+        profile = g.get('_profile')
+        if profile is not None:
+            profile['status'] = response.status_code
+            profile['name'] = self._name(profile)
+            response.headers[PROFILE_ID_HEADER] = profile['name']
+        return response
+
+    def _teardown(self, exc):
+        # Runs after a streamed body has been sent, so the profile covers it
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return
+        duration = time.perf_counter() - profile['started']
+        profile['sampler'].stop()
+        profile['capture'].__exit__(None, None, None)
+        try:
+            self._save(profile, duration)
+        except OSError as e:
+            logger.warning(f"Could not save request profile: {e}")
+
+    def _name(self, profile: Dict) -> str:
+        endpoint = _SAFE_NAME.sub('-', request.endpoint or 'unmatched')
+        return f"{profile['at']:%Y%m%d-%H%M%S-%f}-{endpoint}"
+
+    def _save(self, profile: Dict, duration: float):
+        os.makedirs(self.directory, exist_ok=True)
+        name = profile.get('name') or self._name(profile)
+        sampler = profile['sampler']
+        sql = profile['sql']
+
+        with open(os.path.join(self.directory, f'{name}.collapsed'), 'w') as f:
+            f.write(sampler.collapsed())
+        summary = {
+            'name': name,
+            'at': profile['at'].isoformat(timespec='seconds'),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'blueprint': request.blueprint,
+            'user_id': current_user.id if current_user.is_authenticated else None,
+            'status': profile.get('status'),
+            'duration_ms': round(duration * 1000, 1),
+            'samples': sampler.samples,
+            'interval_ms': round(self.interval * 1000, 1),
+            'sql': {
+                'statements': sql.count,
+                'ms': round(sql.seconds * 1000, 1),
+                'shapes': [{'shape': shape, 'count': count,
+                            'ms': round(sql.shape_seconds[shape] * 1000, 2)}
+                           for shape, count in sql.shapes.most_common()],
+            },
+        }
+        with open(os.path.join(self.directory, f'{name}.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        logger.info(f"Profiled {request.endpoint} in {summary['duration_ms']} ms -> {name}")
+        self._prune()
+
+    def _prune(self):
+        summaries = sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        for name in summaries[:-self.keep] if self.keep else []:
+            stem = name[:-len('.json')]
+            for suffix in ('.json', '.collapsed'):
+                try:
+                    os.remove(os.path.join(self.directory, stem + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def recent(self, limit: int = 100) -> List[Dict]:
+        """Summaries of the newest profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted((name for name in os.listdir(self.directory) if name.endswith('.json')),
+                       reverse=True)[:limit]
+        summaries = []
+        for name in names:
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return summaries
+
+
+def _profiler() -> RequestProfiler:
+    return current_app.extensions['request_profiler']
+
+
+def _admin_only():
+    if current_user.role != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('dashboard'))
+    return None
+
+
+@profiler_bp.route('/admin/profiles', methods=['GET', 'POST'])
+@login_required
+def profiles():
+    """Recent request profiles; POST changes this process's sampling"""
+    denied = _admin_only()
+    if denied:
+        return denied
+
+    profiler = _profiler()
+    if request.method == 'POST':
+        try:
+            rate = float(request.form.get('sample_rate') or 0)
+            user_id = request.form.get('sample_user_id', '').strip()
+            profiler.sample_rate = min(max(rate, 0.0), 1.0)
+            profiler.sample_user_id = int(user_id) if user_id else None
+            flash('Profiling settings updated for this worker.', 'success')
+        except ValueError:
+            flash('Sample rate must be a number and the tenant an id.', 'error')
+        return redirect(url_for('profiler.profiles'))
+
+    summaries = profiler.recent()
+    endpoint = request.args.get('endpoint')
+    endpoints = sorted({summary['endpoint'] or 'unmatched' for summary in summaries})
+    if endpoint:
+        summaries = [summary for summary in summaries if summary['endpoint'] == endpoint]
+    if request.args.get('sort') == 'duration':
+        summaries.sort(key=lambda summary: summary['duration_ms'], reverse=True)
+    return render_template('admin_profiles.html', profiles=summaries, endpoints=endpoints,
+                           endpoint=endpoint, profiler=profiler, header=PROFILE_HEADER)
+
+
+@profiler_bp.route('/admin/profiles/<name>.<any(collapsed, json):kind>')
+@login_required
+def profile_file(name, kind):
+    """Download one profile's collapsed stacks or summary"""
+    if current_user.role != 'admin':
+        abort(403)
+    if _SAFE_NAME.search(name):
+        abort(404)
+    return send_from_directory(_profiler().directory, f'{name}.{kind}', as_attachment=kind == 'collapsed')
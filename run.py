@@ -3,6 +3,7 @@
 Startup script for the Business Management System Web Application
 """
 
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -13,23 +14,58 @@ sys.path.insert(0, str(current_dir))
 
 from app import create_app
 from database import db
+from models import User
+from schema_migrations import MigrationRunner, init_schema
+from sqlalchemy import inspect
 
 def main():
     """Main startup function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--init-db', action='store_true',
+                        help='Create missing tables before starting (same as "flask init-db")')
+    parser.add_argument('--serve', action='store_true',
+                        help='Production server: worker processes, no debugger or reloader')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, help='Worker processes (SERVE_WORKERS)')
+    parser.add_argument('--threads', type=int, help='Threads per worker (SERVE_THREADS)')
+    parser.add_argument('--max-requests', type=int, help='Recycle a worker after this many requests (SERVE_MAX_REQUESTS)')
+    parser.add_argument('--keepalive', type=float, help='Idle keep-alive seconds (SERVE_KEEPALIVE)')
+    args = parser.parse_args()
+    
     print("🚀 Starting Business Management System...")
     print("=" * 50)
     
-    # Create the Flask application
-    app = create_app()
+    # Create the Flask application. The production server preloads it in full
+    # (workers share it after the fork) and aggregates metrics across workers
+    overrides = {}
+    if args.serve:
+        overrides = {
+            'DEBUG': False,
+            'LAZY_BLUEPRINTS': False,
+            'METRICS_DIR': os.environ.get('METRICS_DIR') or str(current_dir / 'instance' / 'metrics'),
+        }
+        for name, value in (('SERVE_WORKERS', args.workers), ('SERVE_THREADS', args.threads),
+                            ('SERVE_MAX_REQUESTS', args.max_requests), ('SERVE_KEEPALIVE', args.keepalive)):
+            if value is not None:
+                overrides[name] = value
+    app = create_app(overrides=overrides)
     
-    # Initialize database
+    # Schema creation is explicit; a normal start only checks that it exists
     with app.app_context():
-        print("📊 Initializing database...")
-        db.create_all()
-        print("✅ Database initialized successfully!")
+        if args.init_db:
+            print("📊 Initializing database...")
+            init_schema()
+            print("✅ Database initialized successfully!")
+        elif not inspect(db.engine).has_table(User.__tablename__):
+            print("⚠️  Database has no tables yet - run: python run.py --init-db")
+        else:
+            pending = MigrationRunner().pending()
+            if pending:
+                print(f"⚠️  {len(pending)} schema migration(s) pending - run: flask schema upgrade")
     
     print("\n🌐 Starting web server...")
-    print("📍 Application will be available at: http://localhost:5000")
+    print(f"📍 Application will be available at: http://localhost:{args.port}")
     print("🔑 Default admin credentials: admin / admin123")
     print("\n" + "=" * 50)
     print("Press Ctrl+C to stop the server")
@@ -37,12 +73,16 @@ def main():
     
     # Run the application
     try:
-        app.run(
-            debug=True,
-            host='0.0.0.0',
-            port=5000,
-            use_reloader=True
-        )
+        if args.serve:
+            from serve import serve
+            serve(app, host=args.host, port=args.port)
+        else:
+            app.run(
+                debug=True,
+                host=args.host,
+                port=args.port,
+                use_reloader=True
+            )
     except KeyboardInterrupt:
         print("\n\n👋 Shutting down Business Management System...")
         sys.exit(0)
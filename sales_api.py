@@ -1,9 +1,12 @@
 from flask import Blueprint, render_template, request, jsonify, render_template_string
 from flask_login import login_required, current_user
+from replica_routing import reporting
+from fragments import render_fragment, stream_fragment, bill_summaries
 from sqlalchemy import or_, and_, desc, func
 from datetime import datetime, timedelta
 from database import db
 from models import Sale, Party, Item
+from column_groups import party_dropdown, item_dropdown
 from forms import SaleForm
 
 sales_api = Blueprint('sales_api', __name__)
@@ -120,117 +123,9 @@ def sales_table():
             elif amount == '10000+':
                 query = query.filter(Sale.sal_amt > 10000)
         
-        # Group by bill number to get unique bills
-        query = query.group_by(Sale.bill_no)
-        
-        # Apply sorting
-        if sort_by == 'date':
-            query = query.order_by(desc(Sale.bill_date))
-        elif sort_by == 'amount':
-            query = query.order_by(desc(Sale.sal_amt))
-        elif sort_by == 'customer':
-            query = query.join(Party).order_by(Party.party_nm)
-        elif sort_by == 'bill_no':
-            query = query.order_by(Sale.bill_no)
-        
-        # Get unique bills
-        bills = query.all()
-        
-        if not bills:
-            return '''
-            <table class="table table-hover">
-                <thead>
-                    <tr>
-                        <th>Bill No</th>
-                        <th>Date</th>
-                        <th>Customer</th>
-                        <th>Items</th>
-                        <th>Total Amount</th>
-                        <th>Actions</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    <tr>
-                        <td colspan="6" class="text-center py-4">
-                            <div class="text-muted">
-                                <i class="fas fa-receipt fa-3x mb-3"></i>
-                                <h5>No sales found</h5>
-                                <p>Try adjusting your search criteria or create a new sale.</p>
-                            </div>
-                        </td>
-                    </tr>
-                </tbody>
-            </table>
-            '''
-        
-        table_html = '''
-        <table class="table table-hover">
-            <thead>
-                <tr>
-                    <th>Bill No</th>
-                    <th>Date</th>
-                    <th>Customer</th>
-                    <th>Items</th>
-                    <th>Total Amount</th>
-                    <th>Actions</th>
-                </tr>
-            </thead>
-            <tbody>
-        '''
-        
-        for bill_no in [bill.bill_no for bill in bills]:
-            # Get all items for this bill
-            bill_items = Sale.query.filter_by(user_id=current_user.id, bill_no=bill_no).all()
-            if not bill_items:
-                continue
-            
-            # Get bill details from first item
-            first_item = bill_items[0]
-            total_amount = sum(item.sal_amt for item in bill_items)
-            item_count = len(bill_items)
-            
-            table_html += f'''
-            <tr>
-                <td>
-                    <span class="sale-badge">{bill_no}</span>
-                </td>
-                <td>{first_item.bill_date.strftime('%d/%m/%Y') if first_item.bill_date else 'N/A'}</td>
-                <td>
-                    <strong>{first_item.party.party_nm if first_item.party else first_item.party_cd}</strong>
-                    <br><small class="text-muted">{first_item.party_cd}</small>
-                </td>
-                <td>
-                    <span class="items-badge">{item_count} item(s)</span>
-                    <br><small class="text-muted">
-                        {', '.join([item.item.it_nm if item.item else item.it_cd for item in bill_items[:3]])}
-                        {f' and {len(bill_items) - 3} more...' if len(bill_items) > 3 else ''}
-                    </small>
-                </td>
-                <td>
-                    <strong>₹{total_amount:.2f}</strong>
-                </td>
-                <td>
-                    <div class="action-buttons">
-                        <button class="btn btn-action btn-view" data-bill-no="{bill_no}" title="View Sale">
-                            <i class="fas fa-eye"></i>
-                        </button>
-                        <button class="btn btn-action btn-edit" data-bill-no="{bill_no}" title="Edit Sale">
-                            <i class="fas fa-edit"></i>
-                        </button>
-                        <button class="btn btn-action btn-delete" data-bill-no="{bill_no}" title="Delete Sale">
-                            <i class="fas fa-trash"></i>
-                        </button>
-                    </div>
-                </td>
-            </tr>
-            '''
-        
-        table_html += '''
-            </tbody>
-        </table>
-        '''
-        
-        return table_html
+        # One streamed query for all lines of the matching bills, folded into bills
+        bills = bill_summaries(Sale, query, current_user.id, sort=sort_by)
+        return stream_fragment('sales_table', bills=bills)
         
     except Exception as e:
         print(f"Error loading sales table: {e}")
@@ -265,10 +160,10 @@ def sales_add_form():
     """Get add sale form with multiple items support"""
     try:
         # Get parties for dropdown with error handling
-        parties = Party.query.filter_by(user_id=current_user.id).all() or []
+        parties = Party.query.options(party_dropdown()).filter_by(user_id=current_user.id).all() or []
         
         # Get items for dropdown with error handling
-        items = Item.query.filter_by(user_id=current_user.id).all() or []
+        items = Item.query.options(item_dropdown()).filter_by(user_id=current_user.id).all() or []
         
         # Generate next bill number with error handling
         last_sale = Sale.query.filter_by(user_id=current_user.id).order_by(desc(Sale.bill_no)).first()
@@ -515,44 +410,10 @@ def sales_add():
         
         db.session.commit()
         
-        return render_template_string("""
-            <div class="modal-header">
-                <h5 class="modal-title text-success">
-                    <i class="fas fa-check-circle me-2"></i>Sale Created Successfully
-                </h5>
-                <button type="button" class="btn-close" data-bs-dismiss="modal" aria-label="Close"></button>
-            </div>
-            <div class="modal-body">
-                <div class="alert alert-success">
-                    <i class="fas fa-check-circle me-2"></i>
-                    Sale Bill #{{ bill_no }} has been created successfully!
-                </div>
-                <p class="text-muted">Total Amount: ₹{{ "%.2f"|format(total_amount) }}</p>
-                <p class="text-muted">Items: {{ item_count }} item(s)</p>
-            </div>
-            <div class="modal-footer">
-                <button type="button" class="btn btn-primary" data-bs-dismiss="modal" onclick="location.reload()">Close</button>
-            </div>
-        """, bill_no=bill_no, total_amount=total_amount, item_count=len(items_data))
+        return render_fragment('sales_add_success', bill_no=bill_no, total_amount=total_amount, item_count=len(items_data))
     except Exception as e:
         print(f"Sales add error: {e}")
-        return render_template_string("""
-            <div class="modal-header">
-                <h5 class="modal-title text-danger">
-                    <i class="fas fa-exclamation-triangle me-2"></i>Error
-                </h5>
-                <button type="button" class="btn-close" data-bs-dismiss="modal" aria-label="Close"></button>
-            </div>
-            <div class="modal-body">
-                <div class="alert alert-danger">
-                    <i class="fas fa-exclamation-triangle me-2"></i>
-                    Error creating sale: {{ error }}
-                </div>
-            </div>
-            <div class="modal-footer">
-                <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">Close</button>
-            </div>
-        """, error=str(e))
+        return render_fragment('sales_add_error', error=str(e))
 
 @sales_api.route('/api/sales/view/<bill_no>')
 @login_required
@@ -576,8 +437,8 @@ def sales_view(bill_no):
         print(f"Found {len(sales)} sale items, total amount: {total_amount}")
         
         # Get parties and items for dropdowns
-        parties = Party.query.filter_by(user_id=current_user.id).all() or []
-        items = Item.query.filter_by(user_id=current_user.id).all() or []
+        parties = Party.query.options(party_dropdown()).filter_by(user_id=current_user.id).all() or []
+        items = Item.query.options(item_dropdown()).filter_by(user_id=current_user.id).all() or []
         
         print(f"Found {len(parties)} parties and {len(items)} items")
         
@@ -759,7 +620,7 @@ def sales_edit_form(bill_no):
         print(f"=== EDIT FORM REQUESTED FOR BILL {bill_no} ===")
         print(f"Current user ID: {current_user.id}")
         
-        # Temporarily remove user_id filter to test - the sales exist but with different user_ids
+        # Scoped to the current tenant by tenant_scope
         sales = Sale.query.filter_by(bill_no=bill_no).all()
         print(f"Found {len(sales)} sales for bill {bill_no}")
         
@@ -771,8 +632,8 @@ def sales_edit_form(bill_no):
         total_amount = sum(sale.sal_amt for sale in sales)
         
         # Get parties and items for dropdowns
-        parties = Party.query.filter_by(user_id=current_user.id).all() or []
-        items = Item.query.filter_by(user_id=current_user.id).all() or []
+        parties = Party.query.options(party_dropdown()).filter_by(user_id=current_user.id).all() or []
+        items = Item.query.options(item_dropdown()).filter_by(user_id=current_user.id).all() or []
         
         # Convert to dictionaries for JSON serialization
         parties_data = []
@@ -1158,6 +1019,7 @@ def sales_items(bill_no):
 
 @sales_api.route('/api/sales/export')
 @login_required
+@reporting
 def sales_export():
     """Export sales to CSV"""
     try:
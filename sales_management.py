@@ -8,7 +8,7 @@ from datetime import datetime, date, timedelta
 from typing import Dict, List, Optional, Tuple
 import json
 from database import db
-from models import Sale, Party, Item, User
+from models import Sale, Party, Item, User, SalesDailyRollup
 from sqlalchemy import func, and_, or_, desc, asc
 import uuid
 
@@ -477,21 +477,21 @@ class SalesManagementSystem:
             
             # Get sales by party
             party_summary = db.session.query(
-                Sale.party_cd,
-                func.count(Sale.bill_no).label('sales_count'),
-                func.sum(Sale.sal_amt).label('total_amount')
+                SalesDailyRollup.party_cd,
+                func.sum(SalesDailyRollup.line_count).label('sales_count'),
+                func.sum(SalesDailyRollup.amount).label('total_amount')
             ).filter(
-                Sale.user_id == user_id
-            ).group_by(Sale.party_cd).all()
+                SalesDailyRollup.user_id == user_id
+            ).group_by(SalesDailyRollup.party_cd).all()
             
             # Get sales by item
             item_summary = db.session.query(
-                Sale.it_cd,
-                func.sum(Sale.qty).label('total_quantity'),
-                func.sum(Sale.sal_amt).label('total_amount')
+                SalesDailyRollup.it_cd,
+                func.sum(SalesDailyRollup.qty).label('total_quantity'),
+                func.sum(SalesDailyRollup.amount).label('total_amount')
             ).filter(
-                Sale.user_id == user_id
-            ).group_by(Sale.it_cd).all()
+                SalesDailyRollup.user_id == user_id
+            ).group_by(SalesDailyRollup.it_cd).all()
             
             return {
                 'success': True,
@@ -621,23 +621,23 @@ class SalesManagementSystem:
     def _get_daily_sales_report(self, user_id: int, start_date: str, end_date: str) -> Dict:
         """Generate daily sales report"""
         query = db.session.query(
-            Sale.bill_date,
-            func.count(Sale.bill_no).label('sales_count'),
-            func.sum(Sale.sal_amt).label('total_amount')
-        ).filter(Sale.user_id == user_id)
+            SalesDailyRollup.day,
+            func.sum(SalesDailyRollup.line_count).label('sales_count'),
+            func.sum(SalesDailyRollup.amount).label('total_amount')
+        ).filter(SalesDailyRollup.user_id == user_id)
         
         if start_date:
-            query = query.filter(Sale.bill_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+            query = query.filter(SalesDailyRollup.day >= datetime.strptime(start_date, '%Y-%m-%d').date())
         if end_date:
-            query = query.filter(Sale.bill_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+            query = query.filter(SalesDailyRollup.day <= datetime.strptime(end_date, '%Y-%m-%d').date())
         
-        daily_data = query.group_by(Sale.bill_date).order_by(Sale.bill_date).all()
+        daily_data = query.group_by(SalesDailyRollup.day).order_by(SalesDailyRollup.day).all()
         
         return {
             'success': True,
             'report_type': 'daily',
             'data': [{
-                'date': d.bill_date.strftime('%Y-%m-%d'),
+                'date': d.day.strftime('%Y-%m-%d'),
                 'sales_count': d.sales_count,
                 'total_amount': float(d.total_amount)
             } for d in daily_data]
@@ -646,23 +646,23 @@ class SalesManagementSystem:
     def _get_monthly_sales_report(self, user_id: int, start_date: str, end_date: str) -> Dict:
         """Generate monthly sales report"""
         query = db.session.query(
-            func.extract('year', Sale.bill_date).label('year'),
-            func.extract('month', Sale.bill_date).label('month'),
-            func.count(Sale.bill_no).label('sales_count'),
-            func.sum(Sale.sal_amt).label('total_amount')
-        ).filter(Sale.user_id == user_id)
+            func.extract('year', SalesDailyRollup.day).label('year'),
+            func.extract('month', SalesDailyRollup.day).label('month'),
+            func.sum(SalesDailyRollup.line_count).label('sales_count'),
+            func.sum(SalesDailyRollup.amount).label('total_amount')
+        ).filter(SalesDailyRollup.user_id == user_id)
         
         if start_date:
-            query = query.filter(Sale.bill_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+            query = query.filter(SalesDailyRollup.day >= datetime.strptime(start_date, '%Y-%m-%d').date())
         if end_date:
-            query = query.filter(Sale.bill_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+            query = query.filter(SalesDailyRollup.day <= datetime.strptime(end_date, '%Y-%m-%d').date())
         
         monthly_data = query.group_by(
-            func.extract('year', Sale.bill_date),
-            func.extract('month', Sale.bill_date)
+            func.extract('year', SalesDailyRollup.day),
+            func.extract('month', SalesDailyRollup.day)
         ).order_by(
-            func.extract('year', Sale.bill_date),
-            func.extract('month', Sale.bill_date)
+            func.extract('year', SalesDailyRollup.day),
+            func.extract('month', SalesDailyRollup.day)
         ).all()
         
         return {
@@ -679,17 +679,17 @@ class SalesManagementSystem:
     def _get_party_wise_sales_report(self, user_id: int, start_date: str, end_date: str) -> Dict:
         """Generate party-wise sales report"""
         query = db.session.query(
-            Sale.party_cd,
-            func.count(Sale.bill_no).label('sales_count'),
-            func.sum(Sale.sal_amt).label('total_amount')
-        ).filter(Sale.user_id == user_id)
+            SalesDailyRollup.party_cd,
+            func.sum(SalesDailyRollup.line_count).label('sales_count'),
+            func.sum(SalesDailyRollup.amount).label('total_amount')
+        ).filter(SalesDailyRollup.user_id == user_id)
         
         if start_date:
-            query = query.filter(Sale.bill_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+            query = query.filter(SalesDailyRollup.day >= datetime.strptime(start_date, '%Y-%m-%d').date())
         if end_date:
-            query = query.filter(Sale.bill_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+            query = query.filter(SalesDailyRollup.day <= datetime.strptime(end_date, '%Y-%m-%d').date())
         
-        party_data = query.group_by(Sale.party_cd).order_by(desc(func.sum(Sale.sal_amt))).all()
+        party_data = query.group_by(SalesDailyRollup.party_cd).order_by(desc(func.sum(SalesDailyRollup.amount))).all()
         
         return {
             'success': True,
@@ -704,17 +704,17 @@ class SalesManagementSystem:
     def _get_item_wise_sales_report(self, user_id: int, start_date: str, end_date: str) -> Dict:
         """Generate item-wise sales report"""
         query = db.session.query(
-            Sale.it_cd,
-            func.sum(Sale.qty).label('total_quantity'),
-            func.sum(Sale.sal_amt).label('total_amount')
-        ).filter(Sale.user_id == user_id)
+            SalesDailyRollup.it_cd,
+            func.sum(SalesDailyRollup.qty).label('total_quantity'),
+            func.sum(SalesDailyRollup.amount).label('total_amount')
+        ).filter(SalesDailyRollup.user_id == user_id)
         
         if start_date:
-            query = query.filter(Sale.bill_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+            query = query.filter(SalesDailyRollup.day >= datetime.strptime(start_date, '%Y-%m-%d').date())
         if end_date:
-            query = query.filter(Sale.bill_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+            query = query.filter(SalesDailyRollup.day <= datetime.strptime(end_date, '%Y-%m-%d').date())
         
-        item_data = query.group_by(Sale.it_cd).order_by(desc(func.sum(Sale.sal_amt))).all()
+        item_data = query.group_by(SalesDailyRollup.it_cd).order_by(desc(func.sum(SalesDailyRollup.amount))).all()
         
         return {
             'success': True,
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Scale Data
+Deterministic synthetic tenants, masters and transactions at production
+volumes, bulk loaded in batches
+"""
+
+import logging
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List
+import click
+from flask.cli import AppGroup
+from sqlalchemy import insert
+from database import db
+from models import User, Company, Party, Item, Purchase, Sale, Cashbook
+from password_hashing import hash_password
+from analytics_rollup import rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+USERNAME_PREFIX = 'scale'
+DEFAULT_PASSWORD = 'scale123'
+DEFAULT_BATCH_SIZE = 10000
+
+# Totals across all tenants; ``large`` is a busy multi-branch installation
+SCALES = {
+    'small': {'tenants': 2, 'parties': 1000, 'items': 200, 'sale_lines': 20000,
+              'purchase_lines': 10000, 'cashbook_entries': 5000},
+    'medium': {'tenants': 10, 'parties': 10000, 'items': 2000, 'sale_lines': 200000,
+               'purchase_lines': 100000, 'cashbook_entries': 50000},
+    'large': {'tenants': 100, 'parties': 50000, 'items': 10000, 'sale_lines': 2000000,
+              'purchase_lines': 1000000, 'cashbook_entries': 500000},
+}
+
+# Transactions are dated over the financial year ending here, so a given seed
+# always produces the same rows whatever day it runs
+LAST_DAY = date(2025, 3, 31)
+DAYS = 365
+
+FIRST_NAMES = ('Shree', 'Laxmi', 'Ganesh', 'Balaji', 'Sai', 'Om', 'Krishna', 'Durga', 'Mahavir',
+               'Jai', 'Ambika', 'Ravi', 'Sunil', 'Anand', 'Mohan', 'Gopal')
+TRADES = ('Traders', 'Enterprises', 'Suppliers', 'Agencies', 'Stores', 'Brothers',
+          'Wholesale', 'Mart', 'Sons', 'Company')
+PLACES = ('Indore', 'Bhopal', 'Ujjain', 'Dewas', 'Ratlam', 'Jabalpur', 'Gwalior', 'Sagar',
+          'Khandwa', 'Mandsaur')
+PRODUCTS = ('Rice', 'Wheat', 'Sugar', 'Oil', 'Pulses', 'Flour', 'Salt', 'Tea', 'Coffee', 'Spices',
+            'Onion', 'Potato', 'Garlic', 'Soyabean', 'Maize', 'Gram')
+GRADES = ('A', 'B', 'Premium', 'Regular', 'Export')
+CATEGORIES = ('Grains', 'Pulses', 'Oils', 'Beverages', 'Vegetables', 'Spices')
+AGENTS = ('AG01', 'AG02', 'AG03', None, None)
+
+
+def _split(total: int, parts: int, index: int) -> int:
+    """Share of ``total`` for part ``index`` when dividing as evenly as possible"""
+    return total // parts + (1 if index < total % parts else 0)
+
+
+def _batched(rows: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ScaleDataGenerator:
+    """Generates ``tenants`` users with their company, parties, items, sale and
+    purchase bills and cashbook entries
+
+    Each tenant draws from its own random stream (seeded with seed and tenant), so a
+    seed always yields identical rows regardless of batch size or of how
+    many tenants are generated. Rows go in with executemany INSERTs of
+    ``batch_size`` rows, one commit per batch; the analytics rollups are
+    rebuilt per tenant at the end because bulk inserts bypass the ORM flush
+    hook that normally maintains them.
+    """
+
+    def __init__(self, seed: int = 1, tenants: int = 2, parties: int = 1000, items: int = 200,
+                 sale_lines: int = 20000, purchase_lines: int = 10000, cashbook_entries: int = 5000,
+                 lines_per_bill: int = 5, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.seed = seed
+        self.tenants = tenants
+        self.parties = parties
+        self.items = items
+        self.sale_lines = sale_lines
+        self.purchase_lines = purchase_lines
+        self.cashbook_entries = cashbook_entries
+        self.lines_per_bill = lines_per_bill
+        self.batch_size = batch_size
+        self.created = datetime.combine(LAST_DAY, datetime.min.time())
+
+    def username(self, tenant: int) -> str:
+        return f'{USERNAME_PREFIX}{self.seed}_{tenant:03d}'
+
+    def party_code(self, tenant: int, n: int) -> str:
+        return f'S{self.seed % 100:02d}{tenant:03d}P{n:06d}'
+
+    def item_code(self, tenant: int, n: int) -> str:
+        return f'S{self.seed % 100:02d}{tenant:03d}I{n:05d}'
+
+    def generate(self) -> Dict:
+        """Load every tenant; returns row counts, user ids and elapsed seconds
+
+        Missing tables are created first, so an empty database file will do.
+        """
+        db.create_all()
+        existing = User.query.filter(User.username.in_([self.username(t) for t in range(self.tenants)])).count()
+        if existing:
+            raise ValueError(f"Seed {self.seed} has already been generated into this database")
+
+        started = time.perf_counter()
+        password_hash = hash_password(DEFAULT_PASSWORD)
+        counts = {'users': 0, 'parties': 0, 'items': 0, 'sales': 0, 'purchases': 0, 'cashbook': 0}
+        user_ids = []
+
+        for tenant in range(self.tenants):
+            rng = random.Random(f'{self.seed}:{tenant}')
+            user_id = self._create_tenant(tenant, password_hash)
+            user_ids.append(user_id)
+            counts['users'] += 1
+
+            parties = _split(self.parties, self.tenants, tenant) or 1
+            items = _split(self.items, self.tenants, tenant) or 1
+            counts['parties'] += self._load(Party, self._party_rows(rng, tenant, user_id, parties))
+            counts['items'] += self._load(Item, self._item_rows(rng, tenant, user_id, items))
+            for model, key, total in ((Sale, 'sales', self.sale_lines),
+                                      (Purchase, 'purchases', self.purchase_lines)):
+                lines = _split(total, self.tenants, tenant)
+                counts[key] += self._load(model, self._bill_rows(rng, tenant, user_id, parties, items, lines))
+            counts['cashbook'] += self._load(Cashbook, self._cashbook_rows(
+                rng, tenant, user_id, parties, _split(self.cashbook_entries, self.tenants, tenant)))
+
+            rebuild_rollups(user_id)
+            logger.info(f"Generated tenant {self.username(tenant)} (user {user_id})")
+
+        return {'counts': counts, 'user_ids': user_ids,
+                'seconds': round(time.perf_counter() - started, 1)}
+
+    def _create_tenant(self, tenant: int, password_hash: str) -> int:
+        username = self.username(tenant)
+        user = User(username=username, email=f'{username}@example.com', password_hash=password_hash,
+                    role='user', is_active=True, created_date=self.created)
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Company(user_id=user.id, name=f'{FIRST_NAMES[tenant % len(FIRST_NAMES)]} '
+                                                      f'{TRADES[tenant % len(TRADES)]} {tenant:03d}',
+                               city=PLACES[tenant % len(PLACES)], from_date=LAST_DAY - timedelta(days=DAYS - 1),
+                               to_date=LAST_DAY, created_date=self.created))
+        db.session.commit()
+        return user.id
+
+    def _load(self, model, rows: Iterator[Dict]) -> int:
+        loaded = 0
+        for batch in _batched(rows, self.batch_size):
+            db.session.execute(insert(model.__table__), batch)
+            db.session.commit()
+            loaded += len(batch)
+        return loaded
+
+    def _party_rows(self, rng: random.Random, tenant: int, user_id: int, count: int) -> Iterator[Dict]:
+        for n in range(count):
+            place = rng.choice(PLACES)
+            debit = round(rng.uniform(0, 500000), 2)
+            credit = round(rng.uniform(0, 500000), 2)
+            yield {
+                'party_cd': self.party_code(tenant, n),
+                'user_id': user_id,
+                'party_nm': f'{rng.choice(FIRST_NAMES)} {rng.choice(TRADES)} {n}',
+                'place': place,
+                'phone': f'9{rng.randrange(10 ** 9):09d}',
+                'mobile': f'9{rng.randrange(10 ** 9):09d}',
+                'email': f'party{n}@t{tenant:03d}.example.com',
+                'bal_cd': rng.choice('DC'),
+                'ly_baln': round(rng.uniform(0, 50000), 2),
+                'ytd_dr': debit,
+                'ytd_cr': credit,
+                'opening_bal': round(rng.uniform(-50000, 50000), 2),
+                'closing_bal': round(debit - credit, 2),
+                'credit_limit': rng.choice((0, 50000, 100000, 250000)),
+                'credit_status': 'ACTIVE',
+                'gstin': f'23{rng.randrange(10 ** 10):010d}Z{n % 10}',
+                'address1': f'{rng.randrange(1, 500)} Mandi Road',
+                'address3': place,
+                'created_date': self.created,
+                'modified_date': self.created,
+            }
+
+    def _item_rows(self, rng: random.Random, tenant: int, user_id: int, count: int) -> Iterator[Dict]:
+        for n in range(count):
+            rate = round(rng.uniform(20, 5000), 2)
+            yield {
+                'it_cd': self.item_code(tenant, n),
+                'user_id': user_id,
+                'it_nm': f'{rng.choice(PRODUCTS)} {rng.choice(GRADES)} {n}',
+                'unit': rng.choice(('KG', 'QTL', 'BAG')),
+                'rate': rate,
+                'mrp': round(rate * 1.2, 2),
+                'sprc': round(rate * 1.1, 2),
+                'category': rng.choice(CATEGORIES),
+                'hsn': f'{rng.randrange(1000, 9999)}',
+                'gst': rng.choice((0, 5, 12, 18)),
+                'reorder_level': rng.choice((10, 50, 100)),
+                'opening_stock': rng.randrange(0, 5000),
+                'closing_stock': 0,
+                'created_date': self.created,
+                'modified_date': self.created,
+            }
+
+    def _bill_rows(self, rng: random.Random, tenant: int, user_id: int, parties: int, items: int,
+                   lines: int) -> Iterator[Dict]:
+        bill_no = 0
+        written = 0
+        while written < lines:
+            bill_no += 1
+            # Bills are numbered in date order, as they are keyed in
+            bill_date = LAST_DAY - timedelta(days=DAYS - 1 - (written * DAYS) // lines)
+            party_cd = self.party_code(tenant, rng.randrange(parties))
+            agent_cd = rng.choice(AGENTS)
+            for _ in range(min(rng.randint(1, self.lines_per_bill * 2 - 1), lines - written)):
+                qty = float(rng.randint(1, 200))
+                rate = round(rng.uniform(20, 5000), 2)
+                amount = round(qty * rate, 2)
+                discount = round(amount * rng.choice((0, 0, 0.01, 0.02)), 2)
+                tax = round((amount - discount) * 0.05, 2)
+                yield {
+                    'user_id': user_id,
+                    'bill_no': bill_no,
+                    'bill_date': bill_date,
+                    'party_cd': party_cd,
+                    'it_cd': self.item_code(tenant, rng.randrange(items)),
+                    'qty': qty,
+                    'katta': qty,
+                    'rate': rate,
+                    'sal_amt': amount,
+                    'discount': discount,
+                    'taxamt': tax,
+                    'tot_amt': round(amount - discount + tax, 2),
+                    'agent_cd': agent_cd,
+                    'created_date': self.created,
+                    'modified_date': self.created,
+                }
+                written += 1
+
+    def _cashbook_rows(self, rng: random.Random, tenant: int, user_id: int, parties: int,
+                       count: int) -> Iterator[Dict]:
+        for n in range(count):
+            receipt = rng.random() < 0.6
+            amount = round(rng.uniform(500, 200000), 2)
+            yield {
+                'user_id': user_id,
+                'date': LAST_DAY - timedelta(days=DAYS - 1 - (n * DAYS) // max(count, 1)),
+                'narration': 'Received from party' if receipt else 'Paid to party',
+                'dr_amt': 0 if receipt else amount,
+                'cr_amt': amount if receipt else 0,
+                'party_cd': self.party_code(tenant, rng.randrange(parties)),
+                'voucher_type': 'RECEIPT' if receipt else 'PAYMENT',
+                'voucher_no': f'CB{n + 1:07d}',
+                'payment_type': rng.choice(('CASH', 'CHEQUE', 'BANK_TRANSFER')),
+                'created_date': self.created,
+                'modified_date': self.created,
+            }
+
+
+scale_cli = AppGroup('scale', help='Synthetic data at production volumes')
+
+@scale_cli.command('generate')
+@click.option('--scale', 'scale_name', type=click.Choice(sorted(SCALES)), default='small',
+              help='Preset totals; the options below override single figures')
+@click.option('--seed', type=int, default=1)
+@click.option('--tenants', type=int, default=None)
+@click.option('--parties', type=int, default=None, help='Parties across all tenants')
+@click.option('--items', type=int, default=None, help='Items across all tenants')
+@click.option('--sale-lines', type=int, default=None, help='Sale lines across all tenants')
+@click.option('--purchase-lines', type=int, default=None, help='Purchase lines across all tenants')
+@click.option('--cashbook-entries', type=int, default=None, help='Cashbook entries across all tenants')
+@click.option('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per INSERT batch and commit')
+def generate_command(scale_name, seed, batch_size, **overrides):
+    """Bulk load synthetic tenants (log in as scale<seed>_000 / scale123)"""
+    settings = dict(SCALES[scale_name], **{key: value for key, value in overrides.items() if value is not None})
+    generator = ScaleDataGenerator(seed=seed, batch_size=batch_size, **settings)
+    try:
+        result = generator.generate()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for table, count in result['counts'].items():
+        click.echo(f"{table:12} {count:>10}")
+    click.echo(f"user ids {result['user_ids'][0]}..{result['user_ids'][-1]} in {result['seconds']}s")
@@ -6,9 +6,11 @@ Flask API endpoints for Schedule Management System
 
 from flask import Blueprint, request, jsonify, render_template
 from schedule_management import ScheduleManagementSystem
+from lazy_load_guard import list_endpoint
 from database import db
 from models import User
 from flask_login import login_required, current_user
+from replica_routing import reporting
 import json
 from datetime import datetime, timedelta
 
@@ -188,6 +190,7 @@ def delete_schedule(schedule_id):
 
 @schedule_management_bp.route('/api/schedule', methods=['GET'])
 @login_required
+@list_endpoint
 def get_schedules():
     """Get schedules with filters"""
     try:
@@ -259,6 +262,7 @@ def get_schedule_reminders():
 
 @schedule_management_bp.route('/api/schedule/overdue', methods=['GET'])
 @login_required
+@list_endpoint
 def get_overdue_schedules():
     """Get overdue schedules"""
     try:
@@ -329,6 +333,7 @@ def search_schedules():
 
 @schedule_management_bp.route('/api/schedule/export', methods=['GET'])
 @login_required
+@reporting
 def export_schedule_data():
     """Export schedule data"""
     try:
@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+Schema Migrations
+Versioned schema changes that run while the shop stays open: short DDL
+transactions and small, keyed, throttled backfill batches, with progress
+recorded in schema_migrations so a run can be paused and resumed
+"""
+
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import inspect, select, text, update
+from sqlalchemy.exc import OperationalError
+from database import db
+from models import SchemaMigration
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MIGRATION_BATCH_SIZE': 500,
+    'MIGRATION_BATCH_PAUSE_MS': 50,  # Sleep between batches, so user requests get the database
+    'MIGRATION_BATCH_TARGET_MS': 250,  # Batches are resized to take about this long
+    'MIGRATION_LOCK_TIMEOUT_MS': 2000,  # PostgreSQL DDL gives up waiting for a lock after this
+}
+
+MIN_BATCH_SIZE = 50
+MAX_BATCH_SIZE = 20000
+DDL_ATTEMPTS = 5
+# A running migration whose runner has not reported for this long is taken over
+STALE_AFTER = timedelta(minutes=2)
+
+
+class MigrationPaused(Exception):
+    """A pause was requested; progress up to the last batch is saved"""
+
+
+class MigrationLocked(Exception):
+    """Another runner is working on the schema"""
+
+
+class Step:
+    """One part of a migration
+
+    ``run`` must be safe to repeat: after a pause or a crash the step starts
+    again from the progress saved in ``runner.progress``.
+    """
+
+    def describe(self) -> str:
+        raise NotImplementedError
+
+    def run(self, runner: 'MigrationRunner'):
+        raise NotImplementedError
+
+
+class AddColumn(Step):
+    def __init__(self, table: str, column: str, ddl: str):
+        self.table = table
+        self.column = column
+        self.ddl = ddl
+
+    def describe(self) -> str:
+        return f'add column {self.table}.{self.column}'
+
+    def run(self, runner):
+        columns = [column['name'] for column in inspect(runner.engine).get_columns(self.table)]
+        if self.column not in columns:
+            runner.ddl(lambda connection: connection.exec_driver_sql(
+                f'ALTER TABLE {self.table} ADD COLUMN {self.column} {self.ddl}'))
+
+
+class CreateTable(Step):
+    """Creates a model's table (with its indexes) if it does not exist"""
+
+    def __init__(self, table: str):
+        self.table = table
+
+    def describe(self) -> str:
+        return f'create table {self.table}'
+
+    def run(self, runner):
+        runner.ddl(lambda connection: db.metadata.tables[self.table].create(connection, checkfirst=True))
+
+
+class CreateIndex(Step):
+    """CREATE INDEX, concurrently on PostgreSQL so writers are never blocked
+
+    SQLite has no concurrent build; the table is locked for writes while the
+    index is built, which takes seconds even on large files.
+    """
+
+    def __init__(self, name: str, table: str, columns: List[str], unique: bool = False):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.unique = unique
+
+    def describe(self) -> str:
+        return f'create index {self.name}'
+
+    def run(self, runner):
+        unique = 'UNIQUE ' if self.unique else ''
+        columns = ', '.join(self.columns)
+        if runner.engine.dialect.name == 'postgresql':
+            # CONCURRENTLY cannot run inside a transaction block
+            with runner.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.exec_driver_sql(
+                    f'CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {self.name} ON {self.table} ({columns})')
+        else:
+            runner.ddl(lambda connection: connection.exec_driver_sql(
+                f'CREATE {unique}INDEX IF NOT EXISTS {self.name} ON {self.table} ({columns})'))
+
+
+def model_indexes(*tables: str) -> List[CreateIndex]:
+    """CreateIndex steps for the indexes the models declare on ``tables``"""
+    steps = []
+    for name in tables:
+        for index in sorted(db.metadata.tables[name].indexes, key=lambda index: index.name):
+            steps.append(CreateIndex(index.name, name, [column.name for column in index.columns], index.unique))
+    return steps
+
+
+class Backfill(Step):
+    """``UPDATE table SET ... WHERE ...`` in key-ordered batches, one transaction each
+
+    Each batch covers the next ``runner.batch_size`` keys after the cursor,
+    so only those rows are locked and only briefly; the cursor is saved in
+    the same transaction as the batch. The batch size adapts to keep each
+    batch near the target time. Rows are written with Core statements, so
+    ORM events (the analytics rollups) do not see them.
+    """
+
+    def __init__(self, table: str, assignments: str, where: Optional[str] = None,
+                 key: Optional[str] = None, params: Optional[Dict] = None):
+        self.table = table
+        self.assignments = assignments
+        self.where = where
+        self.key = key
+        self.params = params or {}
+
+    def describe(self) -> str:
+        return f'backfill {self.table}'
+
+    def run(self, runner):
+        table = db.metadata.tables[self.table]
+        key = self.key or table.primary_key.columns.values()[0].name
+        key_type = table.c[key].type.python_type
+        after = f'WHERE {key} > :cursor' if runner.progress['cursor'] is not None else ''
+
+        if runner.progress['rows_total'] is None:
+            with runner.engine.connect() as connection:
+                total = connection.execute(text(f'SELECT COUNT(*) FROM {self.table}')).scalar()
+            runner.save(rows_total=total)
+
+        condition = f' AND ({self.where})' if self.where else ''
+        batch_size = runner.batch_size
+        while True:
+            runner.checkpoint()
+            cursor = runner.progress['cursor']
+            params = {'cursor': key_type(cursor)} if cursor is not None else {}
+            started = time.perf_counter()
+            with runner.engine.begin() as connection:
+                upper = connection.execute(text(
+                    f'SELECT {key} FROM {self.table} {after} ORDER BY {key} LIMIT 1 OFFSET :offset'),
+                    dict(params, offset=batch_size - 1)).scalar()
+                if upper is None:
+                    # Last, partial batch
+                    last, scanned = connection.execute(text(
+                        f'SELECT MAX({key}), COUNT(*) FROM {self.table} {after}'), params).one()
+                    if last is None:
+                        return
+                else:
+                    last, scanned = upper, batch_size
+                lower = f'{key} > :cursor AND ' if cursor is not None else ''
+                changed = connection.execute(text(
+                    f'UPDATE {self.table} SET {self.assignments} WHERE {lower}{key} <= :last{condition}'),
+                    dict(self.params, **params, last=last)).rowcount
+                runner.save(connection, cursor=str(last),
+                            rows_scanned=runner.progress['rows_scanned'] + scanned,
+                            rows_changed=runner.progress['rows_changed'] + max(changed, 0))
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            runner.report()
+            if upper is None:
+                return
+
+            if elapsed_ms > runner.target_ms:
+                batch_size = max(MIN_BATCH_SIZE, batch_size // 2)
+            elif elapsed_ms < runner.target_ms / 4:
+                batch_size = min(MAX_BATCH_SIZE, batch_size * 2)
+            after = f'WHERE {key} > :cursor'
+            time.sleep(runner.pause_ms / 1000)
+
+
+class ForEachTenant(Step):
+    """Calls ``fn(user_id)`` for every user, in id order; ``fn`` commits its own work"""
+
+    def __init__(self, fn: Callable[[int], object], label: str):
+        self.fn = fn
+        self.label = label
+
+    def describe(self) -> str:
+        return self.label
+
+    def run(self, runner):
+        users = db.metadata.tables['users']
+        with runner.engine.connect() as connection:
+            if runner.progress['rows_total'] is None:
+                runner.save(rows_total=connection.execute(select(db.func.count()).select_from(users)).scalar())
+            query = select(users.c.id).order_by(users.c.id)
+            if runner.progress['cursor'] is not None:
+                query = query.where(users.c.id > int(runner.progress['cursor']))
+            user_ids = connection.execute(query).scalars().all()
+
+        for user_id in user_ids:
+            runner.checkpoint()
+            self.fn(user_id)
+            runner.save(cursor=str(user_id), rows_scanned=runner.progress['rows_scanned'] + 1)
+            runner.report()
+            time.sleep(runner.pause_ms / 1000)
+
+
+class Migration:
+    def __init__(self, version: str, name: str, steps: List[Step]):
+        self.version = version
+        self.name = name
+        self.steps = steps
+
+
+def _rebuild_tenant_rollups(user_id: int):
+    from analytics_rollup import rebuild_rollups
+    rebuild_rollups(user_id)
+
+
+# In version order. Each step checks what is already there, so databases
+# that were upgraded with the old one-off scripts pass through quickly.
+MIGRATIONS: List[Migration] = [
+    Migration('0001', 'Multi-user ownership (migrate_database.py)', [
+        step for table in ('parties', 'items', 'purchases', 'sales', 'cashbook', 'bankbook', 'company')
+        for step in (AddColumn(table, 'user_id', 'INTEGER'),
+                     Backfill(table, "user_id = (SELECT MIN(id) FROM users WHERE role = 'admin')",
+                              where='user_id IS NULL'))
+    ]),
+    Migration('0002', 'Credit and payment tracking (migrate_enhanced_schema.py)', [
+        AddColumn('parties', 'credit_limit', 'FLOAT DEFAULT 0'),
+        AddColumn('parties', 'current_balance', 'FLOAT DEFAULT 0'),
+        AddColumn('parties', 'payment_terms', 'VARCHAR(50)'),
+        AddColumn('parties', 'last_payment_date', 'DATE'),
+        AddColumn('parties', 'credit_status', "VARCHAR(20) DEFAULT 'ACTIVE'"),
+        AddColumn('parties', 'opening_balance_date', 'DATE'),
+        AddColumn('sales', 'payment_status', "VARCHAR(20) DEFAULT 'PENDING'"),
+        AddColumn('sales', 'payment_due_date', 'DATE'),
+        AddColumn('sales', 'amount_paid', 'FLOAT DEFAULT 0'),
+        AddColumn('sales', 'payment_terms', 'VARCHAR(50)'),
+        AddColumn('sales', 'credit_days', 'INTEGER DEFAULT 0'),
+        AddColumn('cashbook', 'related_sale_id', 'INTEGER'),
+        AddColumn('cashbook', 'payment_type', 'VARCHAR(20)'),
+        AddColumn('cashbook', 'reference_no', 'VARCHAR(50)'),
+        AddColumn('cashbook', 'payment_method', 'VARCHAR(50)'),
+        AddColumn('cashbook', 'bank_name', 'VARCHAR(100)'),
+        AddColumn('cashbook', 'branch_name', 'VARCHAR(100)'),
+        AddColumn('cashbook', 'cheque_date', 'DATE'),
+        AddColumn('cashbook', 'transaction_date', 'TIMESTAMP'),
+        CreateTable('ledger'),
+        CreateIndex('idx_ledger_party_date', 'ledger', ['party_cd', 'date']),
+        CreateIndex('idx_ledger_financial_year', 'ledger', ['financial_year']),
+        CreateIndex('idx_ledger_user_date', 'ledger', ['user_id', 'date']),
+        CreateIndex('idx_sales_payment_status', 'sales', ['payment_status']),
+        CreateIndex('idx_cashbook_related_sale', 'cashbook', ['related_sale_id']),
+        CreateIndex('idx_parties_credit_status', 'parties', ['credit_status']),
+        Backfill('sales', "payment_status = CASE WHEN COALESCE(amount_paid, 0) >= COALESCE(sal_amt, 0) THEN 'PAID' "
+                          "WHEN COALESCE(amount_paid, 0) > 0 THEN 'PARTIAL' ELSE 'PENDING' END",
+                 where='payment_status IS NULL'),
+    ]),
+    Migration('0003', 'Sale to purchase link (migrate_purchase_sale.py)', [
+        AddColumn('sales', 'purchase_id', 'INTEGER REFERENCES purchases(id)'),
+    ]),
+    Migration('0004', 'Tenant list indexes', model_indexes('parties', 'items', 'purchases', 'sales', 'cashbook')),
+    Migration('0005', 'Rollup, legacy import and refresh token tables', [
+        CreateTable('sales_daily_rollup'),
+        CreateTable('purchase_daily_rollup'),
+        CreateTable('legacy_import_checkpoints'),
+        CreateTable('legacy_row_hashes'),
+        CreateTable('refresh_tokens'),
+        ForEachTenant(_rebuild_tenant_rollups, 'rebuild daily rollups'),
+    ]),
+    Migration('0006', 'Financial year closes', [
+        CreateTable('financial_year_closes'),
+    ]),
+]
+
+
+class MigrationRunner:
+    """Applies pending migrations step by step, saving progress as it goes
+
+    The ``schema_migrations`` row of the running version holds the step
+    index and, for batched steps, the cursor and row counts; every batch
+    refreshes it, so ``status()`` from another process shows live progress,
+    and ``pause()`` there (or Ctrl+C here) stops the run after the current
+    batch. Running again resumes where it stopped. One runner at a time:
+    another runner's fresh heartbeat raises ``MigrationLocked``.
+    """
+
+    def __init__(self, migrations: Optional[List[Migration]] = None, engine=None, config: Optional[Dict] = None,
+                 report: Optional[Callable[[Dict], None]] = None):
+        config = dict(DEFAULTS, **{name: value for name, value in (config or {}).items() if name in DEFAULTS})
+        self.migrations = sorted(migrations if migrations is not None else MIGRATIONS,
+                                 key=lambda migration: migration.version)
+        self.engine = engine if engine is not None else db.engine
+        self.batch_size = int(config['MIGRATION_BATCH_SIZE'])
+        self.pause_ms = float(config['MIGRATION_BATCH_PAUSE_MS'])
+        self.target_ms = float(config['MIGRATION_BATCH_TARGET_MS'])
+        self.lock_timeout_ms = int(config['MIGRATION_LOCK_TIMEOUT_MS'])
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self._report = report
+        self.migration: Optional[Migration] = None
+        self.progress: Dict = {}
+        self._table = SchemaMigration.__table__
+
+    def _rows(self) -> Dict[str, Dict]:
+        if not inspect(self.engine).has_table(self._table.name):
+            return {}
+        with self.engine.connect() as connection:
+            return {row['version']: dict(row) for row in connection.execute(select(self._table)).mappings()}
+
+    def pending(self) -> List[Migration]:
+        rows = self._rows()
+        return [migration for migration in self.migrations
+                if rows.get(migration.version, {}).get('state') != 'applied']
+
+    def status(self) -> List[Dict]:
+        """Every known migration with its state and the progress of the step in flight"""
+        rows = self._rows()
+        statuses = []
+        for migration in self.migrations:
+            row = rows.get(migration.version) or {'state': 'pending'}
+            status = dict(row, version=migration.version, name=migration.name, steps=len(migration.steps))
+            if row['state'] in ('running', 'paused', 'failed') and row.get('step', 0) < len(migration.steps):
+                status['current_step'] = migration.steps[row['step']].describe()
+                if row.get('rows_total'):
+                    status['percent'] = round(100 * min(row['rows_scanned'] or 0, row['rows_total'])
+                                              / row['rows_total'], 1)
+            statuses.append(status)
+        return statuses
+
+    def stamp(self):
+        """Record every migration as applied, for a schema just built by create_all()"""
+        self._table.create(self.engine, checkfirst=True)
+        rows = self._rows()
+        now = datetime.utcnow()
+        with self.engine.begin() as connection:
+            for migration in self.migrations:
+                if migration.version not in rows:
+                    connection.execute(self._table.insert().values(
+                        version=migration.version, name=migration.name, state='applied',
+                        step=len(migration.steps), rows_scanned=0, rows_changed=0,
+                        started_at=now, finished_at=now))
+
+    def pause(self) -> int:
+        """Ask the running migration to stop after its current batch"""
+        if not inspect(self.engine).has_table(self._table.name):
+            return 0
+        with self.engine.begin() as connection:
+            return connection.execute(update(self._table).where(self._table.c.state == 'running')
+                                      .values(pause_requested=True)).rowcount
+
+    def run(self, target: Optional[str] = None) -> List[str]:
+        """Apply pending migrations up to ``target``; returns the versions applied
+
+        Raises ``MigrationPaused`` when stopped by a pause request or Ctrl+C.
+        """
+        self._table.create(self.engine, checkfirst=True)
+        applied = []
+        for migration in self.pending():
+            if target is not None and migration.version > target:
+                break
+            self._claim(migration)
+            try:
+                for index in range(self.progress['step'], len(migration.steps)):
+                    step = migration.steps[index]
+                    logger.info(f"Migration {migration.version} step {index + 1}/{len(migration.steps)}: "
+                                f"{step.describe()}")
+                    step.run(self)
+                    self.save(step=index + 1, cursor=None, rows_total=None, rows_scanned=0, rows_changed=0)
+            except (MigrationPaused, KeyboardInterrupt):
+                self.save(state='paused', pause_requested=False)
+                logger.info(f"Migration {migration.version} paused at step {self.progress['step'] + 1}")
+                raise MigrationPaused(migration.version)
+            except Exception as e:
+                self.save(state='failed', error=str(e))
+                raise
+            self.save(state='applied', finished_at=datetime.utcnow(), error=None)
+            logger.info(f"Migration {migration.version} applied")
+            applied.append(migration.version)
+        return applied
+
+    def _claim(self, migration: Migration):
+        now = datetime.utcnow()
+        with self.engine.begin() as connection:
+            for row in connection.execute(select(self._table).where(self._table.c.state == 'running')).mappings():
+                if row['owner'] != self.owner and row['heartbeat_at'] and now - row['heartbeat_at'] < STALE_AFTER:
+                    raise MigrationLocked(f"Migration {row['version']} is being run by {row['owner']}")
+            row = connection.execute(select(self._table).where(
+                self._table.c.version == migration.version)).mappings().first()
+            values = {'state': 'running', 'owner': self.owner, 'heartbeat_at': now,
+                      'pause_requested': False, 'error': None}
+            if row is None:
+                connection.execute(self._table.insert().values(
+                    version=migration.version, name=migration.name, step=0, rows_scanned=0, rows_changed=0,
+                    started_at=now, **values))
+            else:
+                connection.execute(update(self._table).where(
+                    self._table.c.version == migration.version).values(**values))
+            row = connection.execute(select(self._table).where(
+                self._table.c.version == migration.version)).mappings().one()
+        self.migration = migration
+        self.progress = dict(row)
+
+    def save(self, connection=None, **values):
+        """Update the running migration's row, inside ``connection``'s transaction if given"""
+        values['heartbeat_at'] = datetime.utcnow()
+        statement = update(self._table).where(self._table.c.version == self.migration.version).values(**values)
+        if connection is not None:
+            connection.execute(statement)
+        else:
+            with self.engine.begin() as own:
+                own.execute(statement)
+        self.progress.update(values)
+
+    def checkpoint(self):
+        """Called between batches: raises MigrationPaused if a pause was requested"""
+        with self.engine.connect() as connection:
+            requested = connection.execute(select(self._table.c.pause_requested).where(
+                self._table.c.version == self.migration.version)).scalar()
+        if requested:
+            raise MigrationPaused(self.migration.version)
+
+    def report(self):
+        if self._report is not None:
+            self._report(dict(self.progress, name=self.migration.name,
+                              steps=len(self.migration.steps),
+                              current_step=self.migration.steps[self.progress['step']].describe()))
+
+    def ddl(self, fn: Callable):
+        """Run ``fn(connection)`` in its own short transaction, retrying on lock timeouts
+
+        PostgreSQL gets a lock_timeout, so an ALTER queued behind a long
+        report cannot stall every request queued behind the ALTER.
+        """
+        for attempt in range(1, DDL_ATTEMPTS + 1):
+            try:
+                with self.engine.begin() as connection:
+                    if connection.dialect.name == 'postgresql':
+                        connection.exec_driver_sql(f'SET LOCAL lock_timeout = {self.lock_timeout_ms}')
+                    fn(connection)
+                return
+            except OperationalError as e:
+                if attempt == DDL_ATTEMPTS:
+                    raise
+                logger.warning(f"DDL attempt {attempt} could not get its lock, retrying: {e.orig}")
+                time.sleep(attempt)
+
+
+def init_schema():
+    """db.create_all(); a database that had no tables is stamped as fully migrated
+
+    Tables that already existed keep their columns, so an older database
+    still needs ``flask schema upgrade``.
+    """
+    fresh = not inspect(db.engine).has_table('users')
+    db.create_all()
+    if fresh:
+        MigrationRunner().stamp()
+
+
+schema_cli = AppGroup('schema', help='Versioned online schema migrations')
+
+
+def _runner(**config) -> MigrationRunner:
+    settings = {name: current_app.config.get(name, default) for name, default in DEFAULTS.items()}
+    settings.update({name: value for name, value in config.items() if value is not None})
+    return MigrationRunner(config=settings, report=_echo_progress())
+
+
+def _echo_progress():
+    last = {'at': 0.0}
+
+    def echo(progress: Dict):
+        if time.monotonic() - last['at'] < 1:
+            return
+        last['at'] = time.monotonic()
+        done = f"{progress['rows_scanned']}/{progress['rows_total']}" if progress.get('rows_total') else \
+            str(progress['rows_scanned'])
+        click.echo(f"  {progress['version']} step {progress['step'] + 1}/{progress['steps']} "
+                   f"{progress['current_step']}: {done} rows, {progress['rows_changed']} changed")
+
+    return echo
+
+
+@schema_cli.command('status')
+def status_command():
+    """Applied, running, paused and pending migrations"""
+    for status in _runner().status():
+        line = f"{status['version']}  {status['state']:8}  {status['name']}"
+        if 'current_step' in status:
+            line += f"\n        step {status['step'] + 1}/{status['steps']}: {status['current_step']}"
+            if 'percent' in status:
+                line += f" ({status['percent']}%, {status['rows_changed']} rows changed)"
+        if status.get('error'):
+            line += f"\n        error: {status['error']}"
+        click.echo(line)
+
+
+@schema_cli.command('upgrade')
+@click.option('--target', default=None, help='Stop after this version')
+@click.option('--batch-size', type=int, default=None, help='Initial backfill batch size (MIGRATION_BATCH_SIZE)')
+@click.option('--pause-ms', type=float, default=None, help='Sleep between batches (MIGRATION_BATCH_PAUSE_MS)')
+def upgrade_command(target, batch_size, pause_ms):
+    """Apply pending migrations; safe to stop (Ctrl+C or "flask schema pause") and run again"""
+    runner = _runner(MIGRATION_BATCH_SIZE=batch_size, MIGRATION_BATCH_PAUSE_MS=pause_ms)
+    try:
+        applied = runner.run(target)
+    except MigrationPaused as e:
+        raise click.ClickException(f'Paused during {e}; run "flask schema upgrade" again to resume')
+    except MigrationLocked as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Applied {', '.join(applied)}" if applied else 'Schema is up to date')
+
+
+@schema_cli.command('pause')
+def pause_command():
+    """Stop the running migration after its current batch"""
+    if _runner().pause():
+        click.echo('Pause requested; the runner stops after its current batch')
+    else:
+        click.echo('No migration is running')
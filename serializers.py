@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+API Serializers
+Column projections for the JSON API, encoded with orjson
+"""
+
+from typing import Dict, List, Sequence, Tuple
+import orjson
+from flask import current_app
+from sqlalchemy import func, select
+from database import db
+from models import Party, Item, Purchase, Sale
+
+
+class Projection:
+    """The fields one endpoint emits, each bound to the column it is read from
+
+    ``query()`` selects exactly those columns as tuples (outer-joining the
+    tables that supply names), so a list response never hydrates full ORM
+    rows or lazy-loads a relationship per row. ``rows()``/``one()`` turn the
+    tuples back into the same dicts the ``serialize_*`` helpers return.
+    """
+
+    def __init__(self, model, fields: Sequence[Tuple[str, object]], joins: Sequence[Tuple] = ()):
+        self.model = model
+        self.keys = [key for key, _ in fields]
+        self.columns = [column.label(key) for key, column in fields]
+        self.joins = joins
+
+    def query(self, query=None):
+        """Narrow ``query`` (default ``model.query``) to the projected columns"""
+        query = (query if query is not None else self.model.query).with_entities(*self.columns)
+        for target, onclause in self.joins:
+            query = query.outerjoin(target, onclause)
+        return query
+
+    def rows(self, rows) -> List[Dict]:
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in rows]
+
+    def one(self, row) -> Dict:
+        return dict(zip(self.keys, row))
+
+
+PARTY_FIELDS = Projection(Party, [
+    ('party_cd', Party.party_cd),
+    ('party_nm', Party.party_nm),
+    ('party_nm_hindi', Party.party_nm_hindi),
+    ('place', Party.place),
+    ('phone', Party.phone),
+    ('bal_cd', Party.bal_cd),
+    ('ly_baln', Party.ly_baln),
+    ('ytd_dr', Party.ytd_dr),
+    ('ytd_cr', Party.ytd_cr),
+    ('address1', Party.address1),
+    ('address2', Party.address2),
+    ('address3', Party.address3),
+    ('gstin', Party.gstin),
+    ('pan', Party.pan),
+    ('email', Party.email),
+    ('mobile', Party.mobile),
+    ('opening_bal', Party.opening_bal),
+    ('closing_bal', Party.closing_bal),
+    ('created_date', Party.created_date),
+    ('modified_date', Party.modified_date),
+])
+
+ITEM_FIELDS = Projection(Item, [
+    ('it_cd', Item.it_cd),
+    ('it_nm', Item.it_nm),
+    ('unit', Item.unit),
+    ('rate', Item.rate),
+    ('category', Item.category),
+    ('mrp', Item.mrp),
+    ('sprc', Item.sprc),
+    ('hsn', Item.hsn),
+    ('gst', Item.gst),
+    ('opening_stock', Item.opening_stock),
+    ('closing_stock', Item.closing_stock),
+    ('created_date', Item.created_date),
+    ('modified_date', Item.modified_date),
+])
+
+# Bags sold out of each purchase lot
+_sold_bags = select(func.coalesce(func.sum(Sale.qty), 0)).where(
+    Sale.purchase_id == Purchase.id
+).correlate(Purchase).scalar_subquery()
+
+PURCHASE_FIELDS = Projection(Purchase, [
+    ('id', Purchase.id),
+    ('bill_no', Purchase.bill_no),
+    ('bill_date', Purchase.bill_date),
+    ('party_cd', Purchase.party_cd),
+    ('party_nm', Party.party_nm),
+    ('it_cd', Purchase.it_cd),
+    ('it_nm', Item.it_nm),
+    ('qty', Purchase.qty),
+    ('rate', Purchase.rate),
+    ('sal_amt', Purchase.sal_amt),
+    ('discount', Purchase.discount),
+    ('tot_amt', Purchase.tot_amt),
+    ('taxamt', Purchase.taxamt),
+    ('sold_bags', _sold_bags),
+    ('created_date', Purchase.created_date),
+], joins=[(Party, Party.party_cd == Purchase.party_cd), (Item, Item.it_cd == Purchase.it_cd)])
+
+SALE_FIELDS = Projection(Sale, [
+    ('id', Sale.id),
+    ('bill_no', Sale.bill_no),
+    ('bill_date', Sale.bill_date),
+    ('party_cd', Sale.party_cd),
+    ('party_nm', Party.party_nm),
+    ('it_cd', Sale.it_cd),
+    ('it_nm', Item.it_nm),
+    ('qty', Sale.qty),
+    ('rate', Sale.rate),
+    ('sal_amt', Sale.sal_amt),
+    ('discount', Sale.discount),
+    ('tot_amt', Sale.tot_amt),
+    ('taxamt', Sale.taxamt),
+    ('created_date', Sale.created_date),
+], joins=[(Party, Party.party_cd == Sale.party_cd), (Item, Item.it_cd == Sale.it_cd)])
+
+
+def paginated(projection: Projection, query, key: str, page: int, per_page: int) -> Dict:
+    """The ``{key: [...], total, pages, ...}`` envelope of the list endpoints"""
+    pagination = projection.query(query).paginate(page=page, per_page=per_page, error_out=False)
+    return {
+        key: projection.rows(pagination.items),
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'current_page': pagination.page,
+        'has_next': pagination.has_next,
+        'has_prev': pagination.has_prev
+    }
+
+
+def _default(value):
+    # orjson covers str/int/float/bool/None, dates and datetimes natively;
+    # Decimal totals from SQL aggregates are the only other type we emit
+    if hasattr(value, '__float__'):
+        return float(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def json_response(payload, status: int = 200):
+    """``jsonify`` replacement backed by orjson
+
+    Dates and datetimes come out in ISO 8601, like the ``serialize_*``
+    helpers' ``isoformat()``; keys are sorted as Flask's encoder does.
+    """
+    body = orjson.dumps(payload, default=_default, option=orjson.OPT_SORT_KEYS)
+    return current_app.response_class(body, status=status, mimetype='application/json')
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Production Server
+Pre-forking multi-process, thread-pooled HTTP server for the app, with
+worker recycling and keep-alive tuning (``python run.py --serve``)
+"""
+
+import gc
+import io
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Optional
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from metrics import clear_multiprocess_dir
+
+logger = logging.getLogger(__name__)
+
+# Socket timeout while a request is read when keep-alive is off
+READ_TIMEOUT = 30
+# A worker that dies sooner than this after starting is respawned with a delay
+BOOT_GRACE = 5
+
+
+def _handler_class(keepalive: float):
+    class KeepAliveRequestHandler(WSGIRequestHandler):
+        """HTTP/1.1 handler that keeps an idle connection for ``keepalive`` seconds
+
+        Werkzeug closes every connection and, after each response, reads
+        whatever the client sent next to discard an unread body. Requests
+        without a body (the GETs that make up most page and fragment loads)
+        have nothing to discard, so they get an empty input stream, that
+        read finds nothing, and the connection stays open. The socket timeout
+        doubles as the idle limit, so a client that goes quiet frees its pool
+        thread. A draining server closes every connection after the response
+        in progress.
+        """
+
+        protocol_version = 'HTTP/1.1'
+        timeout = keepalive if keepalive > 0 else READ_TIMEOUT
+        # Headers and body go out in separate writes; with Nagle on, a reused
+        # connection waits for the client's delayed ACK (~40 ms) in between
+        disable_nagle_algorithm = True
+
+        def _keep_alive(self) -> bool:
+            return (keepalive > 0 and not self.server.draining
+                    and self.headers.get('Content-Length', '0').strip() in ('', '0')
+                    and 'Transfer-Encoding' not in self.headers
+                    and self.headers.get('Connection', '').lower() != 'close')
+
+        def run_wsgi(self):
+            if not self._keep_alive():
+                return super().run_wsgi()
+            rfile, self.rfile = self.rfile, io.BytesIO()
+            try:
+                return super().run_wsgi()
+            finally:
+                self.rfile = rfile
+
+        def send_header(self, keyword, value):
+            if keyword.lower() == 'connection' and value.lower() == 'close' and self._keep_alive():
+                return
+            super().send_header(keyword, value)
+
+        def handle_one_request(self):
+            super().handle_one_request()
+            if self.server.draining:
+                self.close_connection = True
+
+        def log_error(self, format, *args):
+            # An idle keep-alive connection timing out is routine, not an error
+            if not format.startswith('Request timed out'):
+                super().log_error(format, *args)
+
+    return KeepAliveRequestHandler
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Serves connections on a fixed pool of ``threads`` threads
+
+    Werkzeug's threaded server starts a thread per connection, without a
+    limit; here connections beyond the pool size wait in the pool's queue.
+    After ``max_requests`` requests (0 for no limit) the server stops
+    accepting, so the worker can exit and be replaced.
+    """
+
+    multithread = True
+
+    def __init__(self, host: str, port: int, app, threads: int, keepalive: float,
+                 max_requests: int = 0, fd: Optional[int] = None):
+        self.threads = threads
+        self.max_requests = max_requests
+        self.served = 0
+        self.draining = False
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+        self._pending = set()
+        self._count_lock = threading.Lock()
+        super().__init__(host, port, self._counting(app), handler=_handler_class(keepalive), fd=fd)
+
+    def _counting(self, app):
+        def counted(environ, start_response):
+            with self._count_lock:
+                self.served += 1
+                limit_reached = self.max_requests and self.served == self.max_requests
+            if limit_reached:
+                logger.info(f"Worker {os.getpid()} served {self.served} requests; recycling")
+                self.begin_drain()
+            return app(environ, start_response)
+
+        return counted
+
+    def process_request(self, request, client_address):
+        future = self._executor.submit(self._process, request, client_address)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+    def _process(self, request, client_address):
+        # Same as socketserver.ThreadingMixIn.process_request_thread
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def begin_drain(self):
+        """Stop accepting; safe to call from a signal handler or a request thread"""
+        if not self.draining:
+            self.draining = True
+            # shutdown() waits for serve_forever(), so never on its own thread
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def drain(self, timeout: float):
+        """Wait up to ``timeout`` seconds for the requests in flight"""
+        self.draining = True
+        done, not_done = wait(list(self._pending), timeout=timeout)
+        if not_done:
+            logger.warning(f"Worker {os.getpid()} exiting with {len(not_done)} connection(s) still open")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PreforkServer:
+    """Binds once, preloads the app, then forks ``workers`` copies to serve it
+
+    Everything built before the fork (routes, mappers, compiled templates)
+    is shared copy-on-write; ``gc.freeze()`` keeps the collector from
+    touching, and so copying, those objects in the workers. A worker that
+    exits (recycled or crashed) is replaced. SIGTERM or Ctrl+C drains every
+    worker for up to ``graceful_timeout`` seconds before they are killed.
+    """
+
+    def __init__(self, app, host: str, port: int, options: Dict):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = options['SERVE_WORKERS']
+        self.threads = options['SERVE_THREADS']
+        self.max_requests = options['SERVE_MAX_REQUESTS']
+        self.jitter = options['SERVE_MAX_REQUESTS_JITTER']
+        self.keepalive = options['SERVE_KEEPALIVE']
+        self.graceful_timeout = options['SERVE_GRACEFUL_TIMEOUT']
+        self.backlog = options['SERVE_BACKLOG']
+        self.pid = os.getpid()
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+        self.socket: Optional[socket.socket] = None
+
+    def run(self):
+        self.socket = socket.create_server((self.host, self.port), backlog=self.backlog)
+        self.socket.set_inheritable(True)
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        metrics = self.app.extensions.get('metrics')
+        if metrics is not None and metrics.store is not None:
+            clear_multiprocess_dir(metrics.store.directory)
+
+        gc.collect()
+        gc.freeze()
+        logger.info(f"Serving on http://{self.host}:{self.port} with {self.workers} workers x "
+                    f"{self.threads} threads (pid {self.pid})")
+        try:
+            while not self.stopping:
+                self._reap()
+                self._spawn_missing()
+                time.sleep(0.5)
+        finally:
+            # A forked worker's SystemExit unwinds through here as well
+            if os.getpid() == self.pid:
+                self._stop_workers()
+                self.socket.close()
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _spawn_missing(self):
+        while len(self.children) < self.workers and not self.stopping:
+            pid = os.fork()
+            if pid == 0:
+                raise SystemExit(self._worker())
+            self.children[pid] = time.monotonic()
+
+    def _reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            started = self.children.pop(pid, time.monotonic())
+            code = os.waitstatus_to_exitcode(status)
+            if code == 0:
+                logger.info(f"Worker {pid} exited" + ("" if self.stopping else "; starting a replacement"))
+            else:
+                logger.error(f"Worker {pid} died with status {code}")
+                if time.monotonic() - started < BOOT_GRACE:
+                    time.sleep(1)
+
+    def _stop_workers(self):
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout + 1
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in self.children:
+            logger.warning(f"Killing worker {pid} after the graceful timeout")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def _worker(self) -> int:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        random.seed()
+        _forget_inherited_connections(self.app)
+
+        limit = self.max_requests + random.randint(0, self.jitter) if self.max_requests else 0
+        server = PooledWSGIServer(self.host, self.port, self.app, self.threads, self.keepalive,
+                                  max_requests=limit, fd=self.socket.fileno())
+        signal.signal(signal.SIGTERM, lambda signum, frame: server.begin_drain())
+        try:
+            server.serve_forever(poll_interval=0.5)
+            server.drain(self.graceful_timeout)
+        except Exception:
+            logger.exception(f"Worker {os.getpid()} failed")
+            return 1
+        return 0
+
+
+def _forget_inherited_connections(app):
+    # Pooled connections opened by the parent must not be shared; close=False
+    # leaves them open for the parent and starts this process with empty pools
+    from database import db
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    replica = app.extensions.get('read_replica')
+    if replica is not None and replica.engine is not None:
+        engines.append(replica.engine)
+    archive = app.extensions.get('year_archive')
+    if archive is not None:
+        engines.extend(archive.engines())
+    for engine in engines:
+        engine.dispose(close=False)
+
+
+def serve(app, host: str = '0.0.0.0', port: int = 5000):
+    """Serve ``app`` with the SERVE_* settings from its config until stopped
+
+    Several workers need ``os.fork`` (Linux, macOS). Elsewhere, or with
+    SERVE_WORKERS at 1, a single process serves on SERVE_THREADS threads and
+    requests are not counted for recycling.
+    """
+    options = {name: app.config[name] for name in (
+        'SERVE_WORKERS', 'SERVE_THREADS', 'SERVE_MAX_REQUESTS', 'SERVE_MAX_REQUESTS_JITTER',
+        'SERVE_KEEPALIVE', 'SERVE_GRACEFUL_TIMEOUT', 'SERVE_BACKLOG')}
+
+    if options['SERVE_WORKERS'] > 1 and hasattr(os, 'fork'):
+        PreforkServer(app, host, port, options).run()
+        return
+
+    if options['SERVE_WORKERS'] > 1:
+        logger.warning("Worker processes need os.fork; serving from one process instead")
+    server = PooledWSGIServer(host, port, app, options['SERVE_THREADS'], options['SERVE_KEEPALIVE'])
+    logger.info(f"Serving on http://{host}:{port} with {options['SERVE_THREADS']} threads")
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.begin_drain())
+    try:
+        server.serve_forever(poll_interval=0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.drain(options['SERVE_GRACEFUL_TIMEOUT'])
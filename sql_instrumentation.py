@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+SQL Instrumentation
+Per-request statement counts and DB time, Server-Timing headers and an N+1
+detector
+"""
+
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_captures: ContextVar = ContextVar('sql_captures', default=())
+
+# Literals that vary between otherwise identical statements (IN lists built
+# by hand, inlined numbers) are collapsed so they share one shape
+_NUMBER = re.compile(r'\b\d+(\.\d+)?\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST = re.compile(r'\bIN \((?:\s*[?%:][\w()]*\s*,?)+\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement: str) -> str:
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+class RequestSQLStats:
+    """Statements, DB time and statement shapes seen while serving one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self.shape_seconds = Counter()
+        self.started = time.perf_counter()
+
+    def record(self, statement: str, seconds: float):
+        shape = statement_shape(statement)
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[shape] += 1
+        self.shape_seconds[shape] += seconds
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Shapes executed more than ``threshold`` times (likely N+1 loops)"""
+        return {shape: n for shape, n in self.shapes.most_common() if n > threshold}
+
+
+def request_sql_stats() -> Optional[RequestSQLStats]:
+    """The stats of the current request, or None outside an instrumented request"""
+    if not has_request_context():
+        return None
+    return g.get('_sql_stats')
+
+
+@contextmanager
+def capture_sql():
+    """Record every statement this thread runs inside the block
+
+    Unlike the per-request stats this also sees the statements of a streamed
+    body, as long as the body is consumed inside the block (as the test
+    client does).
+    """
+    stats = RequestSQLStats()
+    token = _captures.set(_captures.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _captures.reset(token)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _captures.get() or request_sql_stats() is not None:
+        context._sql_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_sql_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = request_sql_stats()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    for capture in _captures.get():
+        capture.record(statement, elapsed)
+
+
+class SQLInstrumentation:
+    """Wraps every request in statement counting
+
+    Each response gets a ``Server-Timing`` header (``db`` time with the
+    statement count, and ``app`` time) that shows up in the browser's network
+    panel, and one structured ``sql_request`` log line. Any statement shape
+    run more than ``SQL_N_PLUS_ONE_THRESHOLD`` times in one request is logged
+    as a warning naming the endpoint. Statements run while a streamed body
+    is being sent are not included.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('SQL_INSTRUMENTATION', True):
+            return
+        self.threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 10)
+        self.log_requests = app.config.get('SQL_LOG_REQUESTS', True)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['sql_instrumentation'] = self
+
+    def _start(self):
+        g._sql_stats = RequestSQLStats()
+
+    def _finish(self, response):
+        stats = request_sql_stats()
+        if stats is None:
+            return response
+
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        db_ms = stats.seconds * 1000
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={db_ms:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}'
+        )
+
+        repeated = stats.repeated(self.threshold)
+        if self.log_requests:
+            logger.info(json.dumps({
+                'event': 'sql_request',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'queries': stats.count,
+                'db_ms': round(db_ms, 1),
+                'total_ms': round(total_ms, 1),
+                'distinct_shapes': len(stats.shapes),
+                'n_plus_one': bool(repeated),
+            }))
+        for shape, n in repeated.items():
+            logger.warning(f"N+1 suspected in {request.endpoint}: statement ran {n} times: {shape[:300]}")
+        return response
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+SQLite Profile
+Per-connection pragmas for concurrent use, background WAL checkpoints and a
+mixed read/write benchmark
+"""
+
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the SQLITE_* config keys
+DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_CACHE_SIZE_MB': 64,
+    'SQLITE_MMAP_SIZE_MB': 256,
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+    # Off as before: several delete paths still leave child rows behind
+    'SQLITE_FOREIGN_KEYS': False,
+    'SQLITE_CHECKPOINT_INTERVAL': 60,
+    'SQLITE_CHECKPOINT_TRUNCATE_PAGES': 4000,
+}
+
+
+def pragmas(config) -> Dict[str, object]:
+    """The pragmas run on every new connection, from the SQLITE_* settings"""
+    settings = dict(DEFAULTS, **{key: config[key] for key in DEFAULTS if key in config})
+    return {
+        'journal_mode': settings['SQLITE_JOURNAL_MODE'],
+        'synchronous': settings['SQLITE_SYNCHRONOUS'],
+        # Negative cache_size is in KiB rather than pages
+        'cache_size': -int(settings['SQLITE_CACHE_SIZE_MB']) * 1024,
+        'mmap_size': int(settings['SQLITE_MMAP_SIZE_MB']) * 1024 * 1024,
+        'busy_timeout': int(settings['SQLITE_BUSY_TIMEOUT_MS']),
+        'foreign_keys': 'ON' if settings['SQLITE_FOREIGN_KEYS'] else 'OFF',
+        'temp_store': 'MEMORY',
+    }
+
+
+def apply_pragmas(engine, settings: Dict[str, object]):
+    """Run ``settings`` on each connection ``engine`` opens"""
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in settings.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+
+class WalCheckpointer:
+    """Background thread that checkpoints the WAL on a fixed interval
+
+    SQLite's own auto-checkpoint runs inside whichever commit crosses the
+    threshold, so one clerk's save pays for it, and it can never reset the WAL
+    while readers are active. Here a PASSIVE checkpoint runs every
+    ``interval`` seconds without blocking anyone, and once the log has grown
+    past ``truncate_pages`` a TRUNCATE checkpoint shrinks the file again when
+    no reader is in the way.
+    """
+
+    def __init__(self, engine, interval: int, truncate_pages: int):
+        self.engine = engine
+        self.interval = interval
+        self.truncate_pages = truncate_pages
+        self.last_result: Optional[Dict] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='wal-checkpoint', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.checkpoint()
+            except Exception as e:
+                logger.warning(f"WAL checkpoint failed: {e}")
+
+    def checkpoint(self, mode: str = 'PASSIVE') -> Dict:
+        with self.engine.connect() as connection:
+            busy, log_pages, checkpointed = connection.exec_driver_sql(
+                f'PRAGMA wal_checkpoint({mode})').one()
+            if mode == 'PASSIVE' and log_pages >= self.truncate_pages and not busy:
+                busy, log_pages, checkpointed = connection.exec_driver_sql(
+                    'PRAGMA wal_checkpoint(TRUNCATE)').one()
+                mode = 'TRUNCATE'
+        self.last_result = {'mode': mode, 'busy': busy, 'log_pages': log_pages,
+                            'checkpointed_pages': checkpointed, 'at': time.time()}
+        logger.debug(f"WAL checkpoint: {self.last_result}")
+        return self.last_result
+
+
+class SQLiteProfile:
+    """Applies the pragmas and starts the checkpointer for a SQLite database URI"""
+
+    def __init__(self, app=None):
+        self.settings: Dict[str, object] = {}
+        self.checkpointer: Optional[WalCheckpointer] = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+            return
+        self.settings = pragmas(app.config)
+        with app.app_context():
+            engine = db.engine
+        apply_pragmas(engine, self.settings)
+
+        if str(self.settings['journal_mode']).upper() == 'WAL':
+            self.checkpointer = WalCheckpointer(
+                engine,
+                interval=int(app.config.get('SQLITE_CHECKPOINT_INTERVAL', DEFAULTS['SQLITE_CHECKPOINT_INTERVAL'])),
+                truncate_pages=int(app.config.get('SQLITE_CHECKPOINT_TRUNCATE_PAGES',
+                                                  DEFAULTS['SQLITE_CHECKPOINT_TRUNCATE_PAGES']))
+            )
+            if not app.testing:
+                self.checkpointer.start()
+        app.extensions['sqlite_profile'] = self
+
+
+def benchmark(settings: Optional[Dict[str, object]], seconds: float = 10.0,
+              readers: int = 8, writers: int = 2, rows: int = 20000) -> Dict:
+    """Mixed read/write throughput on a scratch database
+
+    ``writers`` threads post small bills (ten lines per transaction) while
+    ``readers`` threads run per-party aggregates, for ``seconds``. With
+    ``settings`` None the connections keep SQLite's defaults.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                               pool_size=readers + writers)
+        if settings is not None:
+            apply_pragmas(engine, settings)
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                'CREATE TABLE lines (id INTEGER PRIMARY KEY, party INTEGER, amount REAL)')
+            connection.exec_driver_sql('CREATE INDEX idx_lines_party ON lines (party)')
+            connection.exec_driver_sql(
+                'INSERT INTO lines (party, amount) VALUES (?, ?)',
+                [(n % 500, float(n % 997)) for n in range(rows)])
+
+        counts = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def count(key):
+            with lock:
+                counts[key] += 1
+
+        def reader():
+            rng = random.Random()
+            with engine.connect() as connection:
+                while time.perf_counter() < deadline:
+                    try:
+                        connection.exec_driver_sql(
+                            'SELECT COUNT(*), SUM(amount) FROM lines WHERE party = ?',
+                            (rng.randrange(500),)).one()
+                        connection.rollback()
+                        count('reads')
+                    except OperationalError:
+                        connection.rollback()
+                        count('locked')
+
+        def writer():
+            rng = random.Random()
+            with engine.connect() as connection:
+                while time.perf_counter() < deadline:
+                    try:
+                        party = rng.randrange(500)
+                        connection.exec_driver_sql(
+                            'INSERT INTO lines (party, amount) VALUES (?, ?)',
+                            [(party, rng.random() * 1000) for _ in range(10)])
+                        connection.commit()
+                        count('writes')
+                    except OperationalError:
+                        connection.rollback()
+                        count('locked')
+
+        threads = ([threading.Thread(target=reader) for _ in range(readers)] +
+                   [threading.Thread(target=writer) for _ in range(writers)])
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    return {
+        'reads_per_sec': round(counts['reads'] / elapsed, 1),
+        'writes_per_sec': round(counts['writes'] / elapsed, 1),
+        'locked_errors': counts['locked'],
+    }
+
+
+sqlite_cli = AppGroup('sqlite', help='SQLite engine profile')
+
+@sqlite_cli.command('checkpoint')
+@click.option('--mode', type=click.Choice(['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE']), default='TRUNCATE')
+def checkpoint_command(mode):
+    """Checkpoint the WAL now (TRUNCATE also empties the -wal file)"""
+    profile = current_app.extensions.get('sqlite_profile')
+    if profile is None or profile.checkpointer is None:
+        raise click.ClickException('The database is not SQLite in WAL mode')
+    click.echo(profile.checkpointer.checkpoint(mode))
+
+@sqlite_cli.command('benchmark')
+@click.option('--seconds', type=float, default=10.0)
+@click.option('--readers', type=int, default=8)
+@click.option('--writers', type=int, default=2)
+def benchmark_command(seconds, readers, writers):
+    """Compare mixed read/write throughput with default pragmas and with the profile"""
+    click.echo(f"{'pragmas':10} {'reads/s':>10} {'writes/s':>10} {'locked':>8}")
+    for name, settings in (('default', None), ('profile', pragmas(current_app.config))):
+        result = benchmark(settings, seconds, readers, writers)
+        click.echo(f"{name:10} {result['reads_per_sec']:>10.1f} "
+                   f"{result['writes_per_sec']:>10.1f} {result['locked_errors']:>8}")
@@ -3,5 +3,5 @@ echo Starting Business Management System...
 echo.
 echo Make sure you are in the web_app directory!
 echo.
-python run.py
+python run.py --serve
 pause 
\ No newline at end of file
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tenant Scope
+Adds ``user_id = <current tenant>`` to every ORM query on tenant-owned models
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from flask import has_request_context
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+from models import TenantOwned
+
+# Explicit tenant for code running outside a request (CLI jobs, workers);
+# ALL_TENANTS switches the filter off
+ALL_TENANTS = object()
+_tenant_override: ContextVar = ContextVar('tenant_override', default=None)
+
+# Per-statement opt-out: query.execution_options(all_tenants=True)
+ALL_TENANTS_OPTION = 'all_tenants'
+
+
+@contextmanager
+def tenant_scope(user_id: int):
+    """Scope ORM queries to ``user_id`` for the duration of the block"""
+    token = _tenant_override.set(user_id)
+    try:
+        yield
+    finally:
+        _tenant_override.reset(token)
+
+
+@contextmanager
+def all_tenants():
+    """Opt out of tenant scoping (admin jobs, cross-tenant maintenance)"""
+    token = _tenant_override.set(ALL_TENANTS)
+    try:
+        yield
+    finally:
+        _tenant_override.reset(token)
+
+
+def current_tenant() -> Optional[int]:
+    """The tenant queries are scoped to, or None when nothing should be filtered"""
+    override = _tenant_override.get()
+    if override is ALL_TENANTS:
+        return None
+    if override is not None:
+        return override
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _scope_to_tenant(execute_state):
+    """Attach the tenant criteria to SELECT/UPDATE/DELETE statements
+
+    One criterion on the ``TenantOwned`` marker covers every tenant model in
+    the statement, including joined entities and subqueries (such as the one
+    ``Query.count()`` wraps), and since the tenant is the leading
+    column of the composite indexes every scoped query can use them. Lazy
+    relationship and column loads are left alone; they follow an already
+    scoped parent row.
+    """
+    if not (execute_state.is_select or execute_state.is_update or execute_state.is_delete):
+        return
+    if execute_state.is_column_load or execute_state.is_relationship_load:
+        return
+    if execute_state.execution_options.get(ALL_TENANTS_OPTION):
+        return
+
+    mappers = execute_state.all_mappers
+    if mappers and not any(issubclass(mapper.class_, TenantOwned) for mapper in mappers):
+        # Also keeps the user_loader's User lookup from recursing into current_user
+        return
+
+    tenant = current_tenant()
+    if tenant is None:
+        return
+
+    execute_state.statement = execute_state.statement.options(
+        with_loader_criteria(TenantOwned, lambda cls: cls.user_id == tenant, include_aliases=True)
+    )
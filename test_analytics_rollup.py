@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Analytics Rollups
+The daily rollup cube maintained on flush must match a rebuild from the raw
+lines after inserts, updates and deletes
+
+Run with ``python -m pytest test_analytics_rollup.py``.
+"""
+
+import os
+import sys
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import mysql
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from analytics_rollup import _upsert_statement, rebuild_rollups
+from database import db
+from models import Item, Party, Purchase, PurchaseDailyRollup, Sale, SalesDailyRollup, User
+
+
+def _cube(model, user_id):
+    return sorted((row.day, row.party_cd, row.it_cd, row.agent_cd, round(row.qty, 2), round(row.amount, 2),
+                   round(row.discount, 2), row.line_count)
+                  for row in model.query.filter_by(user_id=user_id))
+
+
+def _assert_matches_rebuild(user_id):
+    maintained = (_cube(SalesDailyRollup, user_id), _cube(PurchaseDailyRollup, user_id))
+    rebuild_rollups(user_id)
+    assert (_cube(SalesDailyRollup, user_id), _cube(PurchaseDailyRollup, user_id)) == maintained
+    return maintained
+
+
+def _sale(user_id, bill_no, day, party_cd='P1', amount=100.0, **fields):
+    return Sale(user_id=user_id, bill_no=bill_no, bill_date=day, party_cd=party_cd, it_cd='I1',
+                qty=1.0, rate=amount, sal_amt=amount, **fields)
+
+
+@pytest.fixture
+def user_id(tmp_path):
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "rollup.db"}',
+        'SQL_LOG_REQUESTS': False,
+        'METRICS_DIR': None,
+    })
+    with app.app_context():
+        db.create_all()
+        user = User(username='rollup', email='rollup@example.com', password_hash='-', role='user')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all([Party(party_cd='P1', user_id=user.id, party_nm='First'),
+                            Party(party_cd='P2', user_id=user.id, party_nm='Second'),
+                            Item(it_cd='I1', user_id=user.id, it_nm='Rice')])
+        db.session.commit()
+        yield user.id
+
+
+def test_insert_adds_lines(user_id):
+    db.session.add_all([_sale(user_id, 1, date(2024, 5, 1)),
+                        _sale(user_id, 2, date(2024, 5, 1), amount=50.0, discount=5.0),
+                        _sale(user_id, 3, date(2024, 5, 1), agent_cd='AG'),
+                        Purchase(user_id=user_id, bill_no=1, bill_date=date(2024, 5, 2), party_cd='P2',
+                                 it_cd='I1', qty=3.0, rate=10.0, sal_amt=30.0)])
+    db.session.commit()
+
+    sales, purchases = _assert_matches_rebuild(user_id)
+    assert [(cell[3], cell[5], cell[6], cell[7]) for cell in sales] == [('', 150.0, 5.0, 2), ('AG', 100.0, 0, 1)]
+    assert len(purchases) == 1
+
+
+def test_update_moves_lines_between_cells(user_id):
+    db.session.add_all([_sale(user_id, 1, date(2024, 5, 1)), _sale(user_id, 2, date(2024, 5, 1))])
+    db.session.commit()
+
+    first, second = Sale.query.order_by(Sale.bill_no).all()
+    first.sal_amt = 120.0
+    second.party_cd = 'P2'
+    second.bill_date = date(2024, 5, 3)
+    db.session.commit()
+    sales, _ = _assert_matches_rebuild(user_id)
+    assert [(cell[0], cell[1], cell[5]) for cell in sales] == [(date(2024, 5, 1), 'P1', 120.0),
+                                                               (date(2024, 5, 3), 'P2', 100.0)]
+
+    # Assigned while expired after the commit: the old value is read back first
+    sale = db.session.get(Sale, first.id)
+    db.session.expire(sale)
+    sale.sal_amt = 80.0
+    db.session.commit()
+    _assert_matches_rebuild(user_id)
+
+
+def test_delete_takes_lines_out(user_id):
+    db.session.add_all([_sale(user_id, 1, date(2024, 5, 1)), _sale(user_id, 2, date(2024, 5, 1)),
+                        _sale(user_id, 3, date(2024, 5, 4), party_cd='P2')])
+    db.session.commit()
+
+    db.session.delete(Sale.query.filter_by(bill_no=1).one())
+    db.session.commit()
+    sales, _ = _assert_matches_rebuild(user_id)
+    assert [cell[7] for cell in sales] == [1, 1]
+
+    # The last line of a cell removes the cell
+    db.session.delete(Sale.query.filter_by(bill_no=3).one())
+    db.session.commit()
+    sales, _ = _assert_matches_rebuild(user_id)
+    assert [(cell[1], cell[7]) for cell in sales] == [('P1', 1)]
+
+
+def test_rollback_undoes_the_delta(user_id):
+    db.session.add(_sale(user_id, 1, date(2024, 5, 1)))
+    db.session.commit()
+
+    db.session.add(_sale(user_id, 2, date(2024, 5, 1)))
+    db.session.flush()
+    db.session.rollback()
+    sales, _ = _assert_matches_rebuild(user_id)
+    assert [cell[7] for cell in sales] == [1]
+
+
+def test_upsert_by_dialect():
+    values = {'user_id': 1, 'day': date(2024, 5, 1), 'party_cd': 'P1', 'it_cd': 'I1', 'agent_cd': '',
+              'qty': 1.0, 'amount': 10.0, 'discount': 0, 'tax': 0, 'line_count': 1}
+
+    connection = SimpleNamespace(dialect=mysql.dialect())
+    sql = str(_upsert_statement(connection, SalesDailyRollup, values).compile(dialect=mysql.dialect()))
+    assert 'ON DUPLICATE KEY UPDATE' in sql
+
+    with pytest.raises(NotImplementedError, match='mssql'):
+        _upsert_statement(SimpleNamespace(dialect=SimpleNamespace(name='mssql')), SalesDailyRollup, values)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Authentication
+Bearer tokens (issue, refresh rotation, reuse detection, revocation, the
+signing key guard) and password verification in the hashing pool
+
+Run with ``python -m pytest test_auth.py``.
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import password_hashing
+import token_auth
+from app import create_app
+from database import db
+from models import RefreshToken, User
+from password_hashing import HashingBusy, HashingPool, hash_password
+from user_cache import user_cache
+
+PASSWORD = 'counter-42'
+# Cheap parameters; the default 600000 iterations would dominate the run time
+HASH_METHOD = 'pbkdf2:sha256:1000'
+
+
+def _app(path, **overrides):
+    return create_app('testing', dict({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SQL_LOG_REQUESTS': False,
+        'METRICS_DIR': None,
+        'JWT_SECRET_KEY': 'test-signing-key',
+        'PASSWORD_HASH_METHOD': HASH_METHOD,
+    }, **overrides))
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = _app(tmp_path / 'auth.db')
+    with app.app_context():
+        db.create_all()
+        user = User(username='clerk', email='clerk@example.com', role='user', is_active=True,
+                    password_hash=hash_password(PASSWORD, HASH_METHOD))
+        db.session.add(user)
+        db.session.commit()
+    # Ids restart at 1 in the scratch database; drop users cached from others
+    user_cache.clear()
+    yield app
+    user_cache.clear()
+
+
+def _tokens(client):
+    response = client.post('/auth/api/token', json={'username': 'clerk', 'password': PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def _refresh(client, refresh_token):
+    return client.post('/auth/api/token/refresh', json={'refresh_token': refresh_token})
+
+
+def test_bearer_token_authenticates_as_the_user(app):
+    client = app.test_client()
+    tokens = _tokens(client)
+
+    response = client.get('/auth/api/check-auth', headers={'Authorization': f"Bearer {tokens['access_token']}"})
+    assert response.status_code == 200
+    # The real User row, so views reading any of its attributes keep working
+    assert response.get_json()['user']['email'] == 'clerk@example.com'
+
+    assert client.get('/auth/api/check-auth', headers={'Authorization': 'Bearer not-a-token'}).status_code == 401
+
+
+def test_deactivated_user_token_rejected(app):
+    client = app.test_client()
+    tokens = _tokens(client)
+    with app.app_context():
+        db.session.get(User, 1).is_active = False
+        db.session.commit()
+    user_cache.clear()
+
+    response = client.get('/auth/api/check-auth', headers={'Authorization': f"Bearer {tokens['access_token']}"})
+    assert response.status_code == 401
+
+
+def test_refresh_rotates_and_reuse_revokes_family(app):
+    client = app.test_client()
+    first = _tokens(client)
+
+    second = _refresh(client, first['refresh_token'])
+    assert second.status_code == 200
+    second = second.get_json()
+    assert second['refresh_token'] != first['refresh_token']
+
+    reused = _refresh(client, first['refresh_token'])
+    assert reused.status_code == 401
+    assert 'reuse' in reused.get_json()['message']
+    # The whole family is gone, including the token rotated from it
+    assert _refresh(client, second['refresh_token']).status_code == 401
+    with app.app_context():
+        assert all(token.revoked for token in RefreshToken.query.all())
+
+
+def test_concurrent_refresh_has_one_winner(app):
+    client = app.test_client()
+    refresh_token = _tokens(client)['refresh_token']
+    barrier = threading.Barrier(4)
+    outcomes = []
+
+    def refresh():
+        with app.app_context():
+            barrier.wait()
+            try:
+                token_auth.rotate_refresh_token(refresh_token)
+                outcomes.append('rotated')
+            except token_auth.TokenError:
+                outcomes.append('refused')
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=refresh) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == ['refused', 'refused', 'refused', 'rotated']
+    with app.app_context():
+        assert all(token.revoked for token in RefreshToken.query.all())
+
+
+def test_revoke_ends_the_login(app):
+    client = app.test_client()
+    tokens = _tokens(client)
+    assert client.post('/auth/api/token/revoke', json={'refresh_token': tokens['refresh_token']}).status_code == 200
+    assert _refresh(client, tokens['refresh_token']).status_code == 401
+
+
+def test_no_tokens_without_signing_key(tmp_path):
+    app = _app(tmp_path / 'nokey.db', JWT_SECRET_KEY=None)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='clerk', email='clerk@example.com', role='user', is_active=True,
+                            password_hash=hash_password(PASSWORD, HASH_METHOD)))
+        db.session.commit()
+    user_cache.clear()
+    client = app.test_client()
+    assert client.post('/auth/api/token', json={'username': 'clerk', 'password': PASSWORD}).status_code == 503
+
+    # A token signed with the old default key must not authenticate
+    with _app(tmp_path / 'forge.db', JWT_SECRET_KEY=token_auth.PLACEHOLDER_SECRET).app_context():
+        forged = token_auth._jwt.encode(
+            {'type': 'access', 'sub': '1', 'role': 'admin', 'exp': int(time.time()) + 60},
+            token_auth._signing_key(token_auth.PLACEHOLDER_SECRET), alg=token_auth.ALGORITHM)
+    assert client.get('/auth/api/check-auth', headers={'Authorization': f'Bearer {forged}'}).status_code == 401
+
+
+@pytest.mark.parametrize('secret', [None, token_auth.PLACEHOLDER_SECRET])
+def test_production_refuses_to_start_without_signing_key(tmp_path, secret):
+    with pytest.raises(RuntimeError, match='JWT_SECRET_KEY'):
+        create_app('production', {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "prod.db"}',
+                                  'JWT_SECRET_KEY': secret})
+
+
+def test_login_rehashes_to_configured_parameters(app):
+    with app.app_context():
+        user = db.session.get(User, 1)
+        user.password_hash = hash_password(PASSWORD, 'pbkdf2:sha256:500')
+        db.session.commit()
+
+    client = app.test_client()
+    assert client.post('/auth/api/login', json={'username': 'clerk', 'password': 'wrong'}).status_code == 401
+    with app.app_context():
+        assert db.session.get(User, 1).password_hash.startswith('pbkdf2:sha256:500$')
+
+    assert client.post('/auth/api/login', json={'username': 'clerk', 'password': PASSWORD}).status_code == 200
+    with app.app_context():
+        assert db.session.get(User, 1).password_hash.startswith(HASH_METHOD + '$')
+
+
+def test_busy_rehash_keeps_the_login(app, monkeypatch):
+    with app.app_context():
+        user = db.session.get(User, 1)
+        user.password_hash = hash_password(PASSWORD, 'pbkdf2:sha256:500')
+        db.session.commit()
+
+    class RefusesSecond:
+        submissions = 0
+
+        def run(self, fn, *args):
+            self.submissions += 1
+            if self.submissions > 1:
+                raise HashingBusy('Too many logins in progress, please retry')
+            return fn(*args)
+
+    monkeypatch.setattr(password_hashing, '_pool', RefusesSecond())
+    response = app.test_client().post('/auth/api/login', json={'username': 'clerk', 'password': PASSWORD})
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.get(User, 1).password_hash.startswith('pbkdf2:sha256:500$')
+
+
+def test_hashing_pool_refuses_when_saturated():
+    pool = HashingPool(workers=1, queue_size=0, admission_timeout=0.05)
+    release = threading.Event()
+    holder = threading.Thread(target=pool.run, args=(release.wait,))
+    holder.start()
+    try:
+        while pool.admitted == 0:
+            time.sleep(0.01)
+        with pytest.raises(HashingBusy):
+            pool.run(lambda: True)
+        assert pool.rejected == 1
+    finally:
+        release.set()
+        holder.join()
+    assert pool.run(lambda: 'done') == 'done'
+    pool.shutdown()
+
+
+def test_busy_pool_answers_503(app, monkeypatch):
+    class BusyPool:
+        def run(self, *args, **kwargs):
+            raise HashingBusy('Too many logins in progress, please retry')
+
+    monkeypatch.setattr(password_hashing, '_pool', BusyPool())
+    response = app.test_client().post('/auth/api/login', json={'username': 'clerk', 'password': PASSWORD})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
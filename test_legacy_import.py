@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Legacy Import
+Initial import, incremental re-sync and --restart of small DBF tables
+written into a scratch directory
+
+Run with ``python -m pytest test_legacy_import.py``.
+"""
+
+import os
+import struct
+import sys
+import time
+from datetime import date
+
+import pytest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from analytics_rollup import rebuild_rollups
+from database import db
+from legacy_import import run_import, run_sync
+from models import LegacyImportCheckpoint, LegacyRowHash, Party, Sale, SalesDailyRollup, User
+
+PARTY_FIELDS = [('party_cd', 'C', 10, 0), ('party_nm', 'C', 30, 0)]
+ITEM_FIELDS = [('it_cd', 'C', 10, 0), ('it_nm', 'C', 30, 0)]
+SALE_FIELDS = [('bill_no', 'N', 6, 0), ('bill_date', 'D', 8, 0), ('party_cd', 'C', 10, 0),
+               ('it_cd', 'C', 10, 0), ('qty', 'N', 8, 2), ('rate', 'N', 8, 2), ('sal_amt', 'N', 10, 2)]
+
+
+def _write_dbf(path, fields, records):
+    """Minimal dBASE III writer: (name, type, size, decimals) fields, C/N/D values"""
+    header_length = 32 + 32 * len(fields) + 1
+    record_length = 1 + sum(size for _, _, size, _ in fields)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<BBBBLHH20x', 3, 124, 1, 1, len(records), header_length, record_length))
+        for name, kind, size, decimals in fields:
+            f.write(struct.pack('<11sc4xBB14x', name.upper().encode().ljust(11, b'\0'), kind.encode(),
+                                size, decimals))
+        f.write(b'\r')
+        for record in records:
+            f.write(b' ')
+            for (_, kind, size, decimals), value in zip(fields, record):
+                if kind == 'D':
+                    text = value.strftime('%Y%m%d')
+                elif kind == 'N':
+                    text = f'{value:.{decimals}f}'.rjust(size)
+                else:
+                    text = str(value).ljust(size)[:size]
+                f.write(text.encode('cp437'))
+        f.write(b'\x1a')
+
+
+def _write_source(source, sales):
+    _write_dbf(os.path.join(source, 'PARTY.DBF'), PARTY_FIELDS,
+               [(f'LP{i:03d}', f'Party {i}') for i in range(1, 6)])
+    _write_dbf(os.path.join(source, 'ITEM.DBF'), ITEM_FIELDS, [('IT1', 'Rice')])
+    _write_dbf(os.path.join(source, 'SALE.DBF'), SALE_FIELDS, sales)
+
+
+def _sales(count):
+    return [(n, date(2024, 5, 1 + n % 28), f'LP{1 + n % 5:03d}', 'IT1', 2.0, 10.0, 20.0)
+            for n in range(1, count + 1)]
+
+
+def _rollup_rows(user_id):
+    return sorted((row.day, row.party_cd, row.it_cd, round(row.qty, 2), round(row.amount, 2), row.line_count)
+                  for row in SalesDailyRollup.query.filter_by(user_id=user_id))
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    source = tmp_path / 'dbf'
+    source.mkdir()
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "legacy.db"}',
+        'SQL_LOG_REQUESTS': False,
+        'METRICS_DIR': None,
+        'SQLITE_FOREIGN_KEYS': True,  # Enforced as on PostgreSQL
+    })
+    with app.app_context():
+        db.create_all()
+        user = User(username='legacy', email='legacy@example.com', password_hash='-', role='user')
+        db.session.add(user)
+        db.session.commit()
+        yield str(source), user.id
+
+
+def test_sync_writes_only_changes(legacy):
+    source, user_id = legacy
+    sales = _sales(40)
+    _write_source(source, sales)
+    run_import(source, user_id, chunk_size=7)
+    assert Sale.query.filter_by(user_id=user_id).count() == 40
+
+    sales[3] = sales[3][:4] + (5.0, 10.0, 50.0)
+    del sales[10:12]
+    sales.append((900, date(2024, 6, 1), 'LP001', 'IT1', 1.0, 10.0, 10.0))
+    time.sleep(1.1)  # The file signature has one-second resolution
+    _write_source(source, sales)
+
+    results = {result['table']: result for result in run_sync(source, user_id, chunk_size=7)}
+    assert (results['sales']['inserted'], results['sales']['updated'], results['sales']['deleted']) == (1, 1, 2)
+    assert results['parties']['status'] == 'synced'
+    assert (results['parties']['inserted'], results['parties']['updated']) == (0, 0)
+    assert Sale.query.filter_by(user_id=user_id).count() == 39
+
+    # The rollups were maintained with deltas; a rebuild must agree
+    maintained = _rollup_rows(user_id)
+    rebuild_rollups(user_id)
+    assert _rollup_rows(user_id) == maintained
+
+
+def test_sync_keeps_columns_the_dbf_lacks(legacy):
+    source, user_id = legacy
+    _write_source(source, _sales(5))
+    run_import(source, user_id)
+    party = Party.query.filter_by(user_id=user_id, party_cd='LP001').one()
+    party.credit_limit, party.mobile, party.gstin = 5000.0, '999', 'GST1'
+    db.session.commit()
+
+    time.sleep(1.1)  # The file signature has one-second resolution
+    _write_dbf(os.path.join(source, 'PARTY.DBF'), PARTY_FIELDS,
+               [('LP001', 'Renamed')] + [(f'LP{i:03d}', f'Party {i}') for i in range(2, 6)])
+    results = {result['table']: result for result in run_sync(source, user_id)}
+    assert results['parties']['updated'] == 1
+
+    db.session.expire_all()
+    party = Party.query.filter_by(user_id=user_id, party_cd='LP001').one()
+    assert party.party_nm == 'Renamed'
+    assert (party.credit_limit, party.mobile, party.gstin) == (5000.0, '999', 'GST1')
+
+
+def test_workers_write_to_the_parent_database(legacy):
+    source, user_id = legacy
+    _write_source(source, _sales(5))
+    run_import(source, user_id, workers=2)
+    assert Party.query.filter_by(user_id=user_id).count() == 5
+    assert Sale.query.filter_by(user_id=user_id).count() == 5
+
+
+def test_restart_replaces_imported_rows(legacy):
+    source, user_id = legacy
+    _write_source(source, _sales(30))
+    run_import(source, user_id, chunk_size=8)
+
+    results = {result['table']: result['inserted'] for result in
+               run_import(source, user_id, chunk_size=8, restart=True)}
+    assert (results['parties'], results['items'], results['sales']) == (5, 1, 30)
+    assert Party.query.filter_by(user_id=user_id).count() == 5
+    assert Sale.query.filter_by(user_id=user_id).count() == 30
+    assert LegacyRowHash.query.filter_by(user_id=user_id, table_name='sales').count() == 30
+    assert sum(row[-1] for row in _rollup_rows(user_id)) == 30
+
+
+def test_restart_keeps_referenced_rows(legacy):
+    source, user_id = legacy
+    _write_source(source, _sales(10))
+    run_import(source, user_id)
+
+    with pytest.raises(ValueError, match='refer to them'):
+        run_import(source, user_id, tables=['parties'], restart=True)
+    assert Party.query.filter_by(user_id=user_id).count() == 5
+
+
+def test_restart_refused_without_row_hashes(legacy):
+    source, user_id = legacy
+    _write_source(source, _sales(10))
+    run_import(source, user_id, tables=['parties'])
+    LegacyRowHash.query.filter_by(user_id=user_id).delete()
+    db.session.commit()
+
+    with pytest.raises(ValueError, match='without row hashes'):
+        run_import(source, user_id, tables=['parties'], restart=True)
+
+    Party.query.filter_by(user_id=user_id).delete()
+    db.session.commit()
+    assert run_import(source, user_id, tables=['parties'], restart=True)[0]['inserted'] == 5
+    assert LegacyImportCheckpoint.query.filter_by(user_id=user_id, table_name='parties').one().completed
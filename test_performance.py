@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Performance Gates
+Statement-count and time budgets for the hot endpoints, against a seeded
+scratch database
+
+Run with ``python -m pytest test_performance.py``. Time budgets are
+multiplied by PERF_TIME_FACTOR (default 1) for slow machines; statement
+budgets are exact upper bounds and should only ever be lowered.
+"""
+
+import os
+import statistics
+import sys
+import time
+
+import pytest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from endpoint_benchmark import logged_in_client
+from scale_data import ScaleDataGenerator
+from sql_instrumentation import capture_sql
+from user_cache import user_cache
+
+TIME_FACTOR = float(os.environ.get('PERF_TIME_FACTOR', 1))
+ITERATIONS = 5
+
+# Two tenants, so every view also has another tenant's rows to filter out
+FIXTURE = {'seed': 7, 'tenants': 2, 'parties': 400, 'items': 100, 'sale_lines': 6000,
+           'purchase_lines': 3000, 'cashbook_entries': 2000}
+
+# (name, path, max statements, median time budget in ms)
+BUDGETS = [
+    ('sales table', '/api/sales/table', 1, 500),
+    ('purchase table', '/api/purchases/table', 1, 300),
+    ('parties table', '/api/parties/table', 2, 100),
+    ('items table', '/api/items/table', 2, 100),
+    ('trial balance', '/api/financial/trial-balance', 2, 100),
+    ('balance sheet', '/api/financial/balance-sheet', 4, 100),
+    ('inventory list', '/api/inventory/list?limit=50', 2, 100),
+    ('dashboard parties stat', '/api/dashboard/stats/parties', 1, 50),
+    ('dashboard items stat', '/api/dashboard/stats/items', 1, 50),
+    ('dashboard sales stat', '/api/dashboard/stats/sales', 1, 50),
+    ('dashboard purchases stat', '/api/dashboard/stats/purchases', 1, 50),
+    ('dashboard activity', '/api/dashboard/activity', 2, 100),
+    ('dashboard top parties', '/api/dashboard/top-parties', 1, 50),
+    ('dashboard chart', '/api/dashboard/chart-data', 12, 150),
+]
+
+
+@pytest.fixture(scope='module')
+def perf_client(tmp_path_factory):
+    path = tmp_path_factory.mktemp('perf') / 'perf.db'
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SQL_LOG_REQUESTS': False,
+        'METRICS_DIR': None,
+    })
+    with app.app_context():
+        result = ScaleDataGenerator(**FIXTURE).generate()
+    # Ids restart at 1 in the scratch database; drop users cached from others
+    user_cache.clear()
+    yield logged_in_client(app, result['user_ids'][0])
+    user_cache.clear()
+
+
+def _report(name, stats, budget):
+    lines = [f"{name}: {stats.count} statements, budget {budget}. Statement shapes:"]
+    for shape, count in stats.shapes.most_common():
+        lines.append(f"  {count:>5} x {shape[:400]}")
+    return '\n'.join(lines)
+
+
+@pytest.mark.parametrize('name,path,max_statements,budget_ms', BUDGETS, ids=[row[0] for row in BUDGETS])
+def test_endpoint_budget(perf_client, name, path, max_statements, budget_ms):
+    perf_client.get(path).get_data()  # warm caches and compiled statements
+
+    timings = []
+    worst = None
+    for _ in range(ITERATIONS):
+        with capture_sql() as stats:
+            started = time.perf_counter()
+            response = perf_client.get(path)
+            response.get_data()
+            timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, f"{name}: HTTP {response.status_code}"
+        if worst is None or stats.count > worst.count:
+            worst = stats
+
+    assert worst.count <= max_statements, _report(name, worst, max_statements)
+
+    median = statistics.median(timings)
+    allowed = budget_ms * TIME_FACTOR
+    assert median <= allowed, f"{name}: median {median:.1f} ms over the {allowed:.0f} ms budget"
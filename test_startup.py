@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Startup Budget
+Import and create_app() time in a fresh interpreter, and the modules that
+must not be loaded until they are used
+
+Run with ``python -m pytest test_startup.py``. Time budgets are multiplied
+by PERF_TIME_FACTOR (default 1) for slow machines.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from lazy_blueprints import MANAGEMENT_BLUEPRINTS
+
+TIME_FACTOR = float(os.environ.get('PERF_TIME_FACTOR', 1))
+RUNS = 3
+
+IMPORT_BUDGET_MS = 1500
+CREATE_APP_BUDGET_MS = 500
+
+# Loaded on first use only: heavy optional libraries and the management
+# modules behind the lazily registered blueprints
+DEFERRED_MODULES = ['psutil', 'openpyxl', 'pandas'] + [module for module, _ in MANAGEMENT_BLUEPRINTS]
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app(overrides={'SQLALCHEMY_DATABASE_URI': sys.argv[1]})
+created = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_ms": (created - imported) * 1000,
+    "modules": sorted(sys.modules),
+}))
+'''
+
+
+@pytest.fixture(scope='module')
+def startup(tmp_path_factory):
+    here = os.path.dirname(os.path.abspath(__file__))
+    database = f"sqlite:///{tmp_path_factory.mktemp('startup') / 'startup.db'}"
+    env = dict(os.environ, LAZY_BLUEPRINTS='1', METRICS_DIR='')
+    runs = []
+    for _ in range(RUNS):
+        result = subprocess.run([sys.executable, '-c', PROBE, database], cwd=here, env=env,
+                                capture_output=True, text=True, check=True)
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return runs
+
+
+def test_import_budget(startup):
+    best = min(run['import_ms'] for run in startup)
+    allowed = IMPORT_BUDGET_MS * TIME_FACTOR
+    assert best <= allowed, f"import app took {best:.0f} ms, budget {allowed:.0f} ms"
+
+
+def test_create_app_budget(startup):
+    best = min(run['create_ms'] for run in startup)
+    allowed = CREATE_APP_BUDGET_MS * TIME_FACTOR
+    assert best <= allowed, f"create_app() took {best:.0f} ms, budget {allowed:.0f} ms"
+
+
+@pytest.mark.parametrize('module', DEFERRED_MODULES)
+def test_module_not_loaded_at_startup(startup, module):
+    assert module not in startup[0]['modules'], f"{module} is imported while the app starts"
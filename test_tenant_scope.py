@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tenant Scope
+ORM queries on tenant-owned models see only the current tenant's rows,
+whether the tenant comes from the logged-in user or an explicit scope
+
+Run with ``python -m pytest test_tenant_scope.py``.
+"""
+
+import os
+import sys
+from datetime import date
+
+import pytest
+from flask_login import login_user
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from database import db
+from models import Item, Party, Sale, User
+from tenant_scope import all_tenants, current_tenant, tenant_scope
+
+
+@pytest.fixture
+def tenants(tmp_path):
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "tenants.db"}',
+        'SQL_LOG_REQUESTS': False,
+        'METRICS_DIR': None,
+    })
+    with app.app_context():
+        db.create_all()
+        ids = []
+        for n in (1, 2):
+            user = User(username=f'tenant{n}', email=f'tenant{n}@example.com', password_hash='-', role='user')
+            db.session.add(user)
+            db.session.flush()
+            ids.append(user.id)
+            db.session.add(Item(it_cd=f'I{n}', user_id=user.id, it_nm='Rice'))
+            for p in range(n + 1):
+                db.session.add(Party(party_cd=f'T{n}P{p}', user_id=user.id, party_nm=f'Party {p}'))
+                db.session.add(Sale(user_id=user.id, bill_no=p, bill_date=date(2024, 5, 1), party_cd=f'T{n}P{p}',
+                                    it_cd=f'I{n}', qty=1, rate=10, sal_amt=10))
+        db.session.commit()
+        yield app, ids
+
+
+def test_unscoped_outside_a_request(tenants):
+    assert current_tenant() is None
+    assert Party.query.count() == 5
+
+
+def test_explicit_scope(tenants):
+    _, (first, second) = tenants
+    with tenant_scope(first):
+        assert current_tenant() == first
+        assert {party.user_id for party in Party.query.all()} == {first}
+        assert Party.query.count() == 2
+        # Joined entities are scoped as well
+        assert db.session.query(Sale, Party).join(Party, Sale.party_cd == Party.party_cd).count() == 2
+        with all_tenants():
+            assert Party.query.count() == 5
+        assert Party.query.execution_options(all_tenants=True).count() == 5
+
+    with tenant_scope(second):
+        assert Party.query.count() == 3
+
+
+def test_bulk_update_and_delete_are_scoped(tenants):
+    _, (first, second) = tenants
+    with tenant_scope(first):
+        Party.query.update({'place': 'Here'}, synchronize_session=False)
+        Sale.query.delete(synchronize_session=False)
+    db.session.commit()
+
+    assert {party.user_id for party in Party.query.filter_by(place='Here')} == {first}
+    assert {sale.user_id for sale in Sale.query.all()} == {second}
+
+
+def test_logged_in_user_is_the_tenant(tenants):
+    app, (first, second) = tenants
+    with app.test_request_context():
+        login_user(db.session.get(User, second))
+        assert current_tenant() == second
+        assert {party.party_cd for party in Party.query.all()} == {'T2P0', 'T2P1', 'T2P2'}
+        # An explicit scope wins over the logged-in user
+        with tenant_scope(first):
+            assert Party.query.count() == 2
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Year Close
+Closing a financial year against a seeded scratch database: balances and
+reports read the same before and after, and the working tables shrink
+
+Run with ``python -m pytest test_year_archive.py``.
+"""
+
+import os
+import sys
+from datetime import date
+
+import pytest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from analytics_rollup import rebuild_rollups
+from business_logic import CreditBusinessLogic
+from database import db
+from financial_management import FinancialManagementSystem
+from models import Cashbook, Sale, SalesDailyRollup
+from scale_data import ScaleDataGenerator
+from year_archive import OPENING_VOUCHER, YearCloseError, YearCloser, closed_through
+
+# The generator dates everything in the 2024-2025 financial year
+FIXTURE = {'seed': 11, 'tenants': 2, 'parties': 40, 'items': 20, 'sale_lines': 600,
+           'purchase_lines': 300, 'cashbook_entries': 400}
+YEAR = '2024-2025'
+AS_OF = ['2024-09-30', '2025-03-31', '2025-06-30']
+
+
+def _snapshot(user_id, party_cd, item_cd):
+    fms = FinancialManagementSystem()
+    return {
+        'trial_balance': {as_of: fms.get_trial_balance(user_id, as_of)['trial_balance']['accounts']
+                          for as_of in AS_OF},
+        'ledger': fms.get_ledger(user_id, party_cd, '2024-04-01', '2025-03-31')['ledger']['entries'],
+        'party_balance': CreditBusinessLogic.calculate_party_balance(party_cd, user_id)['current_balance'],
+        'item_balance': CreditBusinessLogic.calculate_inventory_balance(item_cd, user_id)['current_balance'],
+        'sales': Sale.query.filter_by(user_id=user_id).count(),
+        'cashbook': Cashbook.query.filter_by(user_id=user_id).count(),
+        'rollup': db.session.query(db.func.sum(SalesDailyRollup.amount))
+                    .filter(SalesDailyRollup.user_id == user_id).scalar(),
+    }
+
+
+@pytest.fixture(scope='module')
+def closed(tmp_path_factory):
+    path = tmp_path_factory.mktemp('year') / 'year.db'
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SQL_LOG_REQUESTS': False,
+        'METRICS_DIR': None,
+    })
+    with app.app_context():
+        generator = ScaleDataGenerator(**FIXTURE)
+        user_ids = generator.generate()['user_ids']
+        user_id, other_id = user_ids
+        party_cd = Cashbook.query.filter_by(user_id=user_id).first().party_cd
+        item_cd = Sale.query.filter_by(user_id=user_id).first().it_cd
+
+        before = _snapshot(user_id, party_cd, item_cd)
+        other_before = _snapshot(other_id, Cashbook.query.filter_by(user_id=other_id).first().party_cd,
+                                 Sale.query.filter_by(user_id=other_id).first().it_cd)
+        summaries = YearCloser(user_id, batch_size=97).close(YEAR)
+        db.session.expire_all()
+        after = _snapshot(user_id, party_cd, item_cd)
+        yield {'app': app, 'user_id': user_id, 'other_id': other_id, 'before': before, 'after': after,
+               'other_before': other_before, 'summaries': summaries, 'party_cd': party_cd, 'item_cd': item_cd}
+
+
+def test_working_tables_shrink(closed):
+    after, summary = closed['after'], closed['summaries'][-1]
+    assert summary['financial_year'] == YEAR
+    assert summary['rows_archived'] > 0
+    assert after['sales'] < closed['before']['sales']
+    with closed['app'].app_context():
+        left = Cashbook.query.filter(Cashbook.user_id == closed['user_id'],
+                                     Cashbook.voucher_type != OPENING_VOUCHER).count()
+        openings = Cashbook.query.filter_by(user_id=closed['user_id'], voucher_type=OPENING_VOUCHER).all()
+    assert left == 0
+    assert openings and all(entry.date == date(2025, 4, 1) for entry in openings)
+
+
+@pytest.mark.parametrize('as_of', AS_OF)
+def test_trial_balance_unchanged(closed, as_of):
+    before = {row['account_code']: row for row in closed['before']['trial_balance'][as_of]}
+    after = {row['account_code']: row for row in closed['after']['trial_balance'][as_of]}
+    assert after.keys() == before.keys()
+    for code, row in before.items():
+        assert after[code]['debit'] == pytest.approx(row['debit'])
+        assert after[code]['credit'] == pytest.approx(row['credit'])
+
+
+def test_archived_ledger_still_reported(closed):
+    before, after = closed['before']['ledger'], closed['after']['ledger']
+    assert [(entry['date'], entry['debit'], entry['credit']) for entry in after] == \
+           [(entry['date'], entry['debit'], entry['credit']) for entry in before]
+
+
+def test_credit_and_stock_balances_unchanged(closed):
+    assert closed['after']['party_balance'] == pytest.approx(closed['before']['party_balance'])
+    assert closed['after']['item_balance'] == pytest.approx(closed['before']['item_balance'])
+
+
+def test_other_tenant_untouched(closed):
+    with closed['app'].app_context():
+        assert closed_through(closed['other_id']) is None
+        assert Sale.query.filter_by(user_id=closed['other_id']).count() == closed['other_before']['sales']
+
+
+def test_rebuild_keeps_closed_rollups(closed):
+    with closed['app'].app_context():
+        rebuild_rollups(closed['user_id'])
+        total = db.session.query(db.func.sum(SalesDailyRollup.amount)) \
+            .filter(SalesDailyRollup.user_id == closed['user_id']).scalar()
+    assert total == pytest.approx(closed['before']['rollup'])
+
+
+def test_year_closes_once(closed):
+    with closed['app'].app_context():
+        assert closed_through(closed['user_id']) == date(2025, 3, 31)
+        with pytest.raises(YearCloseError):
+            YearCloser(closed['user_id']).close(YEAR)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Token Authentication
+Stateless bearer tokens (HS256 JWT) for the JSON API and handheld clients
+"""
+
+import base64
+import time
+import uuid
+from datetime import datetime
+from functools import wraps, lru_cache
+from typing import Dict, Optional
+from flask import current_app, request, jsonify, g
+from jwt import JWT, jwk_from_dict
+from jwt.exceptions import JWTException
+from database import db
+from models import User, RefreshToken
+from user_cache import user_cache
+
+ALGORITHM = 'HS256'
+
+# The placeholder the key used to default to; a key equal to it is treated as unset
+PLACEHOLDER_SECRET = 'jwt-secret-key-change-in-production'
+
+_jwt = JWT()
+
+
+class TokenError(Exception):
+    """Raised for a missing, malformed, expired or revoked token"""
+
+
+@lru_cache(maxsize=4)
+def _signing_key(secret: str):
+    encoded = base64.urlsafe_b64encode(secret.encode('utf-8')).decode('ascii').rstrip('=')
+    return jwk_from_dict({'kty': 'oct', 'k': encoded})
+
+
+def secret_configured(config) -> bool:
+    """Whether ``config`` has a signing key of its own; anyone knowing the key can forge tokens"""
+    secret = config.get('JWT_SECRET_KEY')
+    return bool(secret) and secret != PLACEHOLDER_SECRET
+
+
+def _secret() -> str:
+    if not secret_configured(current_app.config):
+        raise TokenError('Token authentication is not configured (set JWT_SECRET_KEY)')
+    return current_app.config['JWT_SECRET_KEY']
+
+
+def _encode(claims: Dict) -> str:
+    return _jwt.encode(claims, _signing_key(_secret()), alg=ALGORITHM)
+
+
+def decode_token(token: str, expected_type: str = 'access') -> Dict:
+    """Verify signature and expiry and return the claims (an HMAC check, no I/O)"""
+    secret = _secret()
+    try:
+        claims = _jwt.decode(token, _signing_key(secret), algorithms={ALGORITHM})
+    except (JWTException, ValueError) as e:  # Malformed base64/JSON raises ValueError
+        raise TokenError('Token expired' if 'Expired' in str(e) else 'Invalid token')
+    if claims.get('type') != expected_type:
+        raise TokenError(f'Wrong token type (expected {expected_type})')
+    return claims
+
+
+def issue_tokens(user: User, family: str = None) -> Dict:
+    """Create an access/refresh token pair and record the refresh token"""
+    now = int(time.time())
+    access_ttl = current_app.config['JWT_ACCESS_TOKEN_EXPIRES']
+    refresh_ttl = current_app.config['JWT_REFRESH_TOKEN_EXPIRES']
+
+    access_token = _encode({
+        'type': 'access',
+        'sub': str(user.id),
+        'tenant': user.id,  # Business data is isolated per user_id
+        'username': user.username,
+        'role': user.role,
+        'iat': now,
+        'exp': now + int(access_ttl.total_seconds()),
+    })
+
+    jti = str(uuid.uuid4())
+    refresh_token = _encode({
+        'type': 'refresh',
+        'sub': str(user.id),
+        'jti': jti,
+        'iat': now,
+        'exp': now + int(refresh_ttl.total_seconds()),
+    })
+    db.session.add(RefreshToken(
+        jti=jti,
+        family=family or jti,
+        user_id=user.id,
+        expires_at=datetime.utcnow() + refresh_ttl
+    ))
+    db.session.commit()
+
+    return {
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'token_type': 'Bearer',
+        'expires_in': int(access_ttl.total_seconds())
+    }
+
+
+def rotate_refresh_token(token: str) -> Dict:
+    """Exchange a refresh token for a new pair; each refresh token works once
+
+    Presenting an already rotated token means it leaked, so the whole family
+    (every token descended from that login) is revoked. The token is claimed
+    with a single conditional UPDATE, so of two concurrent refreshes with the
+    same token only one gets a new pair; the other counts as reuse.
+    """
+    claims = decode_token(token, expected_type='refresh')
+    jti = claims.get('jti')
+    claimed = RefreshToken.query.filter(
+        RefreshToken.jti == jti,
+        RefreshToken.used_at.is_(None),
+        RefreshToken.revoked.isnot(True)
+    ).update({'used_at': datetime.utcnow()}, synchronize_session=False)
+
+    stored = RefreshToken.query.filter_by(jti=jti).first()
+    if stored is None:
+        raise TokenError('Refresh token revoked')
+    if claimed != 1:
+        already_revoked = stored.revoked
+        _revoke_family(stored.family)
+        raise TokenError('Refresh token revoked' if already_revoked
+                         else 'Refresh token reuse detected; please log in again')
+
+    user = db.session.get(User, stored.user_id)
+    if user is None or not user.is_active:
+        _revoke_family(stored.family)
+        raise TokenError('Account is deactivated')
+
+    return issue_tokens(user, family=stored.family)
+
+
+def revoke_refresh_token(token: str):
+    """Log a client out by revoking every token of its refresh family"""
+    claims = decode_token(token, expected_type='refresh')
+    stored = RefreshToken.query.filter_by(jti=claims.get('jti')).first()
+    if stored is not None:
+        _revoke_family(stored.family)
+
+
+def _revoke_family(family: str):
+    RefreshToken.query.filter_by(family=family).update({'revoked': True})
+    db.session.commit()
+
+
+def _bearer_token() -> Optional[str]:
+    header = request.headers.get('Authorization', '')
+    if header[:7].lower() == 'bearer ':
+        return header[7:].strip() or None
+    return None
+
+
+def _token_user(token: str) -> User:
+    """The active ``User`` a verified access token was issued to
+
+    The row comes from the user cache, so views get the same ``current_user``
+    as with a session login, usually without a query.
+    """
+    claims = decode_token(token)
+    user = user_cache.load(int(claims['sub']))
+    if user is None or not user.is_active:
+        raise TokenError('Account is deactivated')
+    return user
+
+
+def load_user_from_request(req) -> Optional[User]:
+    """Flask-Login request_loader: authenticate ``@login_required`` views from a bearer token"""
+    if 'token_user' in g:
+        return g.token_user
+
+    token = _bearer_token()
+    if token is None:
+        return None
+    try:
+        g.token_user = _token_user(token)
+    except TokenError:
+        return None
+    return g.token_user
+
+
+def token_required(f):
+    """Require a valid bearer access token; its user is exposed as ``g.token_user``"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = _bearer_token()
+        if token is None:
+            return jsonify({'success': False, 'message': 'Bearer token required'}), 401
+        try:
+            g.token_user = _token_user(token)
+        except TokenError as e:
+            return jsonify({'success': False, 'message': str(e)}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
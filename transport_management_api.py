@@ -9,6 +9,7 @@ from transport_management import TransportManagementSystem
 from database import db
 from models import User
 from flask_login import login_required, current_user
+from replica_routing import reporting
 import json
 from datetime import datetime, timedelta
 
@@ -294,6 +295,7 @@ def bulk_import_transport():
 
 @transport_management_bp.route('/api/transport/export', methods=['GET'])
 @login_required
+@reporting
 def export_transport_data():
     """Export transport data"""
     try:
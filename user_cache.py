@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+User Cache
+TTL-bounded in-process cache behind Flask-Login's user_loader
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy.orm import make_transient_to_detached
+from database import db
+from models import User
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_SIZE = 1024
+
+
+class UserCache:
+    """Per-process cache of detached ``User`` rows keyed by id
+
+    Every authenticated request (including each small HTMX fragment a page
+    fires) calls the user_loader; with the cache only the first request per
+    TTL window reads the users table. Cached rows are merged into the request's
+    session without a query, so views that modify ``current_user`` still flush
+    normally. Each worker process has its own cache, so the TTL bounds how long
+    a change made through another process can go unnoticed.
+    """
+
+    def __init__(self, ttl: int = DEFAULT_TTL, max_size: int = DEFAULT_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, user_id: int) -> Optional[User]:
+        """Return the user attached to the current session, or None"""
+        if self.ttl <= 0:
+            return db.session.get(User, user_id)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                cached = entry[1]
+            else:
+                self.misses += 1
+                cached = None
+
+        if cached is not None:
+            return db.session.merge(cached, load=False)
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+
+        # Cache a detached copy; the session's own instance stays in use
+        snapshot = User(**{column.name: getattr(user, column.name) for column in User.__table__.columns})
+        make_transient_to_detached(snapshot)
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id: int):
+        """Drop one user, after their row was changed or deleted"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def invalidate_user(user_id: int):
+    user_cache.invalidate(user_id)
@@ -8,6 +8,7 @@ from flask_login import login_required, current_user, login_user, logout_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import db, User, Company, Party, Item, Purchase, Sale, Cashbook, Bankbook
 from datetime import datetime
+from user_cache import invalidate_user
 import re
 
 user_bp = Blueprint('user', __name__)
@@ -158,6 +159,7 @@ def edit_profile():
                 current_user.set_password(new_password)
             
             db.session.commit()
+            invalidate_user(current_user.id)
             flash('Profile updated successfully!', 'success')
             return redirect(url_for('user.profile'))
             
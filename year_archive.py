@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Year Archive
+Financial-year close: closing balances are carried forward as opening
+entries and the closed year's transactions move to a per-year archive
+database, which reports keep reading through ``across_years()``
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import (Column, Index, MetaData, Table, and_, create_engine, delete, exists, func, inspect,
+                        insert, or_, select, update)
+from business_logic import get_financial_year
+from database import db
+from db_engine import engine_options
+from models import Bankbook, Cashbook, Company, FinancialYearClose, Item, Ledger, Party, Purchase, Sale
+from replica_routing import read_from
+
+logger = logging.getLogger(__name__)
+
+# Working tables whose rows move to the archive, with their date column. A
+# row moves only when nothing left in the working tables refers to it, so
+# the referring tables come first
+ARCHIVED_TABLES = [
+    (Ledger, 'date'),
+    (Cashbook, 'date'),
+    (Bankbook, 'date'),
+    (Sale, 'bill_date'),
+    (Purchase, 'bill_date'),
+]
+
+# Books whose moved rows are carried forward as one opening entry per party
+CARRY_FORWARD_MODELS = (Ledger, Cashbook, Bankbook)
+
+# Masters copied into each archive, so archived rows join as they did
+SNAPSHOT_MODELS = (Party, Item)
+
+OPENING_VOUCHER = 'OPENING'
+DEFAULT_BATCH_SIZE = 2000
+# Seconds a tenant's list of closed years is reused by a process
+CLOSED_YEARS_TTL = 60
+
+YearSpan = namedtuple('YearSpan', 'financial_year start_date end_date')
+
+
+class YearCloseError(Exception):
+    """The year cannot be closed (not over yet, already closed, no archive configured)"""
+
+
+def financial_year_dates(financial_year: str):
+    """(first day, last day) of a "2024-2025" or "2024-25" financial year"""
+    try:
+        first, second = financial_year.split('-')
+        start = int(first)
+        if len(first) != 4 or int(second) % 100 != (start + 1) % 100:
+            raise ValueError
+    except ValueError:
+        raise YearCloseError(f"Not a financial year: {financial_year!r} (expected e.g. 2024-2025)")
+    return date(start, 4, 1), date(start + 1, 3, 31)
+
+
+def _archive_metadata() -> MetaData:
+    """The archived and snapshot tables, without foreign keys: an archived row
+    may refer to a row that stayed in the working tables"""
+    metadata = MetaData()
+    for model in [model for model, _ in ARCHIVED_TABLES] + list(SNAPSHOT_MODELS):
+        source = model.__table__
+        table = Table(source.name, metadata, *[
+            Column(column.name, column.type, primary_key=column.primary_key, autoincrement=False)
+            for column in source.columns])
+        for index in source.indexes:
+            Index(index.name, *[table.c[column.name] for column in index.columns], unique=index.unique)
+    for model, date_attr in ARCHIVED_TABLES:
+        table = metadata.tables[model.__tablename__]
+        Index(f'idx_archive_{table.name}_user_date', table.c.user_id, table.c[date_attr])
+    return metadata
+
+
+class YearArchive:
+    """Archive databases, one per financial year, and each tenant's closed years
+
+    ``ARCHIVE_DATABASE_URL`` is a URL template with a ``{year}`` placeholder
+    (``2024_2025``). SQLite installs default to ``archive/fy_<year>.db`` next
+    to the main database file; other databases need the template, and each
+    archive database created beforehand. A year's archive holds the rows of
+    every tenant that closed it.
+
+    The closed years of a tenant are cached per process for
+    ``CLOSED_YEARS_TTL`` seconds, so balance and report queries do not pay a
+    lookup each; a close made by another process is seen within that time.
+    """
+
+    def __init__(self, app=None):
+        self.url_template: Optional[str] = None
+        self.metadata = _archive_metadata()
+        self._engines = {}
+        self._closed = {}
+        self._table_ready = False
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.url_template = app.config.get('ARCHIVE_DATABASE_URL') or self._default_template(app)
+        app.extensions['year_archive'] = self
+
+    @staticmethod
+    def _default_template(app) -> Optional[str]:
+        with app.app_context():
+            url = db.engine.url
+        if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+            return None
+        directory = os.path.join(os.path.dirname(os.path.abspath(url.database)), 'archive')
+        return 'sqlite:///' + os.path.join(directory, 'fy_{year}.db')
+
+    def engine(self, financial_year: str):
+        """The archive engine for ``financial_year``, its tables created on first use"""
+        with self._lock:
+            engine = self._engines.get(financial_year)
+            if engine is None:
+                if not self.url_template:
+                    raise YearCloseError("Set ARCHIVE_DATABASE_URL to archive closed years")
+                url = self.url_template.format(year=financial_year.replace('-', '_'))
+                if url.startswith('sqlite:///'):
+                    os.makedirs(os.path.dirname(url[len('sqlite:///'):]) or '.', exist_ok=True)
+                engine = create_engine(url, **engine_options(dict(self.app.config, SQLALCHEMY_DATABASE_URI=url)))
+                self.metadata.create_all(engine)
+                self._engines[financial_year] = engine
+        return engine
+
+    def engines(self) -> list:
+        with self._lock:
+            return list(self._engines.values())
+
+    def closed_years(self, user_id: int) -> List[YearSpan]:
+        """The tenant's closed years, oldest first"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._closed.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        years = []
+        table = FinancialYearClose.__table__
+        # Databases that have not run "flask schema upgrade" yet have no closes
+        if self._table_ready or inspect(db.session.get_bind()).has_table(table.name):
+            self._table_ready = True
+            years = [YearSpan(*row) for row in db.session.execute(
+                select(table.c.financial_year, table.c.start_date, table.c.end_date)
+                .where(table.c.user_id == user_id, table.c.state == 'closed')
+                .order_by(table.c.start_date))]
+        with self._lock:
+            self._closed[user_id] = (now + CLOSED_YEARS_TTL, years)
+        return years
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._closed.pop(user_id, None)
+
+
+def year_archive() -> Optional[YearArchive]:
+    return current_app.extensions.get('year_archive') if has_app_context() else None
+
+
+def closed_years(user_id: int) -> List[YearSpan]:
+    archive = year_archive()
+    return archive.closed_years(user_id) if archive is not None else []
+
+
+def closed_through(user_id: int) -> Optional[date]:
+    """Last day of the tenant's latest closed year; everything up to it is archived"""
+    years = closed_years(user_id)
+    return years[-1].end_date if years else None
+
+
+def closed_through_all() -> Dict[int, date]:
+    """``closed_through`` of every tenant that closed a year, read directly"""
+    table = FinancialYearClose.__table__
+    if not inspect(db.session.get_bind()).has_table(table.name):
+        return {}
+    return dict(db.session.execute(select(table.c.user_id, func.max(table.c.end_date))
+                                   .where(table.c.state == 'closed').group_by(table.c.user_id)).all())
+
+
+def archived_years(user_id: int, start: Optional[date] = None, end: Optional[date] = None) -> List[YearSpan]:
+    """The tenant's closed years that overlap ``start``..``end``"""
+    return [year for year in closed_years(user_id)
+            if (start is None or year.end_date >= start) and (end is None or year.start_date <= end)]
+
+
+def across_years(query, user_id: int, start: Optional[date] = None, end: Optional[date] = None) -> list:
+    """``query.all()`` over the working tables and the archived years of
+    ``user_id`` that overlap ``start``..``end``
+
+    The query must filter on the tenant and the dates itself; the range only
+    picks the archives. Results are concatenated, working tables first, so
+    callers sort or merge them. When archives are read, carried-forward
+    opening entries are left out, as the rows they sum up are read instead.
+    Without a start date a carried-forward book needs its archives only for
+    an ``end`` inside a closed year: its opening entries cover the rest.
+    """
+    years = archived_years(user_id, start, end)
+    model = query.column_descriptions[0]['entity']
+    if model in CARRY_FORWARD_MODELS and start is None and years and (end is None or end > years[-1].end_date):
+        years = []
+    if not years:
+        return query.all()
+
+    if model in CARRY_FORWARD_MODELS:
+        query = query.filter(or_(model.voucher_type.is_(None), model.voucher_type != OPENING_VOUCHER))
+    rows = query.all()
+    archive = year_archive()
+    for year in years:
+        with read_from(archive.engine(year.financial_year)):
+            rows.extend(query.all())
+    return rows
+
+
+def _referrers(table: Table) -> list:
+    """Foreign-key columns of the working tables that point at ``table``"""
+    return [(foreign_key.parent, table.c[foreign_key.column.name])
+            for other in db.metadata.tables.values() if other is not table
+            for foreign_key in other.foreign_keys if foreign_key.column.table is table]
+
+
+class YearCloser:
+    """Closes a tenant's financial years, oldest first
+
+    The first close of a tenant also closes every earlier year that has
+    rows, so the closed years always run up to one date. Each table is moved
+    in batches: the batch is written to the archive, then deleted from the
+    working table in the same transaction that adds it to the opening
+    entries, so balances from the working tables stay exact throughout and
+    an interrupted close can simply be run again. Reports on a year still
+    being closed miss the rows moved so far until the close completes.
+    """
+
+    def __init__(self, user_id: int, batch_size: int = DEFAULT_BATCH_SIZE,
+                 report: Optional[Callable[[str, str, int], None]] = None):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.archive = year_archive()
+        self._report = report
+        if self.archive is None or not self.archive.url_template:
+            raise YearCloseError("Set ARCHIVE_DATABASE_URL to archive closed years")
+
+    def close(self, financial_year: str, today: Optional[date] = None) -> List[Dict]:
+        """Close every open year up to ``financial_year``; returns one summary per year"""
+        start, end = financial_year_dates(financial_year)
+        if end >= (today or date.today()):
+            raise YearCloseError(f"Financial year {financial_year} has not ended yet")
+
+        summaries = []
+        try:
+            for year in self._years_to_close(start):
+                summaries.append(self._close_year(year))
+        finally:
+            self.archive.invalidate(self.user_id)
+        return summaries
+
+    def _years_to_close(self, last_start: date) -> List[str]:
+        table = FinancialYearClose.__table__
+        done = db.session.execute(select(func.max(table.c.end_date)).where(
+            table.c.user_id == self.user_id, table.c.state == 'closed')).scalar()
+        if done is not None:
+            first = done + timedelta(days=1)
+        else:
+            earliest = [db.session.execute(select(func.min(model.__table__.c[date_attr])).where(
+                model.__table__.c.user_id == self.user_id)).scalar() for model, date_attr in ARCHIVED_TABLES]
+            earliest = [day for day in earliest if day is not None]
+            first = last_start
+            if earliest:
+                first = min(first, financial_year_dates(get_financial_year(min(earliest)))[0])
+        if first > last_start:
+            raise YearCloseError(f"Financial year {get_financial_year(last_start)} is already closed")
+
+        years = []
+        while first <= last_start:
+            years.append(get_financial_year(first))
+            first = date(first.year + 1, 4, 1)
+        return years
+
+    def _close_year(self, financial_year: str) -> Dict:
+        start, end = financial_year_dates(financial_year)
+        record = FinancialYearClose.query.filter_by(user_id=self.user_id, financial_year=financial_year).first()
+        if record is None:
+            record = FinancialYearClose(user_id=self.user_id, financial_year=financial_year,
+                                        start_date=start, end_date=end, state='closing')
+            db.session.add(record)
+            db.session.commit()
+        logger.info(f"Closing {financial_year} for user {self.user_id}")
+
+        engine = self.archive.engine(financial_year)
+        self._snapshot_masters(engine)
+        archived = kept = 0
+        for model, date_attr in ARCHIVED_TABLES:
+            moved, left = self._move(model, date_attr, start, end, engine)
+            archived += moved
+            kept += left
+
+        # The company's working year moves on with the close
+        company = Company.__table__
+        db.session.execute(update(company).where(
+            company.c.user_id == self.user_id, company.c.to_date <= end
+        ).values(from_date=end + timedelta(days=1), to_date=date(end.year + 1, 3, 31)))
+
+        record.state = 'closed'
+        record.rows_archived = (record.rows_archived or 0) + archived
+        record.rows_kept = kept
+        record.closed_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"Closed {financial_year} for user {self.user_id}: {archived} rows archived, {kept} kept")
+        return {'financial_year': financial_year, 'rows_archived': record.rows_archived, 'rows_kept': kept}
+
+    def _snapshot_masters(self, engine):
+        with engine.begin() as connection:
+            for model in SNAPSHOT_MODELS:
+                source = model.__table__
+                target = self.archive.metadata.tables[source.name]
+                rows = [dict(row) for row in db.session.execute(
+                    select(source).where(source.c.user_id == self.user_id)).mappings()]
+                connection.execute(delete(target).where(target.c.user_id == self.user_id))
+                if rows:
+                    connection.execute(insert(target), rows)
+
+    def _move(self, model, date_attr: str, start: date, end: date, engine):
+        """Move the year's unreferenced rows of one table; returns (moved, kept)"""
+        table = model.__table__
+        target = self.archive.metadata.tables[table.name]
+        in_year = and_(table.c.user_id == self.user_id, table.c[date_attr] >= start, table.c[date_attr] <= end)
+        movable = and_(in_year, *[~exists().where(column == key) for column, key in _referrers(table)])
+
+        moved = 0
+        while True:
+            ids = db.session.execute(select(table.c.id).where(movable).order_by(table.c.id)
+                                     .limit(self.batch_size)).scalars().all()
+            if not ids:
+                break
+            rows = [dict(row) for row in db.session.execute(select(table).where(table.c.id.in_(ids))).mappings()]
+            # Rewriting the ids first makes a batch repeatable after an interruption
+            with engine.begin() as connection:
+                connection.execute(delete(target).where(target.c.id.in_(ids)))
+                connection.execute(insert(target), rows)
+            if model in CARRY_FORWARD_MODELS:
+                self._carry_forward(model, rows, end + timedelta(days=1))
+            db.session.execute(delete(table).where(table.c.id.in_(ids)))
+            db.session.commit()
+            moved += len(ids)
+            if self._report is not None:
+                self._report(get_financial_year(start), table.name, moved)
+
+        kept = db.session.execute(select(func.count()).select_from(table).where(in_year)).scalar()
+        return moved, kept
+
+    def _carry_forward(self, model, rows: List[Dict], opening_date: date):
+        """Add the debits and credits of ``rows`` to each party's opening entry
+
+        Debits and credits are kept apart rather than netted, so sums over
+        either side (payments received, say) stay right as well.
+        """
+        table = model.__table__
+        totals = defaultdict(lambda: [0.0, 0.0])
+        for row in rows:
+            total = totals[row['party_cd']]
+            total[0] += row['dr_amt'] or 0
+            total[1] += row['cr_amt'] or 0
+
+        opening_year = get_financial_year(opening_date)
+        for party_cd, (debit, credit) in totals.items():
+            party = table.c.party_cd == party_cd if party_cd is not None else table.c.party_cd.is_(None)
+            existing = db.session.execute(select(table.c.id).where(
+                table.c.user_id == self.user_id, table.c.voucher_type == OPENING_VOUCHER,
+                table.c.date == opening_date, party)).scalar()
+            if existing is not None:
+                db.session.execute(update(table).where(table.c.id == existing).values(
+                    dr_amt=table.c.dr_amt + debit, cr_amt=table.c.cr_amt + credit))
+                continue
+
+            values = {'user_id': self.user_id, 'date': opening_date, 'party_cd': party_cd,
+                      'narration': f"Balance brought forward to {opening_year}", 'dr_amt': debit,
+                      'cr_amt': credit, 'voucher_type': OPENING_VOUCHER, 'voucher_no': opening_year}
+            if model is Ledger:
+                values.update(financial_year=opening_year, month=opening_date.month, day=opening_date.day,
+                              balance_type='D' if debit >= credit else 'C')
+            db.session.execute(insert(table).values(**values))
+
+
+def year_status(user_id: int) -> List[Dict]:
+    records = FinancialYearClose.query.filter_by(user_id=user_id).order_by(FinancialYearClose.start_date).all()
+    return [{'financial_year': record.financial_year, 'state': record.state,
+             'rows_archived': record.rows_archived, 'rows_kept': record.rows_kept,
+             'closed_at': record.closed_at} for record in records]
+
+
+year_cli = AppGroup('year', help='Financial year close and archives')
+
+
+@year_cli.command('close')
+@click.argument('financial_year')
+@click.option('--user-id', type=int, required=True, help='Tenant whose year is closed')
+@click.option('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows moved per transaction')
+def close_command(financial_year, user_id, batch_size):
+    """Close FINANCIAL_YEAR (e.g. 2024-2025) and every open year before it"""
+    last = {'at': 0.0}
+
+    def report(year, table, moved):
+        if time.monotonic() - last['at'] >= 1:
+            last['at'] = time.monotonic()
+            click.echo(f"  {year} {table}: {moved} rows moved")
+
+    try:
+        summaries = YearCloser(user_id, batch_size, report).close(financial_year)
+    except YearCloseError as e:
+        raise click.ClickException(str(e))
+    for summary in summaries:
+        click.echo(f"{summary['financial_year']}: {summary['rows_archived']} rows archived, "
+                   f"{summary['rows_kept']} kept (still referenced)")
+
+
+@year_cli.command('status')
+@click.option('--user-id', type=int, required=True)
+def status_command(user_id):
+    """Closed years of a tenant"""
+    statuses = year_status(user_id)
+    if not statuses:
+        click.echo('No closed years')
+    for status in statuses:
+        click.echo(f"{status['financial_year']}  {status['state']:8}  {status['rows_archived'] or 0} archived, "
+                   f"{status['rows_kept'] or 0} kept  {status['closed_at'] or ''}")